@@ -0,0 +1,118 @@
+import cv2
+import numpy as np
+
+# Hudud qoidalari: corners - eski qoida (quti burchaklari hudud ichida), foot - quti pastki o'rtasi
+# (oyoq nuqtasi) hudud ichida, overlap - quti yuzining kamida AREA_OVERLAP qismi hudud ichida
+AREA_RULES = ("corners", "foot", "overlap")
+AREA_OVERLAP = 0.3
+# Hududlar maskasi kadrdan shuncha marta kichik o'lchamda saqlanadi
+MASK_SCALE = 4
+
+
+def is_person_in_area(person_box, area_box):
+    px1, py1, px2, py2 = person_box
+    ax, ay, aw, ah = area_box
+    ax1, ay1, ax2, ay2 = ax, ay, ax + aw, ay + ah
+    return (ax1 < px1 < ax2 or ax1 < px2 < ax2) and (ay1 < py1 < ay2 or ay1 < py2 < ay2)
+
+
+def scale_rectangles(rectangles, from_size, to_size):
+    # Hududlar from_size (W, H) kadrida chizilgan; substream yoki kichraytirilgan kadr uchun qayta hisoblanadi
+    sx, sy = to_size[0] / from_size[0], to_size[1] / from_size[1]
+    return [(name, (round(x * sx), round(y * sy), round(w * sx), round(h * sy))) for name, (x, y, w, h) in rectangles]
+
+
+def scale_polygons(polygons, from_size, to_size):
+    sx, sy = to_size[0] / from_size[0], to_size[1] / from_size[1]
+    return {name: [(round(x * sx), round(y * sy)) for x, y in points] for name, points in polygons.items()}
+
+
+def polygon_bounds(points):
+    xs, ys = [x for x, _ in points], [y for _, y in points]
+    return min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys)
+
+
+def rectangles_array(area_boxes):
+    # [(x, y, w, h), ...] -> (M, 4) massiv [x1, y1, x2, y2]; kamera sozlamasi uchun bir marta hisoblanadi
+    areas = np.asarray(area_boxes, dtype=np.float64).reshape(-1, 4)
+    return np.column_stack((areas[:, 0], areas[:, 1], areas[:, 0] + areas[:, 2], areas[:, 1] + areas[:, 3]))
+
+
+def boxes_array(detections):
+    # [(x1, y1, x2, y2, conf), ...] yoki (N, 4+) massiv -> (N, 4)
+    boxes = np.asarray(detections, dtype=np.float64)
+    if boxes.size == 0:
+        return np.empty((0, 4))
+    return boxes.reshape(len(boxes), -1)[:, :4]
+
+
+def area_membership(boxes, areas):
+    # is_person_in_area bilan bir xil qoida, lekin barcha qutilar va hududlar uchun bitta amalda.
+    # Natija: (N, M) matritsa va har bir hudud uchun persons_detected vektori.
+    boxes = boxes_array(boxes)
+    px1, py1, px2, py2 = (boxes[:, k, None] for k in range(4))
+    ax1, ay1, ax2, ay2 = (areas[None, :, k] for k in range(4))
+    in_x = ((ax1 < px1) & (px1 < ax2)) | ((ax1 < px2) & (px2 < ax2))
+    in_y = ((ay1 < py1) & (py1 < ay2)) | ((ay1 < py2) & (py2 < ay2))
+    membership = in_x & in_y
+    return membership, membership.any(axis=0)
+
+
+class AreaIndex:
+    # Hududlar (to'rtburchak yoki ko'pburchak) bir marta kichraytirilgan label maskaga chiziladi:
+    # har bir katakda shu joydagi hudud raqami. Shundan keyin har bir quti uchun ish hududlar soniga
+    # bog'liq emas: foot - bitta katakni o'qish, overlap - quti ostidagi kataklar bo'yicha bincount.
+    # Hududlar ustma-ust tushsa, o'sha joyda ro'yxatdagi keyingi hudud hisobga olinadi.
+    def __init__(self, rectangles, polygons=None, rule="corners", min_overlap=AREA_OVERLAP, scale=MASK_SCALE):
+        if rule not in AREA_RULES:
+            raise ValueError(f"Noma'lum hudud qoidasi: {rule}")
+        polygons = polygons or {}
+        if polygons and rule == "corners":
+            # Ko'pburchak uchun burchaklar qoidasi ma'nosiz
+            rule = "foot"
+        self.rule = rule
+        self.min_overlap = min_overlap
+        self.scale = scale
+        self.area_boxes = rectangles_array([rect for _, rect in rectangles])
+        self.shapes = []
+        for name, (x, y, w, h) in rectangles:
+            points = polygons.get(name) or [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+            self.shapes.append(np.asarray(points, dtype=np.float64))
+        self.labels = None
+        self._shape = None
+
+    def build(self, frame_shape):
+        height, width = frame_shape[:2]
+        self._shape = (height, width)
+        labels = np.full((-(-height // self.scale), -(-width // self.scale)), -1, dtype=np.int32)
+        for i, points in enumerate(self.shapes):
+            cv2.fillPoly(labels, [np.round(points / self.scale).astype(np.int32)], i)
+        self.labels = labels
+
+    def membership(self, detections, frame_shape):
+        # area_membership bilan bir xil natija: (N, M) matritsa va har bir hudud uchun persons_detected
+        if self.rule == "corners":
+            return area_membership(detections, self.area_boxes)
+        if self.labels is None or self._shape != tuple(frame_shape[:2]):
+            self.build(frame_shape)
+        boxes = boxes_array(detections)
+        membership = np.zeros((len(boxes), len(self.shapes)), dtype=bool)
+        if len(boxes):
+            rows, cols = self.labels.shape
+            cells = np.floor(boxes / self.scale).astype(int)
+            if self.rule == "foot":
+                fx = np.clip(((cells[:, 0] + cells[:, 2]) // 2), 0, cols - 1)
+                fy = np.clip(cells[:, 3], 0, rows - 1)
+                hit = self.labels[fy, fx]
+                found = np.flatnonzero(hit >= 0)
+                membership[found, hit[found]] = True
+            else:
+                cells[:, [0, 2]] = np.clip(cells[:, [0, 2]], 0, cols)
+                cells[:, [1, 3]] = np.clip(cells[:, [1, 3]], 0, rows)
+                for k, (x1, y1, x2, y2) in enumerate(cells.tolist()):
+                    patch = self.labels[y1:max(y2, y1 + 1), x1:max(x2, x1 + 1)]
+                    if patch.size == 0:
+                        continue
+                    counts = np.bincount(patch.ravel() + 1, minlength=len(self.shapes) + 1)[1:]
+                    membership[k] = (counts > 0) & (counts >= self.min_overlap * patch.size)
+        return membership, membership.any(axis=0)
@@ -0,0 +1,210 @@
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+# Eksport qilingan modellar saqlanadigan papka: har bir variant bir marta yaratiladi
+MODEL_CACHE = "model_cache"
+BACKENDS = ("torch", "onnx", "openvino")
+PRECISIONS = ("fp32", "int8")
+IMGSZ = 640
+# INT8 kalibratsiyasi uchun ultralytics dataset fayli (ONNX uchun rasmlar papkasi yoki video ham bo'ladi)
+CALIBRATION_DATA = "coco8.yaml"
+# ONNX statik kvantlashda aktivatsiya oraliqlari shuncha kadr bo'yicha o'lchanadi
+CALIBRATION_FRAMES = 64
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# Jarayon ichida yuklangan modellar: main() qayta ishga tushganda qayta yuklanmaydi
+_models = {}
+_models_lock = threading.Lock()
+
+
+def cache_path(weights, backend, precision, imgsz, cache_dir=MODEL_CACHE):
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    name = f"{stem}_{imgsz}_{precision}"
+    if backend == "onnx":
+        # INT8 - statik QDQ kvantlash (avvalgi dinamik kvantlangan fayllar bilan adashmasligi uchun alohida nom)
+        return os.path.join(cache_dir, f"{name}_qdq.onnx" if precision == "int8" else f"{name}.onnx")
+    return os.path.join(cache_dir, f"{name}_openvino_model")
+
+
+def letterbox(image, imgsz):
+    # ultralytics bilan bir xil: nisbat saqlanib kichraytiriladi, qolgan joy 114 kulrang bilan to'ldiriladi
+    import cv2
+
+    height, width = image.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    resized = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - resized.shape[0]) // 2, (imgsz - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return canvas
+
+
+def calibration_images(source, limit=CALIBRATION_FRAMES):
+    # Kalibratsiya kadrlari (BGR): ultralytics dataset fayli (val rasmlari), rasmlar papkasi yoki video
+    import cv2
+
+    if source.endswith(".yaml"):
+        from ultralytics.data.utils import check_det_dataset
+
+        source = check_det_dataset(source)["val"]
+        source = source[0] if isinstance(source, (list, tuple)) else source
+    if os.path.isdir(source):
+        files = sorted(os.path.join(root, name) for root, _, names in os.walk(source) for name in names
+                       if name.lower().endswith(IMAGE_EXTENSIONS))
+        for path in files[:limit]:
+            image = cv2.imread(path)
+            if image is not None:
+                yield image
+        return
+    cap = cv2.VideoCapture(source)
+    # Video bo'ylab teng oraliqda
+    step = max(1, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) // limit)
+    count = 0
+    while count < limit:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, count * step)
+        success, frame = cap.read()
+        if not success:
+            break
+        count += 1
+        yield frame
+    cap.release()
+
+
+def calibration_reader(model_path, source, imgsz):
+    # onnxruntime CalibrationDataReader: kadrlar model kirishi ko'rinishida (1, 3, imgsz, imgsz), RGB, 0..1
+    import onnxruntime
+    from onnxruntime.quantization import CalibrationDataReader
+
+    session = onnxruntime.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+    input_name = session.get_inputs()[0].name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self.blobs = ({input_name: np.ascontiguousarray(
+                letterbox(image, imgsz)[:, :, ::-1].transpose(2, 0, 1)[np.newaxis], dtype=np.float32) / 255.0}
+                for image in calibration_images(source))
+
+        def get_next(self):
+            return next(self.blobs, None)
+
+    return FrameReader()
+
+
+def export_onnx(weights, target, precision, imgsz, calibration_data=CALIBRATION_DATA):
+    from ultralytics import YOLO
+
+    fp32_target = cache_path(weights, "onnx", "fp32", imgsz, os.path.dirname(target))
+    if not os.path.exists(fp32_target):
+        exported = YOLO(weights).export(format="onnx", imgsz=imgsz, simplify=True)
+        shutil.move(exported, fp32_target)
+    if precision == "int8":
+        # Statik QDQ kvantlash: og'irliklar kanal bo'yicha QInt8, aktivatsiya oraliqlari kalibratsiya kadrlaridan.
+        # Dinamik kvantlash conv tarmoqda ConvInteger beradi va ONNX Runtime CPU'da u FP32'dan ham sekin
+        from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+        quantize_static(fp32_target, target, calibration_reader(fp32_target, calibration_data, imgsz),
+                        quant_format=QuantFormat.QDQ, per_channel=True, weight_type=QuantType.QInt8,
+                        activation_type=QuantType.QUInt8)
+
+
+def export_openvino(weights, target, precision, imgsz, calibration_data=CALIBRATION_DATA):
+    from ultralytics import YOLO
+
+    options = {"format": "openvino", "imgsz": imgsz}
+    if precision == "int8":
+        options.update(int8=True, data=calibration_data)
+    exported = YOLO(weights).export(**options)
+    shutil.move(exported, target)
+
+
+def ensure_exported(weights, backend, precision="fp32", imgsz=IMGSZ, cache_dir=MODEL_CACHE):
+    # Keshda bo'lsa eksport qilinmaydi; keyingi ishga tushishlar faqat tayyor faylni yuklaydi
+    target = cache_path(weights, backend, precision, imgsz, cache_dir)
+    if os.path.exists(target):
+        return target
+    os.makedirs(cache_dir, exist_ok=True)
+    print(f"{weights} modeli {backend} ({precision}, {imgsz}px) formatiga eksport qilinmoqda...")
+    if backend == "onnx":
+        export_onnx(weights, target, precision, imgsz)
+    else:
+        export_openvino(weights, target, precision, imgsz)
+    return target
+
+
+class ModelBackend:
+    # ultralytics modeli ustidagi yupqa qatlam: barcha backendlar bir xil model(frames, ...)
+    # chaqiruvi va bir xil Results qaytaradi, shuning uchun person_boxes va scheduler o'zgarmaydi.
+    # Eksport qilingan modellar qat'iy (1, 3, imgsz, imgsz) kirishga ega, shuning uchun
+    # bir nechta kadr navbat bilan beriladi.
+    def __init__(self, model, backend, precision, imgsz):
+        self.model = model
+        self.backend = backend
+        self.precision = precision
+        self.imgsz = imgsz
+
+    def __call__(self, source, **kwargs):
+        kwargs.setdefault("imgsz", self.imgsz)
+        if self.backend != "torch" and isinstance(source, (list, tuple)) and len(source) > 1:
+            return [result for frame in source for result in self.model(frame, **kwargs)]
+        return self.model(source, **kwargs)
+
+    def __repr__(self):
+        return f"ModelBackend({self.backend}, {self.precision}, {self.imgsz}px)"
+
+
+def load_model(weights="yolov8m.pt", backend="torch", precision="fp32", imgsz=IMGSZ, cache_dir=MODEL_CACHE):
+    from ultralytics import YOLO
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Noma'lum backend: {backend}")
+    if precision not in PRECISIONS:
+        raise ValueError(f"Noma'lum aniqlik: {precision}")
+    if backend == "torch":
+        if precision != "fp32":
+            raise ValueError("torch backend faqat fp32 bilan ishlaydi; INT8 uchun onnx yoki openvino tanlang")
+        return ModelBackend(YOLO(weights), backend, precision, imgsz)
+    path = ensure_exported(weights, backend, precision, imgsz, cache_dir)
+    return ModelBackend(YOLO(path, task="detect"), backend, precision, imgsz)
+
+
+def warm_up(model, imgsz=None):
+    # Birinchi haqiqiy kadr sekin bo'lmasligi uchun bo'sh kadr bilan bir marta ishlatiladi
+    imgsz = imgsz or getattr(model, "imgsz", IMGSZ)
+    model(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), verbose=False)
+
+
+def shared_model(weights="yolov8m.pt", backend="torch", precision="fp32", imgsz=IMGSZ, cache_dir=MODEL_CACHE,
+                 warm=True):
+    # Model birinchi so'ralganda yuklanadi va jarayon yashaguncha saqlanadi.
+    # fork'dan oldin chaqirilsa warm=False: isitish bola jarayonlarda bajariladi.
+    key = (weights, backend, precision, imgsz, cache_dir)
+    with _models_lock:
+        entry = _models.get(key)
+        if entry is None:
+            started = time.perf_counter()
+            entry = _models[key] = {"model": load_model(*key), "warm": False}
+            print(f"Model yuklandi: {entry['model']} ({time.perf_counter() - started:.1f} s)")
+        if warm and not entry["warm"]:
+            started = time.perf_counter()
+            warm_up(entry["model"], imgsz)
+            entry["warm"] = True
+            print(f"Model isitildi ({time.perf_counter() - started:.1f} s)")
+        return entry["model"]
+
+
+def add_model_arguments(parser, weights="yolov8m.pt"):
+    parser.add_argument("--model", default=weights, help="YOLO og'irliklari (.pt)")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch",
+                        help="torch - PyTorch, onnx - ONNX Runtime, openvino - OpenVINO (CPU)")
+    parser.add_argument("--precision", choices=PRECISIONS, default="fp32",
+                        help="int8 - kvantlangan model (faqat onnx/openvino)")
+    parser.add_argument("--imgsz", type=int, default=IMGSZ, help="model kirish o'lchami (piksel)")
+    parser.add_argument("--model-cache", default=MODEL_CACHE, help="eksport qilingan modellar papkasi")
+
+
+def model_from_args(args, warm=True):
+    return shared_model(args.model, args.backend, args.precision, args.imgsz, args.model_cache, warm=warm)
@@ -0,0 +1,67 @@
+import argparse
+import timeit
+
+import numpy as np
+
+from areas import AreaIndex, is_person_in_area, rectangles_array, area_membership
+
+# Hudud tekshiruvi: Python sikli, NumPy varianti va AreaIndex (foot/overlap) solishtiriladi.
+# Misol: python benchmark_areas.py --boxes 100 --areas 50
+
+
+def loop_membership(detections, rectangles):
+    persons_detected = [False for _ in range(len(rectangles))]
+    for x1, y1, x2, y2, _ in detections:
+        for i, rect in enumerate(rectangles):
+            if is_person_in_area((x1, y1, x2, y2), rect):
+                persons_detected[i] = True
+    return persons_detected
+
+
+def random_scene(boxes, areas, width=1920, height=1080, seed=0):
+    rng = np.random.default_rng(seed)
+    rectangles = []
+    for _ in range(areas):
+        w, h = rng.integers(80, 400), rng.integers(80, 400)
+        rectangles.append((int(rng.integers(0, width - w)), int(rng.integers(0, height - h)), int(w), int(h)))
+    detections = []
+    for _ in range(boxes):
+        w, h = rng.integers(40, 300), rng.integers(80, 500)
+        x1, y1 = int(rng.integers(0, width - w)), int(rng.integers(0, height - h))
+        detections.append((x1, y1, x1 + int(w), y1 + int(h), 0.9))
+    return detections, rectangles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hudud tekshiruvi benchmarki")
+    parser.add_argument("--boxes", type=int, default=100)
+    parser.add_argument("--areas", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    detections, rectangles = random_scene(args.boxes, args.areas)
+    area_boxes = rectangles_array(rectangles)
+
+    expected = loop_membership(detections, rectangles)
+    _, detected = area_membership(detections, area_boxes)
+    assert detected.tolist() == expected, "NumPy natijasi sikl natijasiga mos kelmadi"
+
+    loop_time = timeit.timeit(lambda: loop_membership(detections, rectangles), number=args.repeat) / args.repeat
+    numpy_time = timeit.timeit(lambda: area_membership(detections, area_boxes), number=args.repeat) / args.repeat
+    print(f"{args.boxes} ta quti x {args.areas} ta hudud")
+    print(f"  Python sikli: {loop_time * 1e3:8.3f} ms")
+    print(f"  NumPy:        {numpy_time * 1e3:8.3f} ms  ({loop_time / numpy_time:.1f}x tezroq)")
+
+    # Maska bo'yicha qoidalar: qurish bir marta, har kadrdagi ish hududlar soniga bog'liq emas
+    frame_shape = (1080, 1920, 3)
+    # AreaIndex hududlarni camera_config.json'dagidek (nom, (x, y, w, h)) ko'rinishida oladi
+    named = [(str(i), rect) for i, rect in enumerate(rectangles)]
+    for rule in ("foot", "overlap"):
+        index = AreaIndex(named, rule=rule)
+        build_time = timeit.timeit(lambda: index.build(frame_shape), number=1)
+        index_time = timeit.timeit(lambda: index.membership(detections, frame_shape), number=args.repeat) / args.repeat
+        print(f"  AreaIndex {rule:7s} {index_time * 1e3:8.3f} ms  (maska bir marta {build_time * 1e3:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from backends import BACKENDS, IMGSZ, MODEL_CACHE, load_model
+from inference import person_boxes
+
+# Backendlarni yozib olingan video ustida solishtirish: bitta kadr kechikishi va batch throughput.
+# Misol: python benchmark_backends.py --video outpy.mp4 --variants torch:fp32,onnx:fp32,openvino:fp32,openvino:int8
+
+
+def read_frames(video, count):
+    cap = cv2.VideoCapture(video)
+    frames = []
+    while len(frames) < count:
+        success, frame = cap.read()
+        if not success:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise RuntimeError(f"{video} faylidan kadr o'qib bo'lmadi")
+    return frames
+
+
+def run_variant(weights, backend, precision, imgsz, frames, batch_size, cache_dir):
+    started = time.perf_counter()
+    model = load_model(weights, backend, precision, imgsz, cache_dir)
+    load_time = time.perf_counter() - started
+    for frame in frames[:3]:
+        model(frame, verbose=False)
+
+    latencies = []
+    detections = 0
+    for frame in frames:
+        started = time.perf_counter()
+        detections += len(person_boxes(model(frame, verbose=False)))
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        model(frames[i:i + batch_size], verbose=False)
+    batch_time = time.perf_counter() - started
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "backend": backend,
+        "precision": precision,
+        "imgsz": imgsz,
+        "load_s": load_time,
+        "latency_ms_mean": float(latencies.mean()),
+        "latency_ms_p50": float(np.percentile(latencies, 50)),
+        "latency_ms_p95": float(np.percentile(latencies, 95)),
+        "fps_single": len(frames) / (latencies.sum() / 1000),
+        "fps_batch": len(frames) / batch_time,
+        "batch_size": batch_size,
+        "persons_per_frame": detections / len(frames),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inference backendlari benchmarki")
+    parser.add_argument("--model", default="yolov8m.pt")
+    parser.add_argument("--video", default="outpy.mp4")
+    parser.add_argument("--frames", type=int, default=200, help="o'lchash uchun kadrlar soni")
+    parser.add_argument("--variants", default=",".join(f"{backend}:fp32" for backend in BACKENDS),
+                        help="backend:aniqlik juftlari, masalan torch:fp32,openvino:int8")
+    parser.add_argument("--imgsz", type=int, default=IMGSZ)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--model-cache", default=MODEL_CACHE)
+    parser.add_argument("--output", default=None, help="natijalarni JSON faylga yozish")
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames)
+    print(f"{args.video}: {len(frames)} ta kadr, {frames[0].shape[1]}x{frames[0].shape[0]}, CPU yadrolari: {os.cpu_count()}")
+
+    rows = []
+    for variant in args.variants.split(","):
+        backend, _, precision = variant.partition(":")
+        try:
+            row = run_variant(args.model, backend, precision or "fp32", args.imgsz, frames, args.batch_size,
+                              args.model_cache)
+        except Exception as e:
+            print(f"{variant}: xatolik - {e}")
+            continue
+        rows.append(row)
+        baseline = rows[0]["latency_ms_mean"]
+        print(f"{backend:9s} {row['precision']:5s}  kechikish {row['latency_ms_mean']:7.1f} ms "
+              f"(p95 {row['latency_ms_p95']:7.1f})  kadr/s {row['fps_single']:6.1f} / batch {row['fps_batch']:6.1f}  "
+              f"tezlanish {baseline / row['latency_ms_mean']:4.2f}x  odam/kadr {row['persons_per_frame']:.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"model": args.model, "video": args.video, "frames": len(frames), "cores": os.cpu_count(),
+                       "runs": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from backends import MODEL_CACHE
+from capture import open_source
+
+# oqim.py ni sintetik kameralar bilan ishga tushirib, bitta server nechta kamerani ko'tarishini o'lchash.
+# Har bir sozlama alohida jarayonda ishlaydi: kadr/s, kechikish, CPU va RSS shu jarayon bo'yicha olinadi.
+# Misol: python benchmark_suite.py --cameras 1,4,8 --resolutions 1280x720,1920x1080 --models yolov8n.pt,yolov8s.pt
+#        --rates 0,2 --video outpy.mp4 --output bench.json
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Jarayon holatini (eng katta RSS) tekshirish oralig'i, soniya
+POLL_INTERVAL = 1.0
+
+
+def default_rectangles(width, height):
+    # Kadrni 2x2 hududga bo'lish
+    w, h = width // 2, height // 2
+    return [{"name": f"Hudud {i + 1}", "coordinates": [x, y, w, h]}
+            for i, (x, y) in enumerate([(0, 0), (w, 0), (0, h), (w, h)])]
+
+
+def source_url(video, resolution, fps):
+    if video:
+        return f"loop:{os.path.abspath(video)}@{fps}"
+    return f"synthetic:{resolution}@{fps}"
+
+
+def make_config(cameras, video, resolution, fps, rectangles=None):
+    width, height = (int(v) for v in resolution.lower().split("x"))
+    return [{"id": camera_id, "rtsp_url": source_url(video, resolution, fps),
+             "rectangles": rectangles or default_rectangles(width, height)} for camera_id in range(cameras)]
+
+
+def check_source(url):
+    # Manba ochilmasa yoki kadr bermasa oqim.py uni cheksiz qayta ulashga urinadi va --profile hech qachon tugamaydi
+    cap = open_source(url)
+    try:
+        if not cap.isOpened():
+            return f"manba ochilmadi: {url}"
+        if not cap.read()[0]:
+            return f"manbadan kadr o'qib bo'lmadi: {url}"
+    finally:
+        cap.release()
+    return None
+
+
+def peak_rss_kb(pid):
+    # Linux: jarayonning eng katta RSS qiymati (VmHWM), kB
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def wait_child(process, timeout):
+    # Bola jarayonni timeout bilan kutish; eng katta RSS kutish davomida /proc'dan olinadi.
+    # Vaqt tugasa jarayon o'ldiriladi va None qaytadi
+    deadline = time.monotonic() + timeout
+    peak = 0
+    while True:
+        peak = max(peak, peak_rss_kb(process.pid) or 0)
+        try:
+            process.wait(timeout=min(POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+            return peak
+        except subprocess.TimeoutExpired:
+            if time.monotonic() >= deadline:
+                # --multiprocess worker'lari ham to'xtashi uchun butun jarayon guruhi
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+                return None
+
+
+def git_version():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_case(workdir, cameras, resolution, model, rate, args):
+    config_file = os.path.join(workdir, "camera_config.json")
+    profile_file = os.path.join(workdir, "profile.json")
+    with open(config_file, "w") as f:
+        json.dump(make_config(cameras, args.video, resolution, args.fps), f)
+    model_path = os.path.join(ROOT, model) if os.path.exists(os.path.join(ROOT, model)) else model
+    command = [sys.executable, os.path.join(ROOT, "oqim.py"), "--config", config_file, "--headless",
+               "--record", "off", "--profile", str(args.frames), "--profile-output", profile_file,
+               "--model", model_path, "--model-cache", os.path.abspath(args.model_cache),
+               "--backend", args.backend, "--precision", args.precision, "--stats-interval", "5"]
+    if rate:
+        # Har bir kamerada model sekundiga rate marta ishlaydi
+        command += ["--adaptive", "--idle-hz", str(rate), "--active-hz", str(rate), "--tolerance", "0"]
+    command += args.extra
+
+    # CPU vaqti kutib olingan bola jarayonlar bo'yicha yig'iladi, shuning uchun ishga tushishdan oldingi va
+    # keyingi qiymat farqi olinadi
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.monotonic()
+    # Jurnal, Excel va baza fayllari vaqtinchalik papkada qoladi
+    process = subprocess.Popen(command, cwd=workdir, stdout=subprocess.DEVNULL if not args.verbose else None,
+                               start_new_session=True)
+    peak_kb = wait_child(process, args.timeout)
+    wall = time.monotonic() - started
+    if peak_kb is None:
+        return {"error": f"oqim.py {args.timeout:.0f} soniyada tugamadi va to'xtatildi"}
+    if process.returncode != 0 or not os.path.exists(profile_file):
+        return {"error": f"oqim.py {process.returncode} kodi bilan tugadi"}
+
+    with open(profile_file) as f:
+        profile = json.load(f)
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    # /proc bo'lmasa barcha kutilgan bola jarayonlar ichidagi eng kattasi
+    rss_mb = (peak_kb or after.ru_maxrss) / 1024
+    fps = [camera["fps"] for camera in profile.values()]
+    latency = [camera["latency"] for camera in profile.values() if "latency" in camera]
+    inference = [camera["stages"]["inference"]["mean_ms"] for camera in profile.values()
+                 if "inference" in camera["stages"]]
+    return {
+        "fps_total": sum(fps),
+        "fps_per_camera": sum(fps) / len(fps) if fps else 0.0,
+        "fps_min_camera": min(fps) if fps else 0.0,
+        "latency_ms_mean": sum(l["mean_ms"] for l in latency) / len(latency) if latency else None,
+        "latency_ms_p95": max(l["p95_ms"] for l in latency) if latency else None,
+        "inference_ms_mean": sum(inference) / len(inference) if inference else None,
+        "wall_s": wall,
+        # Yuklash va isitishni ham o'z ichiga oladi
+        "cpu_s": cpu,
+        "cpu_percent": cpu / wall * 100,
+        "cpu_percent_per_camera": cpu / wall * 100 / cameras,
+        "rss_mb": rss_mb,
+        "rss_mb_per_camera": rss_mb / cameras,
+        "profile": profile,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sintetik kameralar bilan oqim.py benchmarki")
+    parser.add_argument("--cameras", default="1,2,4,8", help="kameralar soni ro'yxati")
+    parser.add_argument("--resolutions", default="1280x720,1920x1080")
+    parser.add_argument("--models", default="yolov8n.pt,yolov8s.pt,yolov8m.pt")
+    parser.add_argument("--rates", default="0", help="kamera boshiga inference chastotasi (Hz), 0 - har kadr")
+    parser.add_argument("--video", default=None, help="sintetik kadrlar o'rniga aylantiriladigan video")
+    parser.add_argument("--fps", type=float, default=25.0, help="sintetik kamera kadr chastotasi")
+    parser.add_argument("--frames", type=int, default=300, help="har bir kamerada o'lchanadigan kadrlar")
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--precision", default="fp32")
+    parser.add_argument("--model-cache", default=MODEL_CACHE)
+    parser.add_argument("--timeout", type=float, default=900.0,
+                        help="bitta sozlama shuncha soniyada tugamasa oqim.py to'xtatiladi")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--verbose", action="store_true", help="oqim.py chiqishini ko'rsatish")
+    parser.add_argument("extra", nargs=argparse.REMAINDER, help="-- dan keyin oqim.py ga qo'shimcha argumentlar")
+    args = parser.parse_args()
+    args.extra = [arg for arg in args.extra if arg != "--"]
+
+    for resolution in args.resolutions.split(","):
+        error = check_source(source_url(args.video, resolution, args.fps))
+        if error:
+            parser.error(error)
+
+    cases = list(itertools.product([int(v) for v in args.cameras.split(",")], args.resolutions.split(","),
+                                   args.models.split(","), [float(v) for v in args.rates.split(",")]))
+    runs = []
+    for cameras, resolution, model, rate in cases:
+        with tempfile.TemporaryDirectory(prefix="bench_") as workdir:
+            result = run_case(workdir, cameras, resolution, model, rate, args)
+        result.update({"cameras": cameras, "resolution": resolution, "model": model, "rate_hz": rate})
+        runs.append(result)
+        label = f"{cameras:3d} kamera {resolution:>9s} {model:12s} {rate:4.1f} Hz"
+        if "error" in result:
+            print(f"{label}: {result['error']}")
+        else:
+            latency = result["latency_ms_mean"]
+            print(f"{label}: {result['fps_per_camera']:5.1f} kadr/s/kamera (jami {result['fps_total']:6.1f}), "
+                  f"kechikish {latency if latency is not None else 0:7.1f} ms, "
+                  f"CPU {result['cpu_percent_per_camera']:5.1f}%/kamera, RSS {result['rss_mb']:7.0f} MB")
+        # Har bir natijadan keyin yoziladi: uzoq sweep to'xtatilsa ham natijalar saqlanib qoladi
+        with open(args.output, "w") as f:
+            json.dump({"version": git_version(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "host": {"cores": os.cpu_count(), "platform": platform.platform(),
+                                "python": platform.python_version()},
+                       "source": args.video or "synthetic", "camera_fps": args.fps, "frames": args.frames,
+                       "backend": args.backend, "precision": args.precision, "runs": runs}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import argparse
+import json
+import math
+import multiprocessing as mp
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from backends import add_model_arguments, model_from_args, warm_up
+from inference import InferenceScheduler
+from workers import (MP_CONTEXT, SHM_PREFIX, SharedInferenceClient, default_torch_threads, run_inference_server,
+                     response_pipes, set_torch_threads, shard_cameras, unlink_frames)
+
+# Jarayonlar soniga qarab kadr/s qanday o'sishini o'lchash. --inference local - har bir jarayonda o'z modeli,
+# shared - bitta inference jarayoni, kadrlar shared memory orqali (oqim.py --multiprocess bilan bir xil).
+# Misol: python benchmark_workers.py --cameras 16 --processes 1,2,4,8,16 --video outpy.mp4 --inference shared
+
+
+def open_video(video):
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise RuntimeError(f"Video ochilmadi: {video}")
+    return cap
+
+
+def frame_source(video, resolution):
+    if video:
+        cap = open_video(video)
+        while True:
+            success, frame = cap.read()
+            if not success:
+                # Video tugasa boshidan o'qiymiz; boshidan ham o'qilmasa cheksiz aylanmasdan to'xtaymiz
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                success, frame = cap.read()
+                if not success:
+                    cap.release()
+                    raise RuntimeError(f"Videodan kadr o'qib bo'lmadi: {video}")
+            yield frame
+    else:
+        width, height = resolution
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 255, (height, width, 3), dtype=np.uint8) for _ in range(8)]
+        while True:
+            yield from frames
+
+
+def run_camera(camera_id, detect, video, resolution, deadline, counts):
+    frames = 0
+    for frame in frame_source(video, resolution):
+        if time.monotonic() >= deadline:
+            break
+        detect(camera_id, frame)
+        frames += 1
+    counts[camera_id] = frames
+
+
+def run_shard(model, worker_index, cameras, video, resolution, duration, torch_threads, results, requests=None,
+              reader=None):
+    set_torch_threads(torch_threads)
+    if requests is not None:
+        client = SharedInferenceClient(worker_index, requests, reader)
+        detect, close = client.detect, client.close
+    else:
+        # Birinchi chaqiruv sekin bo'lmasligi uchun modelni har bir jarayonda isitib olamiz
+        warm_up(model)
+        scheduler = InferenceScheduler(model, max_batch_size=len(cameras), max_wait=0.005).start()
+        detect, close = scheduler.detect, scheduler.stop
+    counts = {}
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target=run_camera, args=(camera_id, detect, video, resolution, deadline, counts))
+               for camera_id in cameras]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    close()
+    results.put(counts)
+
+
+def wait_for_server(requests, readers):
+    # Inference jarayoni modelni isitib bo'lguncha kutamiz, aks holda isitish vaqti o'lchovga tushadi.
+    # Mavjud bo'lmagan kadr so'rovi isitishdan keyin xato bilan qaytadi; javob oxirgi (ortiqcha) kanalga keladi.
+    # Asosiy jarayonda shared memory ochilmaydi, shunda worker'lar resource_tracker'ni meros olmaydi
+    requests.put((len(readers) - 1, (os.getpid(), 0), ("warm", 0), f"{SHM_PREFIX}_ready", (1, 1, 3), "|u1"))
+    readers[-1].recv()
+
+
+def measure(model, cameras, processes, video, resolution, duration, inference="local"):
+    ctx = mp.get_context(MP_CONTEXT)
+    shards = shard_cameras(list(range(cameras)), math.ceil(cameras / processes))
+    results = ctx.Queue()
+    server = requests = None
+    readers = [None] * len(shards)
+    if inference == "shared":
+        # Barcha yadrolar inference jarayoniga, worker'lar faqat kadr tayyorlaydi
+        torch_threads = 1
+        requests = ctx.Queue()
+        readers, writers = response_pipes(ctx, len(shards) + 1)
+        server = ctx.Process(target=run_inference_server,
+                             args=(model, requests, writers, cameras, 0.005, os.cpu_count()),
+                             name="inference-server", daemon=True)
+        server.start()
+        wait_for_server(requests, readers)
+    else:
+        torch_threads = default_torch_threads(len(shards))
+    workers = [ctx.Process(target=run_shard, args=(model, worker_index, shard, video, resolution, duration,
+                                                   torch_threads, results, requests, readers[worker_index]))
+               for worker_index, shard in enumerate(shards)]
+    started = time.monotonic()
+    for worker in workers:
+        worker.start()
+    counts = {}
+    for _ in workers:
+        counts.update(results.get())
+    for worker in workers:
+        worker.join()
+        if server is not None:
+            unlink_frames(worker.pid)
+    elapsed = time.monotonic() - started
+    if server is not None:
+        requests.put(None)
+        server.join(timeout=5)
+        if server.is_alive():
+            server.terminate()
+    total = sum(counts.values())
+    return {
+        "inference": inference,
+        "processes": len(shards),
+        "torch_threads": torch_threads,
+        "frames": total,
+        "fps": total / duration,
+        "camera_fps": {str(camera_id): count / duration for camera_id, count in sorted(counts.items())},
+        "wall_time": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker jarayonlari soni bo'yicha benchmark")
+    add_model_arguments(parser, "yolov8n.pt")
+    parser.add_argument("--cameras", type=int, default=16)
+    parser.add_argument("--processes", default=None,
+                        help="vergul bilan ajratilgan jarayonlar soni, masalan 1,2,4,8,16")
+    parser.add_argument("--video", default=None, help="kamera o'rniga ishlatiladigan video fayl")
+    parser.add_argument("--resolution", default="1920x1080", help="sintetik kadr o'lchami")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--inference", choices=("local", "shared"), default="local",
+                        help="local - har bir jarayonda model, shared - bitta inference jarayoni")
+    parser.add_argument("--output", default=None, help="natijalarni JSON faylga yozish")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    if args.processes:
+        process_counts = [int(p) for p in args.processes.split(",")]
+    else:
+        process_counts = [p for p in (1, 2, 4, 8, 16, 32) if p <= cores]
+    resolution = tuple(int(v) for v in args.resolution.lower().split("x"))
+    if args.video:
+        # Video ochilmasa yoki kadr bermasa worker'lar ishga tushmasdan oldin to'xtaymiz
+        try:
+            next(frame_source(args.video, resolution))
+        except RuntimeError as e:
+            parser.error(str(e))
+
+    # Model faqat yuklanadi; inference fork'dan keyin bola jarayonlarda boshlanadi
+    model = model_from_args(args, warm=False)
+
+    rows = []
+    for processes in process_counts:
+        row = measure(model, args.cameras, processes, args.video, resolution, args.duration, args.inference)
+        rows.append(row)
+        speedup = row["fps"] / rows[0]["fps"] if rows[0]["fps"] else 0.0
+        efficiency = speedup * rows[0]["processes"] / row["processes"]
+        row["speedup"] = speedup
+        row["efficiency"] = efficiency
+        print(f"inference={args.inference}  jarayonlar={row['processes']:3d}  kadr/s={row['fps']:8.1f}  "
+              f"tezlanish={speedup:5.2f}x  samaradorlik={efficiency * 100:5.1f}%")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"cores": cores, "cameras": args.cameras, "inference": args.inference, "model": args.model,
+                       "backend": args.backend,
+                       "precision": args.precision,
+                       "video": args.video, "resolution": args.resolution, "runs": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
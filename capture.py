@@ -0,0 +1,274 @@
+import os
+import re
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Ulanish uzilganda qayta urinish oralig'i: 1, 2, 4, ... BACKOFF_MAX soniyagacha
+BACKOFF_INITIAL = 1.0
+BACKOFF_MAX = 60.0
+
+CACHED_PROPS = (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT, cv2.CAP_PROP_FPS)
+
+# Benchmark uchun RTSP o'rnini bosuvchi manbalar:
+#   synthetic:1920x1080@25     - tasodifiy kadrlar
+#   loop:outpy.mp4@25          - video fayl qayta-qayta, berilgan chastotada
+SYNTHETIC_SOURCE = re.compile(r"^(?P<kind>synthetic|loop):(?P<target>.+?)(?:@(?P<fps>[\d.]+))?$")
+
+
+class SyntheticCapture:
+    # cv2.VideoCapture bilan bir xil interfeys; kadrlarni kamera kabi real vaqtda beradi
+    def __init__(self, kind, target, fps=None):
+        self.fps = fps or 25.0
+        self.frames = []
+        self.cap = None
+        if kind == "synthetic":
+            width, height = (int(v) for v in target.lower().split("x"))
+            rng = np.random.default_rng(0)
+            self.frames = [rng.integers(0, 255, (height, width, 3), dtype=np.uint8) for _ in range(8)]
+        else:
+            cap = cv2.VideoCapture(target)
+            # Dekodlash narxi real kamera bilan bir xil bo'lishi uchun kadrlar xotirada emas, oqimdan o'qiladi
+            self.cap = cap if cap.isOpened() else None
+            if self.cap is not None and not fps:
+                self.fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        self.index = 0
+        self.next_time = time.monotonic()
+
+    def isOpened(self):
+        return bool(self.frames) or self.cap is not None
+
+    def read(self):
+        delay = self.next_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_time = max(self.next_time + 1.0 / self.fps, time.monotonic() - 1.0)
+        if self.frames:
+            frame = self.frames[self.index % len(self.frames)]
+        else:
+            success, frame = self.cap.read()
+            if not success:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                success, frame = self.cap.read()
+                if not success:
+                    return False, None
+        self.index += 1
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if self.frames:
+            height, width = self.frames[0].shape[:2]
+            return {cv2.CAP_PROP_FRAME_WIDTH: width, cv2.CAP_PROP_FRAME_HEIGHT: height}.get(prop, 0.0)
+        return self.cap.get(prop)
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+# OPENCV_FFMPEG_CAPTURE_OPTIONS butun jarayon uchun umumiy, shuning uchun ochish navbat bilan bo'ladi
+_ffmpeg_lock = threading.Lock()
+
+
+def gstreamer_pipeline(url, decode):
+    # Kichraytirish dekoderdan keyin darhol videoscale'da, keyframes_only bo'lsa delta kadrlar
+    # dekoderga yetmasdan tashlanadi. decodebin mavjud bo'lsa apparat dekoderni (vaapi, nvdec) tanlaydi.
+    parts = [f"rtspsrc location={url} latency={decode.get('latency', 0)} protocols=tcp", "queue", "parsebin"]
+    if decode.get("keyframes_only"):
+        parts.append("identity drop-buffer-flags=delta-unit")
+    parts.append("decodebin")
+    if decode.get("width") and decode.get("height"):
+        parts += ["videoscale", f"video/x-raw,width={decode['width']},height={decode['height']}"]
+    parts += ["videoconvert", "video/x-raw,format=BGR", "appsink drop=true max-buffers=1 sync=false"]
+    return " ! ".join(parts)
+
+
+def ffmpeg_options(decode):
+    options = {"rtsp_transport": "tcp"}
+    if decode.get("keyframes_only"):
+        # Faqat OpenCV'ning FFmpeg backendi bu opsiyani dekoderga uzatsa ta'sir qiladi
+        options["skip_frame"] = "nokey"
+    options.update(decode.get("ffmpeg_options", {}))
+    return "|".join(f"{key};{value}" for key, value in options.items())
+
+
+def open_source(source, decode=None):
+    # decode: camera_config.json'dagi "decode" sozlamalari (backend, width/height, keyframes_only, hwaccel, ...)
+    decode = decode or {}
+    match = SYNTHETIC_SOURCE.match(source) if isinstance(source, str) else None
+    if match is not None:
+        fps = match.group("fps")
+        return SyntheticCapture(match.group("kind"), match.group("target"), float(fps) if fps else None)
+    backend = decode.get("backend")
+    if backend == "gstreamer":
+        return cv2.VideoCapture(gstreamer_pipeline(source, decode), cv2.CAP_GSTREAMER)
+    if backend != "ffmpeg":
+        # Oddiy ochish ham navbat bilan: aks holda boshqa kameraning FFmpeg opsiyalari o'rnatilgan paytga tushib
+        # qolishi mumkin (OpenCV standart backendi ko'pincha FFmpeg)
+        with _ffmpeg_lock:
+            return cv2.VideoCapture(source)
+    params = []
+    if decode.get("hwaccel"):
+        params = [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+    with _ffmpeg_lock:
+        previous = os.environ.get("OPENCV_FFMPEG_CAPTURE_OPTIONS")
+        os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = ffmpeg_options(decode)
+        try:
+            return cv2.VideoCapture(source, cv2.CAP_FFMPEG, params)
+        finally:
+            if previous is None:
+                os.environ.pop("OPENCV_FFMPEG_CAPTURE_OPTIONS", None)
+            else:
+                os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = previous
+
+
+class LatestFrameReader:
+    # Kadrlarni fon oqimida uzluksiz o'qiydi va faqat eng oxirgisini saqlaydi.
+    # cv2.VideoCapture o'rniga ishlatiladi: read(), get(), isOpened(), release().
+    # Qayta ulanish shu oqim ichida bo'ladi, boshqa kameralarni to'xtatmaydi.
+    def __init__(self, source, name=None, backoff_initial=BACKOFF_INITIAL, backoff_max=BACKOFF_MAX, decode=None):
+        self.source = source
+        # every: har k-kadrdan bittasi olinadi (qolganlari grab() bilan o'tkaziladi, rangga o'girilmaydi);
+        # width/height: GStreamer'da videoscale, boshqa hollarda o'qish oqimida kichraytiriladi
+        self.decode = decode or {}
+        self.every = max(1, int(self.decode.get("every", 1)))
+        self.size = (self.decode["width"], self.decode["height"]) if self.decode.get("width") else None
+        self.name = name if name is not None else str(source)
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._frame = None
+        self._frame_time = None
+        self._seq = 0
+        self._read_seq = 0
+        self._props = {}
+        self._opened = False
+        self.native_size = None
+
+        self.decoded = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.reconnects = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self, wait=10.0):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"capture-{self.name}", daemon=True)
+            self._thread.start()
+        # Kadr o'lchamlari ma'lum bo'lishi uchun birinchi kadrni kutamiz
+        if wait:
+            with self._cond:
+                self._cond.wait_for(lambda: self._seq > 0 or self._stop.is_set(), timeout=wait)
+        return self
+
+    def _open(self):
+        cap = open_source(self.source, self.decode)
+        if cap.isOpened():
+            with self._cond:
+                self._props = {prop: cap.get(prop) for prop in CACHED_PROPS}
+                # Kichraytirishdan oldingi o'lcham: hududlar standart holda shu o'lchamda beriladi
+                self.native_size = (int(self._props[cv2.CAP_PROP_FRAME_WIDTH]),
+                                    int(self._props[cv2.CAP_PROP_FRAME_HEIGHT]))
+                if self.size is not None:
+                    self._props[cv2.CAP_PROP_FRAME_WIDTH], self._props[cv2.CAP_PROP_FRAME_HEIGHT] = self.size
+                self._props[cv2.CAP_PROP_FPS] = self._props[cv2.CAP_PROP_FPS] / self.every
+                self._opened = True
+        return cap
+
+    def _run(self):
+        backoff = self.backoff_initial
+        cap = self._open()
+        while not self._stop.is_set():
+            success, frame = cap.isOpened(), None
+            for _ in range(self.every - 1):
+                if not success:
+                    break
+                success = cap.grab()
+            if success:
+                success, frame = cap.read()
+            if not success:
+                cap.release()
+                with self._cond:
+                    self._opened = False
+                print(f"Kamera {self.name} bilan bog'lanishda xatolik. {backoff:.0f} soniyadan keyin qayta urinish...")
+                if self._stop.wait(backoff):
+                    break
+                backoff = min(backoff * 2, self.backoff_max)
+                self.reconnects += 1
+                cap = self._open()
+                continue
+
+            backoff = self.backoff_initial
+            if self.size is not None and (frame.shape[1], frame.shape[0]) != self.size:
+                frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+            with self._cond:
+                if self._seq > self._read_seq:
+                    # Oldingi kadr o'qilmay qoldi
+                    self.dropped += 1
+                self._frame = frame
+                self._frame_time = time.monotonic()
+                self._seq += 1
+                self.decoded += 1
+                self._cond.notify_all()
+        cap.release()
+
+    def read(self, timeout=1.0):
+        # Hali berilmagan eng yangi kadrni qaytaradi
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > self._read_seq or self._stop.is_set(), timeout=timeout):
+                return False, None
+            if self._seq <= self._read_seq:
+                return False, None
+            self._read_seq = self._seq
+            self.delivered += 1
+            self.last_lag = time.monotonic() - self._frame_time
+            self.max_lag = max(self.max_lag, self.last_lag)
+            return True, self._frame
+
+    def get(self, prop):
+        with self._cond:
+            return self._props.get(prop, 0.0)
+
+    def isOpened(self):
+        with self._cond:
+            return self._opened
+
+    def stats(self):
+        with self._cond:
+            return {
+                "connected": self._opened,
+                "decoded": self.decoded,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "reconnects": self.reconnects,
+                "lag_ms": self.last_lag * 1000,
+                "max_lag_ms": self.max_lag * 1000,
+            }
+
+    def release(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+def format_capture_stats(readers):
+    lines = []
+    for name, reader in sorted(readers.items(), key=lambda item: str(item[0])):
+        s = reader.stats()
+        state = "ulangan" if s["connected"] else "uzilgan"
+        lines.append(f"  Kamera {name}: {state}, o'qildi {s['decoded']}, ishlatildi {s['delivered']}, "
+                     f"tashlandi {s['dropped']}, kechikish {s['lag_ms']:.0f} ms (max {s['max_lag_ms']:.0f} ms), "
+                     f"qayta ulanish {s['reconnects']}")
+    return "\n".join(lines)
@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+import gzip
+import http.client
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import date, datetime
+from urllib.parse import parse_qs, urlsplit
+
+from days import DAY_START, parse_day_start
+from inference import collect_batch
+from store import PresenceStore, connect, range_totals, worker_totals
+
+# Bir nechta serverdagi oqim.py'lardan yopilgan qatnashish oraliqlarini yig'uvchi markaziy xizmat.
+# Hostlar --collector http://collector:9200 bilan ishga tushiriladi; collector barcha oraliqlarni bitta
+# SQLite bazasiga "host/kamera" nomi bilan yozadi, xodim (aniqlangan odam yoki hudud nomi) bo'yicha jami vaqt esa kameralar va
+# hostlar kesishmasi bir marta sanalgan holda hisoblanadi.
+# Misol: python collector.py --port 9200 --db collector.db
+#        python oqim.py --collector http://127.0.0.1:9200 --host-name ceh-1
+
+COLLECTOR_PORT = 9200
+COLLECTOR_DB = "collector.db"
+# Hostda oraliqlar shu oraliqda yoki shu miqdorga yetganda bitta so'rovda yuboriladi
+PUSH_INTERVAL = 2.0
+PUSH_BATCH_SIZE = 500
+# Collector ishlamayotganda hostda saqlanadigan yuborilmagan paketlar soni
+MAX_PENDING_BATCHES = 1000
+RETRY_MIN = 1.0
+RETRY_MAX = 60.0
+REQUEST_TIMEOUT = 10.0
+# Qayta yuborilgan paketlarni tanish uchun eslab qolinadigan paket ID'lari
+SEEN_BATCHES = 100000
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+def encode_events(host, batch_id, events):
+    # Ixcham paket: {"host", "batch", "events": [[kamera, hudud, boshlanish_ts, tugash_ts, xodim], ...]}, gzip
+    payload = {"host": host, "batch": batch_id, "events": events}
+    return gzip.compress(json.dumps(payload, separators=(",", ":")).encode(), compresslevel=5)
+
+
+class CollectorClient:
+    # Hostdagi yuboruvchi: PresenceStore bilan bir xil add_interval() chaqiruvi, yozuvlar alohida oqimda
+    # guruhlab yuboriladi. Bitta HTTP/1.1 ulanish qayta ishlatiladi; collector javob bermasa paket navbatda
+    # qoladi va ortib boruvchi kutishdan keyin o'sha ID bilan qayta yuboriladi (collector takrorni tashlaydi).
+    def __init__(self, url, host=None, batch_interval=PUSH_INTERVAL, batch_size=PUSH_BATCH_SIZE,
+                 max_pending=MAX_PENDING_BATCHES):
+        parsed = urlsplit(url if "://" in url else f"http://{url}")
+        self.address = (parsed.hostname, parsed.port or COLLECTOR_PORT)
+        self.path = parsed.path if parsed.path not in ("", "/") else "/events"
+        self.host = host or socket.gethostname()
+        self.batch_interval = batch_interval
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        # ID berilgan (yuborishga uringan yoki to'lgan) paketlar va hali to'ldirilayotgan paket
+        self._pending = deque(maxlen=max_pending)
+        self._filling = []
+        self._session = f"{os.getpid()}-{int(time.time())}"
+        self._seq = 0
+        self._conn = None
+        self._retry = RETRY_MIN
+        self._next_try = 0.0
+        self.sent = 0
+        self.requests = 0
+        self.failed = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="collector-client", daemon=True)
+        self._thread.start()
+
+    def add_interval(self, camera_id, area, start, end, person=None):
+        self._queue.put((str(camera_id), area, round(start.timestamp(), 3), round(end.timestamp(), 3), person))
+
+    def queue_depth(self):
+        return self._queue.qsize() + len(self._filling) + sum(len(events) for _, events in list(self._pending))
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            if self._pending:
+                # Collector javob bermayapti: yozuvlar oxirgi paketga yig'iladi, qayta urinish faqat
+                # kutish muddati o'tganda (har yangi oraliq uchun emas)
+                try:
+                    batch = [self._queue.get(timeout=max(0.0, self._next_try - time.monotonic()))]
+                except queue.Empty:
+                    batch = []
+            else:
+                batch = collect_batch(self._queue, self.batch_size, self.batch_interval)
+            stopping = None in batch
+            for item in batch:
+                if item is None:
+                    continue
+                self._filling.append(list(item))
+                if len(self._filling) >= self.batch_size:
+                    self._seal()
+            if stopping or time.monotonic() >= self._next_try:
+                self._seal()
+                self._send_pending()
+        if self._pending:
+            print(f"Collector: {sum(len(events) for _, events in self._pending)} ta oraliq yuborilmadi "
+                  f"(ular mahalliy bazada bor)")
+        if self._conn is not None:
+            self._conn.close()
+
+    def _seal(self):
+        # To'ldirilayotgan paketga ID beriladi; shundan keyin uning tarkibi o'zgarmaydi, chunki collector
+        # qayta yuborilgan paketni ID bo'yicha tashlaydi
+        if not self._filling:
+            return
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped += len(self._pending[0][1])
+        self._seq += 1
+        self._pending.append((f"{self.host}:{self._session}:{self._seq}", self._filling))
+        self._filling = []
+
+    def _send_pending(self):
+        while self._pending:
+            batch_id, events = self._pending[0]
+            try:
+                self._post(encode_events(self.host, batch_id, events))
+            except (OSError, http.client.HTTPException) as e:
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+                self.failed += 1
+                if self._retry == RETRY_MIN:
+                    print(f"Collector {self.address[0]}:{self.address[1]} ga yuborib bo'lmadi: {e}")
+                self._next_try = time.monotonic() + self._retry
+                self._retry = min(self._retry * 2, RETRY_MAX)
+                return
+            self._pending.popleft()
+            self.sent += len(events)
+            self._retry = RETRY_MIN
+            self._next_try = 0.0
+
+    def _post(self, body):
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(*self.address, timeout=REQUEST_TIMEOUT)
+        self._conn.request("POST", self.path, body, {"Content-Type": "application/json",
+                                                     "Content-Encoding": "gzip"})
+        response = self._conn.getresponse()
+        response.read()
+        self.requests += 1
+        if response.status != 200:
+            raise http.client.HTTPException(f"{response.status} {response.reason}")
+
+    def stats_line(self):
+        return (f"  Collector: yuborildi {self.sent} oraliq ({self.requests} so'rov), navbatda {self.queue_depth()}, "
+                f"xatoliklar {self.failed}, tashlab yuborildi {self.dropped}")
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+class Collector:
+    # asyncio HTTP server: hostlar ulanishni ochiq saqlab POST /events bilan paket yuboradi.
+    # GET /totals?day=YYYY-MM-DD - xodimlar bo'yicha (kameralar/hostlar kesishmasi bir marta) va
+    # host/kamera bo'yicha jami vaqt; GET /stats - hostlar bo'yicha qabul qilingan yozuvlar.
+    def __init__(self, store, seen_limit=SEEN_BATCHES):
+        self.store = store
+        self.seen = OrderedDict()
+        self.seen_limit = seen_limit
+        self.hosts = {}
+        self.duplicates = 0
+
+    def add_events(self, payload):
+        batch_id = payload.get("batch")
+        if batch_id is not None and batch_id in self.seen:
+            # Host javobni olmay qayta yuborgan paket
+            self.duplicates += 1
+            return {"ok": True, "duplicate": True}
+        host = str(payload["host"])
+        events = payload["events"]
+        for event in events:
+            camera_id, area, start, end = event[:4]
+            # Xodim maydoni qayta identifikatsiya yoqilgan hostlardan keladi
+            person = event[4] if len(event) > 4 else None
+            self.store.add_interval(f"{host}/{camera_id}", area, datetime.fromtimestamp(start),
+                                    datetime.fromtimestamp(end), person)
+        if batch_id is not None:
+            self.seen[batch_id] = True
+            if len(self.seen) > self.seen_limit:
+                self.seen.popitem(last=False)
+        stats = self.hosts.setdefault(host, {"events": 0, "batches": 0, "last": None})
+        stats["events"] += len(events)
+        stats["batches"] += 1
+        stats["last"] = datetime.now().isoformat(timespec="seconds")
+        return {"ok": True, "events": len(events)}
+
+    def totals(self, day):
+        # Bazaga o'qish alohida ulanishda (executor oqimida) bajariladi
+        conn = connect(self.store.path)
+        try:
+            cameras = {}
+            for camera_id, area, _, seconds in range_totals(conn, day, day):
+                cameras.setdefault(camera_id, {})[area] = round(seconds, 1)
+            workers = {area: round(seconds, 1) for area, seconds in worker_totals(conn, day, day).items()}
+        finally:
+            conn.close()
+        return {"day": day.isoformat(), "workers": workers, "cameras": cameras}
+
+    async def route(self, method, target, headers, body):
+        url = urlsplit(target)
+        if url.path == "/events":
+            if method != "POST":
+                return 405, {"error": "POST kerak"}
+            if headers.get("content-encoding") == "gzip":
+                body = gzip.decompress(body)
+            return 200, self.add_events(json.loads(body))
+        if url.path == "/totals":
+            day_text = parse_qs(url.query).get("day", [date.today().isoformat()])[0]
+            loop = asyncio.get_running_loop()
+            return 200, await loop.run_in_executor(None, self.totals, date.fromisoformat(day_text))
+        if url.path == "/stats":
+            return 200, {"hosts": self.hosts, "duplicates": self.duplicates, "store_queue": self.store.queue_depth()}
+        return 404, {"error": "topilmadi"}
+
+    async def handle(self, reader, writer):
+        # Bitta ulanishda ketma-ket so'rovlar (keep-alive); ulanish host yopguncha ochiq turadi
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                try:
+                    status, payload = await self.route(method, target, headers, body)
+                except (ValueError, KeyError, TypeError, OSError) as e:
+                    status, payload = 400, {"error": str(e)}
+                data = json.dumps(payload, separators=(",", ":")).encode()
+                writer.write(f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Collector: http://{host}:{port}/events (jami: /totals?day=YYYY-MM-DD)")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bir nechta hostdan qatnashish oraliqlarini yig'uvchi xizmat")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=COLLECTOR_PORT)
+    parser.add_argument("--db", default=COLLECTOR_DB)
+    parser.add_argument("--day-start", default=DAY_START, help="ish kuni chegarasi (HH:MM), hostlar bilan bir xil")
+    args = parser.parse_args()
+
+    store = PresenceStore(args.db, day_offset=parse_day_start(args.day_start))
+    try:
+        asyncio.run(Collector(store).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
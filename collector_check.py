@@ -0,0 +1,137 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from urllib.request import urlopen
+
+from collector import CollectorClient
+
+# Collector va ikkita yuboruvchi hostni alohida jarayonlarda ishga tushirib, birlashtirilgan jami vaqtni tekshirish.
+# Hostlar collector'dan oldin ishga tushadi, shuning uchun navbat va qayta urinish ham tekshiriladi.
+# Misol: python collector_check.py --intervals 2000
+
+WORKER = "Bahrombek"
+AREA = "Stanok"
+# Har bir oraliq uzunligi va hostlar orasidagi siljish (soniya): ikki host oraliqlari bir-birini qoplaydi
+STEP = 10
+LENGTH = 8
+SHIFT = 5
+FIRST_HOUR = 6
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def host_intervals(index, count, day):
+    base = datetime.combine(day, dt_time(FIRST_HOUR)) + timedelta(seconds=index * SHIFT)
+    for i in range(count):
+        start = base + timedelta(seconds=i * STEP)
+        yield start, start + timedelta(seconds=LENGTH)
+
+
+def expected_totals(count):
+    # Bir host: count * LENGTH. Ikki host oraliqlari uzluksiz zanjir hosil qiladi (SHIFT + LENGTH >= STEP),
+    # xodim bo'yicha kesishma bir marta sanaladi
+    return float(count * LENGTH), float((count - 1) * STEP + SHIFT + LENGTH)
+
+
+def close_to(value, expected):
+    return value is not None and abs(value - expected) < 0.5
+
+
+def push(args):
+    client = CollectorClient(args.url, host=args.host_name, batch_size=args.batch_size)
+    for start, end in host_intervals(args.index, args.intervals, date.fromisoformat(args.day)):
+        client.add_interval(0, AREA, start, end, WORKER)
+    deadline = time.monotonic() + args.timeout
+    while client.queue_depth() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    client.close()
+    print(client.stats_line())
+    return 0 if client.sent == args.intervals else 1
+
+
+def fetch_totals(port, day):
+    with urlopen(f"http://127.0.0.1:{port}/totals?day={day.isoformat()}", timeout=5) as response:
+        return json.load(response)
+
+
+def check(args):
+    day = date.today()
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    per_host, merged = expected_totals(args.intervals)
+    with tempfile.TemporaryDirectory() as directory:
+        clients = [subprocess.Popen([sys.executable, __file__, "--intervals", str(args.intervals),
+                                     "--batch-size", str(args.batch_size), "--timeout", str(args.timeout), "push",
+                                     "--url", url, "--host-name", f"ceh-{k + 1}", "--index", str(k),
+                                     "--day", day.isoformat()])
+                   for k in range(2)]
+        # Hostlar collector ishlamayotganda navbatga yig'adi
+        time.sleep(args.delay)
+        server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                "collector.py"),
+                                   "--host", "127.0.0.1", "--port", str(port),
+                                   "--db", os.path.join(directory, "collector.db")])
+        try:
+            codes = [client.wait(timeout=args.timeout + 30) for client in clients]
+            # Collector bazaga guruhlab yozadi: natija kutilgan qiymatga yetguncha so'raladi
+            deadline = time.monotonic() + args.timeout
+            totals = None
+            while time.monotonic() < deadline:
+                try:
+                    totals = fetch_totals(port, day)
+                except OSError:
+                    totals = None
+                if totals and close_to(totals["workers"].get(WORKER), merged):
+                    break
+                time.sleep(0.5)
+        finally:
+            server.terminate()
+            server.wait()
+    failures = []
+    if any(codes):
+        failures.append(f"hostlar chiqish kodlari: {codes}")
+    if totals is None:
+        failures.append("collector /totals javob bermadi")
+    else:
+        got = totals["workers"].get(WORKER)
+        if not close_to(got, merged):
+            failures.append(f"{WORKER}: {got} s, kutilgan {merged} s")
+        for k in range(2):
+            camera = totals["cameras"].get(f"ceh-{k + 1}/0", {}).get(AREA)
+            if not close_to(camera, per_host):
+                failures.append(f"ceh-{k + 1}/0 {AREA}: {camera} s, kutilgan {per_host} s")
+    for line in failures:
+        print(f"XATO: {line}")
+    if not failures:
+        print(f"OK: {WORKER} {merged} s (har bir host {per_host} s)")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collector va ikki hostni jarayonlarda ishga tushirib tekshirish")
+    parser.add_argument("--intervals", type=int, default=1000, help="har bir host yuboradigan oraliqlar soni")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--delay", type=float, default=1.5, help="collector shuncha soniyadan keyin ishga tushadi")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    sub = parser.add_subparsers(dest="command")
+    host = sub.add_parser("push", help="bitta host sifatida oraliqlarni yuborish (check ichidan chaqiriladi)")
+    host.add_argument("--url", required=True)
+    host.add_argument("--host-name", required=True)
+    host.add_argument("--index", type=int, default=0)
+    host.add_argument("--day", default=date.today().isoformat())
+    args = parser.parse_args()
+    sys.exit(push(args) if args.command == "push" else check(args))
+
+
+if __name__ == "__main__":
+    main()
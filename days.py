@@ -0,0 +1,194 @@
+import argparse
+import csv
+import json
+import os
+import tempfile
+import threading
+from datetime import date, datetime, time as dt_time, timedelta
+
+# Ish kuni chegarasi (mahalliy vaqt, HH:MM): hisoblagichlar shu paytda nolga tushadi
+DAY_START = "00:00"
+# Yopilgan kunlar papkasi: har bir kun/kamera uchun bitta CSV va hafta/oy yig'indilari
+DAYS_DIR = "days"
+# Excel fayllarida saqlanadigan oxirgi kunlar soni (eskilari yopilgan CSV'larda qoladi)
+KEEP_DAYS = 31
+
+
+def parse_day_start(text):
+    hours, _, minutes = str(text).partition(":")
+    return timedelta(hours=int(hours), minutes=int(minutes or 0))
+
+
+def work_day(when, offset=timedelta()):
+    # Vaqt qaysi ish kuniga tegishli: 05:00 chegarada 04:30 hali oldingi kun
+    return (when - offset).date()
+
+
+def day_boundary(day, offset=timedelta()):
+    # Ish kuni boshlanadigan payt
+    return datetime.combine(day, dt_time()) + offset
+
+
+def week_key(day):
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def month_key(day):
+    return f"{day.year}-{day.month:02d}"
+
+
+def replace_file(file_name, write, newline=None):
+    # Noyob vaqtinchalik fayl orqali atomar almashtirish: bir vaqtda yozayotgan oqimlar bir-birining
+    # .tmp faylini o'chirib yubormaydi
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(file_name) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", newline=newline) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, file_name)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
+def write_json(file_name, data):
+    replace_file(file_name, lambda f: json.dump(data, f, indent=1))
+
+
+class DayArchive:
+    # Tugagan kunlar arxivi. Kun yopilganda uning jami vaqtlari alohida kichik CSV faylga yoziladi
+    # (days/2024-06-01_camera_0.csv) va shu qiymatlar hafta va oy yig'indilariga qo'shiladi.
+    # Yig'indilar bitta JSON faylda yopilgan kunlar ro'yxati bilan birga atomar almashtiriladi,
+    # shuning uchun bir kun ikki marta qo'shilmaydi va hisobot uchun eski kunlar qayta o'qilmaydi.
+    # Barcha kamera oqimlari bitta arxivdan foydalanadi va kun chegarasida bir vaqtda yopadi,
+    # shuning uchun o'qish-o'zgartirish-yozish qulf ostida bajariladi.
+    def __init__(self, directory=DAYS_DIR):
+        self.directory = directory
+        self.aggregates_file = os.path.join(directory, "aggregates.json")
+        self.aggregates = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            return self._load()
+
+    def _load(self):
+        if self.aggregates is None:
+            self.aggregates = {"sealed": [], "weeks": {}, "months": {}}
+            if os.path.exists(self.aggregates_file):
+                try:
+                    with open(self.aggregates_file) as f:
+                        self.aggregates = json.load(f)
+                except (json.JSONDecodeError, OSError) as e:
+                    print(f"{self.aggregates_file} faylini o'qishda xatolik: {e}. Yig'indilar qayta hisoblanadi.")
+                    self._rebuild()
+        return self.aggregates
+
+    def day_file(self, camera_id, day):
+        return os.path.join(self.directory, f"{day.isoformat()}_camera_{camera_id}.csv")
+
+    def seal(self, camera_id, day, names, seconds):
+        # Bir kun bir kamera uchun faqat bir marta yopiladi (qayta ishga tushishda takrorlanmaydi)
+        with self._lock:
+            aggregates = self._load()
+            key = f"{day.isoformat()}/{camera_id}"
+            if key in aggregates["sealed"]:
+                return False
+            os.makedirs(self.directory, exist_ok=True)
+
+            def write_day(f):
+                writer = csv.writer(f)
+                writer.writerow(["Hudud", "Soniya"])
+                writer.writerows((name, round(value, 3)) for name, value in zip(names, seconds))
+
+            replace_file(self.day_file(camera_id, day), write_day, newline="")
+            # Xotiradagi yig'indilar faqat fayl yozilgandan keyin o'zgaradi
+            updated = json.loads(json.dumps(aggregates))
+            self.add(updated, str(camera_id), day, names, seconds)
+            updated["sealed"].append(key)
+            write_json(self.aggregates_file, updated)
+            self.aggregates = updated
+            return True
+
+    def add(self, aggregates, camera_id, day, names, seconds):
+        for period, bucket in ((week_key(day), "weeks"), (month_key(day), "months")):
+            areas = aggregates[bucket].setdefault(period, {}).setdefault(camera_id, {})
+            for name, value in zip(names, seconds):
+                areas[name] = areas.get(name, 0.0) + value
+
+    def totals(self, bucket, period):
+        # {kamera: {hudud: soniya}}; bucket - "weeks" yoki "months"
+        return self.load()[bucket].get(period, {})
+
+    def rebuild(self):
+        with self._lock:
+            return self._rebuild()
+
+    def _rebuild(self):
+        # Yig'indilarni barcha kun fayllaridan qaytadan hisoblash (faqat tiklash uchun)
+        aggregates = {"sealed": [], "weeks": {}, "months": {}}
+        if os.path.isdir(self.directory):
+            for file_name in sorted(os.listdir(self.directory)):
+                stem, ext = os.path.splitext(file_name)
+                if ext != ".csv" or "_camera_" not in stem:
+                    continue
+                day_text, _, camera_id = stem.partition("_camera_")
+                day = date.fromisoformat(day_text)
+                with open(os.path.join(self.directory, file_name), newline="") as f:
+                    rows = list(csv.reader(f))[1:]
+                self.add(aggregates, camera_id, day, [name for name, _ in rows], [float(value) for _, value in rows])
+                aggregates["sealed"].append(f"{day.isoformat()}/{camera_id}")
+            os.makedirs(self.directory, exist_ok=True)
+            write_json(self.aggregates_file, aggregates)
+        self.aggregates = aggregates
+        return aggregates
+
+
+def roll_journal(journal, archive, camera_id, current_time, offset=timedelta()):
+    # Jurnal (journal.TimeJournal) kuni tugagan bo'lsa: ochiq tashriflar kun chegarasida yopiladi, kun arxivga
+    # yoziladi va jurnal yangi kundan boshlanadi. (tugagan kun, jami vaqtlar, yopilgan oraliqlar) yoki None.
+    # Arxiv jurnal almashishidan oldin yoziladi: orada nosozlik bo'lsa kun qayta yopiladi, seal() takrorlamaydi.
+    day = work_day(current_time, offset)
+    if journal.day is None:
+        journal.set_day(day)
+        return None
+    if day <= journal.day:
+        return None
+    finished = journal.day
+    totals, intervals = journal.close_day(day_boundary(finished + timedelta(days=1), offset))
+    archive.seal(camera_id, finished, journal.names, [total.total_seconds() for total in totals])
+    journal.rollover(day)
+    return finished, totals, intervals
+
+
+def main():
+    from reports import format_duration
+
+    parser = argparse.ArgumentParser(description="Yopilgan kunlar bo'yicha haftalik va oylik hisobotlar")
+    parser.add_argument("--dir", default=DAYS_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    weekly = sub.add_parser("weekly")
+    weekly.add_argument("--day", type=date.fromisoformat, default=date.today(), help="haftaning istalgan kuni")
+    monthly = sub.add_parser("monthly")
+    monthly.add_argument("--month", default=month_key(date.today()), help="YYYY-MM")
+    sub.add_parser("rebuild", help="yig'indilarni kun fayllaridan qayta hisoblash")
+    args = parser.parse_args()
+
+    archive = DayArchive(args.dir)
+    if args.command == "rebuild":
+        aggregates = archive.rebuild()
+        print(f"{len(aggregates['sealed'])} ta kun qayta hisoblandi")
+        return
+    period = week_key(args.day) if args.command == "weekly" else args.month
+    totals = archive.totals("weeks" if args.command == "weekly" else "months", period)
+    print(period)
+    for camera_id, areas in sorted(totals.items()):
+        for name, seconds in sorted(areas.items()):
+            print(f"Kamera {camera_id}  {name}: {format_duration(timedelta(seconds=seconds))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,644 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+from areas import AreaIndex, AREA_OVERLAP, scale_polygons, scale_rectangles
+from capture import LatestFrameReader
+from days import DayArchive, DAY_START, day_boundary, parse_day_start, roll_journal, work_day
+from inference import person_boxes
+from journal import TimeJournal
+from metrics import Metrics
+from motion import RegionMotion, MotionGate, MOTION_REFRESH, format_gate_stats
+from recorder import VideoRecorder, SEGMENT_SECONDS
+from reid import PersonIdentifier, WorkerIndex, make_embedder, REID_THRESHOLD
+from reports import ReportWriter, format_duration
+from roi import RoiDetector, ROI_PADDING
+from sampling import AdaptiveSampler, IDLE_HZ, ACTIVE_HZ, BOOST_SECONDS, TOLERANCE
+from tracker import IouTracker, PresenceHysteresis, TRACK_IOU, TRACK_MAX_AGE, ENTER_SECONDS, EXIT_SECONDS
+
+# Kamera kadrlarini qayta ishlash dvigateli: manba -> detektor -> hudud moslagich -> vaqt hisobi -> sink'lar.
+# oqim.py, main.py, full.py va person.py shu dvigatelni faqat turli sozlamalar bilan ishga tushiradi.
+#   manba     - read()/get()/release() ga ega obyekt (LatestFrameReader, capture.open_source manzillari)
+#   detektor  - detect(kadrlar) -> har bir kadr uchun [(x1, y1, x2, y2, conf), ...]
+#   moslagich - membership(detections, frame_shape) ga ega obyekt (standart: areas.AreaIndex)
+#   sink      - update(engine, frame, now_ns, changed) va close(); True qaytarsa kamera to'xtaydi
+# Sozlamalar oqim.py dagi camera_config.json "options" kalitlari bilan bir xil.
+
+# Ishlayotgan kameralarning kadr o'quvchilari, sampler, harakat filtrlari, video yozuvchilari va
+# qayta identifikatsiya (statistika uchun)
+captures = {}
+samplers = {}
+gates = {}
+recorders = {}
+identifiers = {}
+# Konfiguratsiya qayta yuklanganda ishlayotgan kameralarni boshqarish
+controls = {}
+# Kadr oqimi bosqichlari vaqti va /metrics uchun ko'rsatkichlar
+metrics = Metrics()
+# O'zgarish bo'lmasa saqlovchiga holat shu oraliqda bir marta beriladi (jurnal flush, Excel, metrikalar)
+PERSIST_INTERVAL_NS = 1_000_000_000
+
+
+def load_time_data(camera_id, rectangles):
+    # Holat snapshot va jurnal qoldig'idan tiklanadi
+    journal = TimeJournal(f"time_data_{camera_id}", rectangles)
+    return journal.total_times, journal.start_times
+
+
+def to_ns(delta):
+    return (delta // timedelta(microseconds=1)) * 1000
+
+
+class SystemClock:
+    # Jonli oqim vaqti: hisob uchun time.monotonic_ns(), jurnal va kun chegarasi uchun datetime.now().
+    # Yozib olingan videoni qayta ishlashda o'rniga video vaqti beriladi (offline.VideoClock)
+    def monotonic_ns(self):
+        return time.monotonic_ns()
+
+    def now(self):
+        return datetime.now()
+
+
+SYSTEM_CLOCK = SystemClock()
+
+
+class AreaClock:
+    # Kamera hududlarining vaqt hisobi. Vaqt time.monotonic_ns() bo'yicha int64 massivlarda yuritiladi va har
+    # kadrda persons_detected vektoridan bitta vektor amalida yangilanadi, shuning uchun soat o'zgarishi (NTP,
+    # yozgi vaqt) jami vaqtni buzmaydi. Devor soati faqat o'tish paytida (boshlanish vaqti jurnal uchun) va
+    # saqlash/hisobot paytida ishlatiladi. Kirish/chiqish gisterezisi - tracker.PresenceHysteresis.
+    __slots__ = ("names", "totals_ns", "starts_ns", "start_times", "presence", "present", "time_source")
+
+    def __init__(self, names, total_times=None, start_times=None, enter_seconds=ENTER_SECONDS,
+                 exit_seconds=EXIT_SECONDS, time_source=SYSTEM_CLOCK):
+        count = len(names)
+        self.names = list(names)
+        self.time_source = time_source
+        self.totals_ns = np.array([to_ns(total) for total in total_times] if total_times else [0] * count,
+                                  dtype=np.int64)
+        # Ochiq tashrif boshlanishi: monotonic (hisob uchun) va devor soati (jurnal uchun)
+        self.start_times = list(start_times) if start_times else [None] * count
+        self.presence = PresenceHysteresis([start is not None for start in self.start_times],
+                                           enter_seconds=enter_seconds, exit_seconds=exit_seconds)
+        self.present = self.presence.present
+        self.starts_ns = np.zeros(count, dtype=np.int64)
+        if self.present.any():
+            # Saqlangan boshlanish vaqti hozirgi paytga nisbatan monotonic soatga o'giriladi
+            now_ns, now = time_source.monotonic_ns(), time_source.now()
+            for i in np.flatnonzero(self.present):
+                self.starts_ns[i] = now_ns - max(to_ns(now - self.start_times[i]), 0)
+
+    def update(self, detected, now_ns):
+        # Holat o'zgargan bo'lsa True qaytaradi
+        detected = np.asarray(detected, dtype=bool)
+        fired = self.presence.update(detected, now_ns)
+        if fired is None:
+            return False
+        entered = fired & detected
+        left = fired & ~detected
+        when_ns = self.presence.pending_ns
+        self.starts_ns[entered] = when_ns[entered]
+        self.totals_ns[left] += np.maximum(when_ns[left] - self.starts_ns[left], 0)
+        now = self.time_source.now()
+        for i in np.flatnonzero(fired).tolist():
+            self.start_times[i] = now - timedelta(microseconds=(now_ns - int(when_ns[i])) // 1000) \
+                if entered[i] else None
+        return True
+
+    def occupied(self):
+        return self.present.tolist()
+
+    def durations_ns(self, now_ns):
+        # Ochiq tashrif bilan birga jami vaqt
+        return self.totals_ns + np.where(self.present, now_ns - self.starts_ns, 0)
+
+    def wall_state(self):
+        # Saqlovchilar uchun (total_times, start_times): timedelta va datetime ro'yxatlari
+        return [timedelta(microseconds=total // 1000) for total in self.totals_ns.tolist()], list(self.start_times)
+
+    def rollover(self, boundary_ns, boundary_time):
+        # Ish kuni chegarasi: chegaragacha boshlangan ochiq tashriflar shu yerda yopilib, yangi kunda chegaradan
+        # davom etadi. Tugagan kun holatini wall_state() ko'rinishida qaytaradi, jami vaqtlar nolga tushadi.
+        crossing = self.present & (self.starts_ns < boundary_ns)
+        self.totals_ns[crossing] += boundary_ns - self.starts_ns[crossing]
+        finished = [timedelta(microseconds=total // 1000) for total in self.totals_ns.tolist()], [None] * len(self.names)
+        self.totals_ns[:] = 0
+        self.starts_ns[crossing] = boundary_ns
+        for i in np.flatnonzero(crossing).tolist():
+            self.start_times[i] = boundary_time
+        return finished
+
+    def remap(self, names, now_ns):
+        # Yangi hududlar ro'yxati uchun holat: nomi saqlangan hududlar davom etadi, yangilari noldan.
+        # Olib tashlangan hududlardagi ochiq tashrif eski holatning o'zida now_ns vaqtida yopiladi.
+        index = {name: i for i, name in enumerate(self.names)}
+        kept = set(names)
+        removed = np.array([name not in kept for name in self.names], dtype=bool) & self.present
+        if removed.any():
+            self.totals_ns[removed] += np.maximum(now_ns - self.starts_ns[removed], 0)
+            self.present[removed] = False
+            for i in np.flatnonzero(removed).tolist():
+                self.start_times[i] = None
+        clock = AreaClock(names, enter_seconds=self.presence.enter_ns / 1e9,
+                          exit_seconds=self.presence.exit_ns / 1e9, time_source=self.time_source)
+        for j, name in enumerate(names):
+            i = index.get(name)
+            if i is None:
+                continue
+            clock.totals_ns[j] = self.totals_ns[i]
+            clock.starts_ns[j] = self.starts_ns[i]
+            clock.presence.copy_area(self.presence, j, i)
+            clock.start_times[j] = self.start_times[i]
+        return clock
+
+
+class ModelDetector:
+    # Bitta jarayonli skriptlar uchun detektor: model scheduler'siz to'g'ridan-to'g'ri chaqiriladi
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, frames):
+        return [person_boxes([result]) for result in self.model(frames, verbose=False)]
+
+
+def make_sampler(rectangles, options):
+    if not options.get("adaptive"):
+        return None, None
+    sampler = AdaptiveSampler(idle_hz=options.get("idle_hz", IDLE_HZ), active_hz=options.get("active_hz", ACTIVE_HZ),
+                              boost_seconds=options.get("boost_seconds", BOOST_SECONDS),
+                              tolerance=options.get("tolerance", TOLERANCE))
+    return sampler, RegionMotion(rectangles)
+
+
+def make_gate(rectangles, options):
+    if not options.get("motion_gate"):
+        return None
+    return MotionGate(rectangles, method=options.get("motion_method", "diff"),
+                      threshold=options.get("motion_threshold"),
+                      refresh_interval=options.get("motion_refresh", MOTION_REFRESH))
+
+
+def make_tracker(options):
+    if not options.get("track"):
+        return None
+    return IouTracker(iou_threshold=options.get("track_iou", TRACK_IOU), max_age=options.get("track_max_age", TRACK_MAX_AGE))
+
+
+def make_recorder(camera_id, fps, options):
+    record = options.get("record", "all")
+    if record == "off":
+        return None
+    return VideoRecorder(options.get("record_name", f'output_camera_{camera_id}'), fps,
+                         scale=options.get("record_scale", 1.0), max_fps=options.get("record_fps"),
+                         segment_seconds=options.get("record_segment", SEGMENT_SECONDS) if record == "changes" else None)
+
+
+def make_identifier(options):
+    # Qayta identifikatsiya faqat xodimlar indeksi (reid.py enroll) berilganda yoqiladi
+    path = options.get("reid_index")
+    if not path:
+        return None
+    index = WorkerIndex.load(path, options.get("reid_threshold") or REID_THRESHOLD)
+    embedder = make_embedder(options.get("reid_model"), options.get("reid_input_size"), options.get("reid_mean"),
+                             options.get("reid_std"))
+    return PersonIdentifier(index, embedder)
+
+
+def make_area_index(rectangles, polygons, options):
+    return AreaIndex(rectangles, polygons, rule=options.get("area_rule", "corners"),
+                     min_overlap=options.get("area_overlap", AREA_OVERLAP))
+
+
+def draw_frame(frame, rectangles, detections, in_areas, clock, now_ns, labels=None, polygons=None, persons=None):
+    labels = labels or [f"Human: {conf}" for *_, conf in detections]
+    for (x1, y1, x2, y2, conf), in_area, label in zip(detections, in_areas, labels):
+        if in_area:
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
+    polygons = polygons or {}
+    persons = persons or {}
+    # Soat/minut/soniya matni faqat chizilganda hisoblanadi
+    durations = (clock.durations_ns(now_ns) // 1_000_000_000).tolist()
+    for i, ((name, (x, y, w, h)), seconds) in enumerate(zip(rectangles, durations)):
+        if name in polygons:
+            cv2.polylines(frame, [np.asarray(polygons[name], dtype=np.int32)], True, (255, 0, 0), 2)
+        else:
+            cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
+        cv2.putText(frame, name, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
+        label = f"{name} ({persons[name]})" if persons.get(name) else name
+        time_str = f"{label}: {format_duration(timedelta(seconds=seconds))}"
+        cv2.putText(frame, time_str, (20, 40 + i*40), cv2.FONT_HERSHEY_SIMPLEX, 1.3, (0, 0, 255), 3)
+
+
+class CameraControl:
+    # Ishlayotgan kamera oqimini tashqaridan boshqarish: to'xtatish va yangi hududlarni berish.
+    # Hududlar kamera oqimining o'zida, kadrlar orasida almashtiriladi.
+    def __init__(self):
+        self.stop = threading.Event()
+        self._lock = threading.Lock()
+        self._areas = None
+
+    def update_areas(self, rectangles, polygons):
+        with self._lock:
+            self._areas = (rectangles, polygons)
+
+    def take_areas(self):
+        with self._lock:
+            areas, self._areas = self._areas, None
+        return areas
+
+
+class OverlaySink:
+    # Hududlar, hududdagi odamlar va vaqtlarni kadrga chizish
+    stage = "draw"
+
+    def update(self, engine, frame, now_ns, changed):
+        draw_frame(frame, engine.rectangles, engine.detections, engine.in_areas, engine.clock, now_ns,
+                   engine.labels, engine.polygons, engine.persons)
+
+    def close(self):
+        pass
+
+
+class WindowSink:
+    # Kadrni oynada ko'rsatish; 'q' bosilsa kamera to'xtaydi
+    stage = "imshow"
+
+    def __init__(self, window_name, size=(640, 480)):
+        self.window_name = window_name
+        cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
+        cv2.resizeWindow(window_name, *size)
+
+    def update(self, engine, frame, now_ns, changed):
+        cv2.imshow(self.window_name, frame)
+        return cv2.waitKey(1) & 0xFF == ord('q')
+
+    def close(self):
+        cv2.destroyWindow(self.window_name)
+
+
+class RecorderSink:
+    # Kadrni VideoRecorder navbatiga berish; bandlik o'zgargan kadr changes rejimi uchun belgilanadi
+    stage = "write"
+
+    def __init__(self, camera_id, recorder):
+        self.camera_id = camera_id
+        self.recorder = recorder
+        recorders[camera_id] = recorder
+
+    def update(self, engine, frame, now_ns, changed):
+        if changed:
+            self.recorder.mark_change()
+        self.recorder.write(frame)
+
+    def close(self):
+        recorders.pop(self.camera_id, None)
+        self.recorder.release()
+
+
+class JournalPersistence:
+    # Bitta kamerali skriptlar uchun saqlovchi: jurnal (TimeJournal) va ixtiyoriy har minutlik Excel jurnali.
+    # Chaqiruvi oqim.TimePersistence bilan bir xil: persist(camera_id, total_times, start_times, rectangles, vaqt)
+    def __init__(self, base_name, time_log=None, excel_interval=60, day_start=DAY_START):
+        self.base_name = base_name
+        self.time_log = time_log
+        self.excel_interval = excel_interval
+        self.day_offset = parse_day_start(day_start)
+        self.archive = DayArchive()
+        self.writer = ReportWriter() if time_log is not None else None
+        self.journal = None
+        # Joriy ish kunining Excel qatorlari; kun almashganda yangi varaq boshlanadi
+        self.session_day = None
+        self.session_rows = []
+        self.last_excel_update = None
+
+    def restore(self, camera_id, rectangles):
+        if self.journal is None:
+            self.journal = TimeJournal(self.base_name, rectangles)
+            self.check_day(camera_id, rectangles, datetime.now())
+        return list(self.journal.total_times), list(self.journal.start_times)
+
+    def check_day(self, camera_id, rectangles, current_time):
+        rolled = roll_journal(self.journal, self.archive, camera_id, current_time, self.day_offset)
+        if rolled is None:
+            return
+        day, totals, _ = rolled
+        if self.time_log is not None:
+            self.update_excel(totals, rectangles, day_boundary(day + timedelta(days=1), self.day_offset), day)
+        print(f"{day.isoformat()} kuni yopildi")
+
+    def reconfigure(self, camera_id, rectangles):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        return self.restore(camera_id, rectangles)
+
+    def __call__(self, camera_id, total_times, start_times, rectangles, current_time):
+        if self.journal is None:
+            self.restore(camera_id, rectangles)
+        self.check_day(camera_id, rectangles, current_time)
+        self.journal.update(total_times, start_times)
+        if self.time_log is None:
+            return
+        if self.last_excel_update is None:
+            self.last_excel_update = current_time
+        elif (current_time - self.last_excel_update).total_seconds() >= self.excel_interval:
+            self.update_excel(total_times, rectangles, current_time, self.journal.day)
+            self.last_excel_update = current_time
+
+    def update_excel(self, total_times, rectangles, current_time, day):
+        # Excel fon oqimida yoziladi, kadr oqimi faqat yangi qatorni navbatga qo'yadi
+        if day != self.session_day:
+            self.session_day = day
+            self.session_rows = []
+        self.session_rows.append([current_time.strftime("%Y-%m-%d %H:%M:%S")] +
+                                 [format_duration(total_time) for total_time in total_times])
+        header = ["Vaqt"] + [name for name, _ in rectangles]
+        self.writer.submit((self.time_log.file_name, day), self.time_log.write, header, day.isoformat(),
+                           tuple(self.session_rows))
+        if any(gates.values()):
+            print(format_gate_stats(gates))
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        if self.writer is not None:
+            self.writer.close()
+
+
+class CameraEngine:
+    # Bitta kameraning kadr sikli: o'qish, aniqlash (sampler, harakat filtri, trekker bilan), hududlarga moslash,
+    # kirish/chiqish gisterezisi, vaqt hisobi, saqlash va sink'lar. Har bir bosqich vaqti metrics'ga yoziladi.
+    # time_source - monotonic_ns() va now() ga ega soat (standart: tizim soati)
+    def __init__(self, camera_id, source, detect, rectangles, persist=None, options=None, matcher=make_area_index,
+                 time_source=SYSTEM_CLOCK):
+        self.camera_id = camera_id
+        self.time_source = time_source
+        self.source = source
+        self.base_detect = detect
+        self.persist = persist
+        self.options = options or {}
+        self.matcher = matcher
+        self.sinks = []
+        self.control = controls.get(camera_id)
+        # Kadr o'lchami birinchi kadrdan olinadi (kamera kechroq ulanishi mumkin), hududlar, ROI va moslagich
+        # shunda quriladi. Shu paytgacha hududlar konfiguratsiyadagi ko'rinishda turadi (nomlar uchun)
+        self.frame_size = None
+        self.area_config = (rectangles, self.options.get("polygons"))
+        self.rectangles = rectangles
+        self.polygons = self.options.get("polygons")
+        self.detect = detect
+        self.areas = None
+        self.sampler = self.motion = self.gate = None
+
+        # Qayta ishga tushgan kamera holatni saqlovchidan oladi (jurnaldagi oxirgi holat)
+        if hasattr(persist, "restore"):
+            total_times, start_times = persist.restore(camera_id, self.rectangles)
+        elif persist is not None:
+            total_times, start_times = load_time_data(camera_id, self.rectangles)
+        else:
+            total_times, start_times = None, None
+        # Kirish/chiqish faqat enter_seconds/exit_seconds davom etgandan keyin qayd qilinadi
+        self.clock = AreaClock([name for name, _ in self.rectangles], total_times, start_times,
+                               enter_seconds=self.options.get("enter_seconds", ENTER_SECONDS),
+                               exit_seconds=self.options.get("exit_seconds", EXIT_SECONDS), time_source=time_source)
+        # Trekker yoqilganda model har detect_every-kadrda ishlaydi, oradagi kadrlarda odamlar
+        # trek bashorati bo'yicha kuzatiladi
+        self.tracker = make_tracker(self.options)
+        self.detect_every = max(1, self.options.get("detect_every", 1)) if self.tracker is not None else 1
+        # --profile rejimida shuncha kadrdan keyin to'xtaydi
+        self.profile_frames = self.options.get("profile_frames")
+        # Joriy ish kuni: chegaradan o'tganda hisoblagichlar yangi kunga o'tadi
+        self.day_offset = parse_day_start(self.options.get("day_start") or DAY_START)
+        self.day = work_day(time_source.now(), self.day_offset)
+
+        # Qayta identifikatsiya: vektor faqat hududga kirish o'tishida hisoblanadi
+        self.identifier = make_identifier(self.options)
+        identifiers[camera_id] = self.identifier
+        # Hudud nomi -> ochiq tashrif egasi (aniqlanmasa None)
+        self.persons = {}
+
+        self.detections = []
+        self.membership = None
+        self.track_ids = None
+        self.in_areas = []
+        self.labels = None
+        self.persons_detected = [False for _ in range(len(self.rectangles))]
+
+    def setup_areas(self, rectangles, polygons):
+        # Hududlarga bog'liq hamma narsa shu yerda quriladi: konfiguratsiya qayta yuklanganda
+        # kamera uzilmasdan kadrlar orasida almashtiriladi
+        options = self.options
+        # Berilmasa manbaning asl o'lchami (decode.width/height kichraytirishdan oldingi)
+        reference_size = options.get("reference_size") or getattr(self.source, "native_size", None)
+        if reference_size and all(reference_size) and tuple(reference_size) != self.frame_size:
+            # Hududlar asosiy oqim o'lchamida berilgan, kadr esa substream yoki kichraytirilgan
+            rectangles = scale_rectangles(rectangles, reference_size, self.frame_size)
+            if polygons:
+                polygons = scale_polygons(polygons, reference_size, self.frame_size)
+        self.rectangles = rectangles
+        self.polygons = polygons
+        self.detect = self.base_detect
+        if options.get("roi"):
+            self.detect = RoiDetector(self.base_detect, rectangles, padding=options.get("roi_padding", ROI_PADDING),
+                                      name=self.camera_id)
+        # Adaptiv rejimda oxirgi aniqlash natijasi keyingi aniqlashgacha ishlatiladi
+        self.sampler, self.motion = make_sampler(rectangles, options)
+        self.gate = make_gate(rectangles, options)
+        if self.sampler is not None and self.gate is not None:
+            # Ikkalasi ham referensni inference paytida yangilaydi, shuning uchun bitta hisob yetadi
+            self.motion = self.gate.motion
+        samplers[self.camera_id] = self.sampler
+        gates[self.camera_id] = self.gate
+        # Hudud maskasi yoki quti massivi bir marta tayyorlanadi
+        self.areas = self.matcher(rectangles, polygons, options)
+
+    def reconfigure(self, rectangles, polygons):
+        # Yangi hududlar kadrlar orasida almashtiriladi; nomi saqlangan hududlar vaqti davom etadi
+        clock = self.clock.remap([name for name, _ in rectangles], self.time_source.monotonic_ns())
+        if self.persist is not None:
+            # Olib tashlangan hududlarda yopilgan tashriflar eski hududlar ro'yxati bilan yoziladi
+            self.persist(self.camera_id, *self.clock.wall_state(), self.rectangles, self.time_source.now())
+        self.area_config = (rectangles, polygons)
+        self.setup_areas(rectangles, polygons)
+        self.clock = clock
+        if hasattr(self.persist, "reconfigure"):
+            self.persist.reconfigure(self.camera_id, self.rectangles)
+        self.persons_detected = self.clock.occupied()
+        self.in_areas = []
+        print(f"Kamera {self.camera_id}: hududlar yangilandi ({', '.join(name for name, _ in self.rectangles)})")
+
+    def identify_entries(self, frame, before):
+        # Yangi kirgan hududlar uchun hududdagi eng ishonchli odam qutisi qirqilib xodimlar indeksida qidiriladi
+        for i in np.flatnonzero(self.clock.present & ~before).tolist():
+            person = None
+            if self.membership is not None and len(self.detections):
+                rows = np.flatnonzero(self.membership[:, i]).tolist()
+                if rows:
+                    row = max(rows, key=lambda r: self.detections[r][4])
+                    key = self.track_ids[row] if self.track_ids is not None else None
+                    person = self.identifier.identify(frame, self.detections[row], key)
+            name = self.clock.names[i]
+            self.persons[name] = person
+            if hasattr(self.persist, "identify"):
+                self.persist.identify(self.camera_id, name, person)
+
+    def rollover(self, now_ns, current_time):
+        # Ochiq tashriflar kun chegarasida yopilib yangi kunda chegaradan davom etadi
+        day = work_day(current_time, self.day_offset)
+        boundary = day_boundary(day, self.day_offset)
+        finished = self.clock.rollover(now_ns - max(to_ns(current_time - boundary), 0), boundary)
+        if self.persist is not None:
+            # Tugagan kunning yakuniy holati eski kun vaqti bilan beriladi, saqlovchi kunni shu holat bilan yopadi
+            self.persist(self.camera_id, *finished, self.rectangles, boundary - timedelta(microseconds=1))
+        self.day = day
+        print(f"Kamera {self.camera_id}: yangi ish kuni {day.isoformat()}")
+
+    def run(self):
+        camera_id = self.camera_id
+        source = self.source
+        control = self.control
+        time_source = self.time_source
+        frame_index = 0
+        tracks = []
+        next_persist = 0
+        while True:
+            if control is not None and control.stop.is_set():
+                # Kamera konfiguratsiyadan olib tashlangan yoki manzili o'zgargan
+                break
+            # Qayta ulanishni LatestFrameReader o'zi bajaradi
+            t = time.perf_counter()
+            success, frame = source.read()
+            if not success:
+                continue
+            t = read_done = metrics.stage(camera_id, "read", t)
+            size = (frame.shape[1], frame.shape[0])
+            if size != self.frame_size:
+                # Birinchi kadr yoki oqim o'lchami o'zgardi: hududlar shu o'lchamga qayta quriladi
+                self.frame_size = size
+                self.setup_areas(*self.area_config)
+
+            update = control.take_areas() if control is not None else None
+            if update is not None:
+                self.reconfigure(*update)
+            sampler, motion, gate, tracker = self.sampler, self.motion, self.gate, self.tracker
+
+            now_ns = time_source.monotonic_ns()
+            now = now_ns / 1e9
+            run_model = frame_index % self.detect_every == 0
+            frame_index += 1
+            if run_model and sampler is not None:
+                if not sampler.due(now) and not sampler.boosted(now) and any(motion.changed(frame)):
+                    # Hudud atrofida harakat bo'lsa aniqlash chastotasini oshiramiz
+                    sampler.boost(now)
+                run_model = sampler.due(now)
+                if not run_model:
+                    sampler.skip()
+            if run_model and gate is not None:
+                # Hududlarda o'zgarish bo'lmasa oldingi natija qayta ishlatiladi
+                run_model = gate.should_infer(frame, now)
+            if update is not None:
+                # Yangi hududlar bo'yicha birinchi natija darhol olinadi
+                run_model = True
+            if sampler is not None or gate is not None:
+                t = metrics.stage(camera_id, "gate", t)
+
+            if run_model:
+                self.detections = self.detect([frame])[0]
+                t = metrics.stage(camera_id, "inference", t)
+                if tracker is not None:
+                    tracks = tracker.update(self.detections, now)
+            elif tracker is not None:
+                tracks = tracker.predict(now)
+
+            if tracker is not None:
+                self.detections = [track.detection() for track in tracks]
+                self.labels = [f"ID {track.id}: {track.conf:.2f}" for track in tracks]
+                self.track_ids = [track.id for track in tracks]
+            if run_model or tracker is not None:
+                membership, detected = self.areas.membership(self.detections, frame.shape)
+                self.membership = membership
+                self.in_areas = membership.any(axis=1).tolist()
+                self.persons_detected = detected
+            if run_model:
+                if sampler is not None:
+                    sampler.observe(now, self.persons_detected)
+                    motion.reset(frame)
+                if gate is not None:
+                    gate.inferred(frame, now)
+
+            before = self.clock.present.copy() if self.identifier is not None else None
+            changed = self.clock.update(self.persons_detected, now_ns)
+            t = metrics.stage(camera_id, "postprocess", t)
+            if changed and before is not None:
+                self.identify_entries(frame, before)
+                t = metrics.stage(camera_id, "reid", t)
+
+            # Saqlovchi o'tishda va PERSIST_INTERVAL'da bir marta chaqiriladi: devor soati (kun chegarasi ham)
+            # va timedelta/datetime ro'yxatlari faqat shu yerda yasaladi
+            if changed or now_ns >= next_persist:
+                next_persist = now_ns + PERSIST_INTERVAL_NS
+                current_time = time_source.now()
+                if work_day(current_time, self.day_offset) > self.day:
+                    self.rollover(now_ns, current_time)
+                if self.persist is not None:
+                    self.persist(camera_id, *self.clock.wall_state(), self.rectangles, current_time)
+                    t = metrics.stage(camera_id, "persist", t)
+
+            stop = False
+            for sink in self.sinks:
+                stop = sink.update(self, frame, now_ns, changed) or stop
+                t = metrics.stage(camera_id, sink.stage, t)
+            # Kadr dekodlanganidan shu kadr bo'yicha barcha ish tugaguncha
+            metrics.observe(camera_id, "latency", getattr(source, "last_lag", 0.0) + t - read_done)
+            metrics.frame(camera_id)
+
+            if stop:
+                break
+            if self.profile_frames and frame_index >= self.profile_frames:
+                break
+
+    def close(self):
+        # Xatolikda ham resurslar bo'shatiladi, shunda kamera toza holatda qayta ishga tushadi
+        self.source.release()
+        captures.pop(self.camera_id, None)
+        samplers.pop(self.camera_id, None)
+        gates.pop(self.camera_id, None)
+        identifiers.pop(self.camera_id, None)
+        for sink in self.sinks:
+            sink.close()
+
+
+def open_camera(camera_id, url, options=None):
+    # RTSP, fayl, veb-kamera raqami yoki synthetic:/loop: manzillari (capture.open_source)
+    cap = LatestFrameReader(url, name=camera_id, decode=(options or {}).get("decode")).start()
+    captures[camera_id] = cap
+    return cap
+
+
+def run_camera(camera_id, url, rectangles, detect, persist, options=None, window_name=None):
+    # Standart yig'ilma: manba, headless bo'lmasa chizish va oyna, video yozish.
+    # detect: kadrlar ro'yxatini oladi va har biri uchun odam qutilari ro'yxatini qaytaradi
+    options = options or {}
+    source = open_camera(camera_id, url, options)
+    try:
+        engine = CameraEngine(camera_id, source, detect, rectangles, persist, options)
+    except Exception:
+        source.release()
+        captures.pop(camera_id, None)
+        raise
+    try:
+        # Headless rejimda chizish va oyna umuman bo'lmaydi
+        if not options.get("headless", False):
+            engine.sinks += [OverlaySink(), WindowSink(window_name or f"Human Detection - Camera {camera_id}")]
+        out = make_recorder(camera_id, source.get(cv2.CAP_PROP_FPS), options)
+        if out is not None:
+            engine.sinks.append(RecorderSink(camera_id, out))
+        engine.run()
+    finally:
+        engine.close()
@@ -0,0 +1,173 @@
+import queue
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+
+def to_numpy(values):
+    return values.cpu().numpy() if hasattr(values, "cpu") else np.asarray(values)
+
+
+def person_boxes(results):
+    # Model natijalaridan faqat odamlarni (x1, y1, x2, y2, conf) ko'rinishida ajratish.
+    # Qutilar har birini int() bilan alohida o'girish o'rniga bitta massiv sifatida olinadi.
+    detections = []
+    for r in results:
+        boxes = r.boxes
+        if boxes is None or len(boxes) == 0:
+            continue
+        people = to_numpy(boxes.cls) == 0  # 0 - odam sinfi
+        xywh = to_numpy(boxes.xywh)[people]
+        conf = np.ceil(to_numpy(boxes.conf)[people] * 100) / 100
+        x1 = (xywh[:, 0] - xywh[:, 2] / 2).astype(int)
+        y1 = (xywh[:, 1] - xywh[:, 3] / 2).astype(int)
+        x2 = (xywh[:, 0] + xywh[:, 2] / 2).astype(int)
+        y2 = (xywh[:, 1] + xywh[:, 3] / 2).astype(int)
+        detections.extend(zip(x1.tolist(), y1.tolist(), x2.tolist(), y2.tolist(), conf.tolist()))
+    return detections
+
+
+def collect_batch(requests, max_batch_size, max_wait):
+    # Birinchi so'rovni kutamiz, keyin max_wait ichida batchni to'ldirishga harakat qilamiz
+    batch = [requests.get()]
+    deadline = time.monotonic() + max_wait
+    while len(batch) < max_batch_size and batch[-1] is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(requests.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+
+class ThroughputMeter:
+    # Kamera bo'yicha va umumiy kadr/s hisoblagich
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frames = defaultdict(int)
+        self._batches = 0
+        self._since = time.monotonic()
+
+    def add(self, camera_ids):
+        with self._lock:
+            for camera_id in camera_ids:
+                self._frames[camera_id] += 1
+            self._batches += 1
+
+    def snapshot(self, reset=True):
+        with self._lock:
+            now = time.monotonic()
+            elapsed = max(now - self._since, 1e-9)
+            frames = dict(self._frames)
+            batches = self._batches
+            if reset:
+                self._frames.clear()
+                self._batches = 0
+                self._since = now
+        total = sum(frames.values())
+        return {
+            "elapsed": elapsed,
+            "total_fps": total / elapsed,
+            "camera_fps": {camera_id: count / elapsed for camera_id, count in frames.items()},
+            "avg_batch": total / batches if batches else 0.0,
+        }
+
+
+def format_throughput(stats):
+    lines = [f"Inference: jami {stats['total_fps']:.1f} kadr/s, o'rtacha batch {stats['avg_batch']:.1f}"]
+    for camera_id, fps in sorted(stats["camera_fps"].items(), key=lambda item: str(item[0])):
+        lines.append(f"  Kamera {camera_id}: {fps:.1f} kadr/s")
+    return "\n".join(lines)
+
+
+class InferenceRequest:
+    __slots__ = ("camera_id", "frame", "done", "result", "error")
+
+    def __init__(self, camera_id, frame):
+        self.camera_id = camera_id
+        self.frame = frame
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class InferenceScheduler:
+    # Kamera oqimlari kadrlarni navbatga qo'yadi, scheduler ularni batchga yig'ib
+    # bitta model(...) chaqiruvi bilan ishlaydi va natijani har bir kameraga qaytaradi
+    def __init__(self, model, max_batch_size=8, max_wait=0.02):
+        self.model = model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait))
+        self.meter = ThroughputMeter()
+        self._requests = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._requests.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, camera_id, frame):
+        request = InferenceRequest(camera_id, frame)
+        self._requests.put(request)
+        return request
+
+    def infer(self, camera_id, frame, timeout=None):
+        request = self.submit(camera_id, frame)
+        if not request.done.wait(timeout):
+            raise TimeoutError(f"Kamera {camera_id} uchun inference natijasi kelmadi")
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def detect(self, camera_id, frame, timeout=None):
+        return person_boxes([self.infer(camera_id, frame, timeout)])
+
+    def detect_many(self, camera_id, frames, timeout=None):
+        # Bir kameraning bir nechta kadri (masalan, ROI qismlari) bitta batchga tushadi
+        requests = [self.submit(camera_id, frame) for frame in frames]
+        detections = []
+        for request in requests:
+            if not request.done.wait(timeout):
+                raise TimeoutError(f"Kamera {camera_id} uchun inference natijasi kelmadi")
+            if request.error is not None:
+                raise request.error
+            detections.append(person_boxes([request.result]))
+        return detections
+
+    def queue_depth(self):
+        return self._requests.qsize()
+
+    def _run(self):
+        while True:
+            batch = collect_batch(self._requests, self.max_batch_size, self.max_wait)
+            stopping = batch[-1] is None
+            batch = [request for request in batch if request is not None]
+            if batch:
+                self._run_batch(batch)
+            if stopping:
+                break
+
+    def _run_batch(self, batch):
+        try:
+            results = self.model([request.frame for request in batch], verbose=False)
+            for request, result in zip(batch, results):
+                request.result = result
+        except Exception as e:
+            for request in batch:
+                request.error = e
+        finally:
+            self.meter.add([request.camera_id for request in batch])
+            for request in batch:
+                request.done.set()
@@ -0,0 +1,209 @@
+import json
+import os
+import shutil
+import time
+from datetime import date, datetime, timedelta
+
+# Jurnal diskka shu oraliqda yoziladi: nosozlikda ko'pi bilan shuncha vaqtdagi o'tishlar yo'qoladi
+FLUSH_INTERVAL = 1.0
+# Jurnal shu oraliqda snapshot'ga siqiladi (soniya)
+COMPACT_INTERVAL = 300.0
+
+
+def legacy_areas(data, names):
+    # Eski time_data.json formatlari: full.py - hudud nomi bo'yicha, main.py - "area_0".."area_N" (hududlar
+    # tartibi bo'yicha), person.py - bitta hudud uchun {"total_time", "start_time"}.
+    # Hudud nomlari bo'yicha lug'at va indeks/tekis kalitdan ko'chirilgan hudud nomlari qaytariladi.
+    areas, moved = {}, []
+    for i, name in enumerate(names):
+        if isinstance(data.get(name), dict):
+            areas[name] = data[name]
+        elif isinstance(data.get(f"area_{i}"), dict):
+            areas[name] = data[f"area_{i}"]
+            moved.append(name)
+        elif i == 0 and "total_time" in data:
+            areas[name] = {"total_time": data["total_time"], "start_time": data.get("start_time")}
+            moved.append(name)
+    return areas, moved
+
+
+def read_snapshot(filename, names=None):
+    # Yangi format: {"seq": n, "day": "YYYY-MM-DD", "areas": {...}}; eski time_data JSON'i ham o'qiladi.
+    # names berilsa eski indeks kalitlari hudud nomlariga o'giriladi va asl fayl .legacy nusxada qoladi
+    # (birinchi compact() uni yangi formatda qayta yozadi).
+    with open(filename, "r") as f:
+        data = json.load(f)
+    if "areas" in data:
+        day = data.get("day")
+        return data.get("seq", 0), date.fromisoformat(day) if day else None, data["areas"]
+    if names is None:
+        return 0, None, data
+    areas, moved = legacy_areas(data, names)
+    if moved:
+        backup = f"{filename}.legacy"
+        if not os.path.exists(backup):
+            shutil.copy2(filename, backup)
+        print(f"{filename}: eski formatdagi vaqtlar hududlar tartibi bo'yicha ko'chirildi ({', '.join(moved)}). "
+              f"Asl fayl: {backup}")
+    return 0, None, areas
+
+
+class TimeJournal:
+    # time_data JSON'ini har kadrda qayta yozish o'rniga faqat kirish/chiqish o'tishlarini
+    # jurnal fayliga qo'shib boradi va vaqti-vaqti bilan snapshot'ga siqadi.
+    # Qayta ishga tushganda holat snapshot + jurnal qoldig'idan tiklanadi.
+    # day - jami vaqtlar tegishli ish kuni (eski fayllarda None); kun almashganda rollover() chaqiriladi.
+    def __init__(self, base_name, rectangles, flush_interval=FLUSH_INTERVAL, compact_interval=COMPACT_INTERVAL):
+        self.snapshot_file = f"{base_name}.json"
+        self.journal_file = f"{base_name}.journal"
+        self.names = [name for name, _ in rectangles]
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._last_compact = time.monotonic()
+        self._dirty = False
+        self.seq = 0
+        self.day = None
+        self.total_times, self.start_times = self.load()
+
+    def load(self):
+        totals = {name: timedelta() for name in self.names}
+        starts = {name: None for name in self.names}
+        snapshot_seq = 0
+        if os.path.exists(self.snapshot_file):
+            try:
+                snapshot_seq, self.day, areas = read_snapshot(self.snapshot_file, self.names)
+                for name in self.names:
+                    area_data = areas.get(name, {"total_time": 0, "start_time": None})
+                    totals[name] = timedelta(seconds=area_data["total_time"])
+                    starts[name] = datetime.fromisoformat(area_data["start_time"]) if area_data["start_time"] else None
+            except (json.JSONDecodeError, KeyError, ValueError, TypeError):
+                print(f"{self.snapshot_file} faylini o'qishda xatolik. Yangi ma'lumotlar yaratilmoqda.")
+        self.seq = snapshot_seq
+
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, "r") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Nosozlik paytida yarim yozilgan oxirgi qator
+                        break
+                    if event["seq"] <= snapshot_seq:
+                        # Snapshot'ga kirgan, lekin jurnal hali tozalanmagan yozuvlar
+                        continue
+                    self.seq = event["seq"]
+                    if event["event"] == "day":
+                        # Yangi ish kuni: jami vaqtlar noldan
+                        self.day = date.fromisoformat(event["day"])
+                        totals = {name: timedelta() for name in self.names}
+                        starts = {name: None for name in self.names}
+                        continue
+                    name = event["area"]
+                    if name not in totals:
+                        continue
+                    if event["event"] == "enter":
+                        starts[name] = datetime.fromisoformat(event["time"])
+                    elif event["event"] == "exit":
+                        totals[name] = timedelta(seconds=event["total_time"])
+                        starts[name] = None
+
+        return [totals[name] for name in self.names], [starts[name] for name in self.names]
+
+    def _append(self, name, event, when, total_time=None):
+        self.seq += 1
+        record = {"seq": self.seq, "area": name, "event": event, "time": when.isoformat()}
+        if total_time is not None:
+            record["total_time"] = total_time.total_seconds()
+        self._buffer.append(json.dumps(record))
+        self._dirty = True
+
+    def update(self, total_times, start_times):
+        # Oxirgi ma'lum holat bilan solishtirib faqat o'zgarishlarni yozadi.
+        # Yopilgan qatnashish oraliqlarini [(hudud, boshlanish, tugash), ...] qaytaradi.
+        intervals = []
+        for i, name in enumerate(self.names):
+            old_total, old_start = self.total_times[i], self.start_times[i]
+            new_total, new_start = total_times[i], start_times[i]
+            if new_total != old_total:
+                duration = new_total - old_total
+                if old_start is not None:
+                    exit_time = old_start + duration
+                else:
+                    exit_time = new_start or datetime.now()
+                self._append(name, "exit", exit_time, new_total)
+                if duration > timedelta():
+                    intervals.append((name, exit_time - duration, exit_time))
+            if new_start is not None and new_start != old_start:
+                self._append(name, "enter", new_start)
+        self.total_times = list(total_times)
+        self.start_times = list(start_times)
+
+        now = time.monotonic()
+        if self._buffer and now - self._last_flush >= self.flush_interval:
+            self.flush()
+        if self._dirty and now - self._last_compact >= self.compact_interval:
+            self.compact()
+        return intervals
+
+    def set_day(self, day):
+        # Kuni noma'lum (eski) holat uchun; keyingi snapshot'ga yoziladi
+        self.day = day
+        self._dirty = True
+
+    def close_day(self, boundary):
+        # Ish kuni tugadi: ochiq tashriflar boundary'da yopiladi.
+        # Tugagan kunning jami vaqtlari va yopilgan oraliqlarni qaytaradi.
+        totals = [total + max(boundary - start, timedelta()) if start is not None else total
+                  for total, start in zip(self.total_times, self.start_times)]
+        return totals, self.update(totals, [None] * len(self.names))
+
+    def rollover(self, day):
+        # Hisob yangi ish kuni uchun noldan boshlanadi (tugagan kun arxivlangandan keyin chaqiriladi)
+        self.seq += 1
+        self._buffer.append(json.dumps({"seq": self.seq, "event": "day", "day": day.isoformat()}))
+        self.total_times = [timedelta() for _ in self.names]
+        self.start_times = [None] * len(self.names)
+        self.day = day
+        self.compact()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        with open(self.journal_file, "a") as f:
+            f.write("\n".join(self._buffer) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._buffer.clear()
+
+    def compact(self):
+        # Avval snapshot atomar almashtiriladi, keyin jurnal tozalanadi.
+        # Orada nosozlik bo'lsa, seq bo'yicha eski yozuvlar qayta qo'llanilmaydi.
+        self.flush()
+        data = {
+            "seq": self.seq,
+            "day": self.day.isoformat() if self.day else None,
+            "areas": {
+                name: {
+                    "total_time": total_time.total_seconds(),
+                    "start_time": start_time.isoformat() if start_time else None
+                } for name, total_time, start_time in zip(self.names, self.total_times, self.start_times)
+            },
+        }
+        tmp_file = f"{self.snapshot_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.snapshot_file)
+        open(self.journal_file, "w").close()
+        self._last_compact = time.monotonic()
+        self._dirty = False
+
+    def close(self):
+        if self._dirty:
+            self.compact()
+        else:
+            self.flush()
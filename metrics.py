@@ -0,0 +1,199 @@
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Bosqich kechikishlari uchun histogram chegaralari (soniya)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+METRICS_PORT = 9108
+# process_camera bosqichlari chiqarilish tartibi
+STAGES = ("read", "gate", "inference", "postprocess", "reid", "persist", "draw", "imshow", "write")
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        # Bucket chegarasi bo'yicha taxminiy qiymat
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    # Kadr oqimidagi bosqichlar vaqti va kameralar bo'yicha hisoblagichlar.
+    # Navbatlar chuqurligi va qayta ulanishlar kabi holatlar so'ralgan paytda collector'lardan olinadi.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._frames = {}
+        self._collectors = []
+        # Kadr/s birinchi kadrdan boshlab hisoblanadi (model yuklanishi kirmaydi)
+        self.first_frame = None
+
+    def stage(self, camera_id, name, started):
+        # Bosqich vaqtini yozib, keyingi bosqich uchun boshlanish vaqtini qaytaradi
+        now = time.perf_counter()
+        self.observe(camera_id, name, now - started)
+        return now
+
+    def observe(self, camera_id, name, seconds):
+        key = (str(camera_id), name)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def frame(self, camera_id):
+        camera_id = str(camera_id)
+        with self._lock:
+            if self.first_frame is None:
+                self.first_frame = time.monotonic()
+            self._frames[camera_id] = self._frames.get(camera_id, 0) + 1
+
+    def add_collector(self, collect):
+        # collect() -> [(nom, {yorliq: qiymat}, qiymat), ...]; har bir so'rovda chaqiriladi
+        self._collectors.append(collect)
+
+    def remove_collector(self, collect):
+        if collect in self._collectors:
+            self._collectors.remove(collect)
+
+    def snapshot(self):
+        with self._lock:
+            histograms = {key: (list(h.counts), h.count, h.total, h.max) for key, h in self._histograms.items()}
+            frames = dict(self._frames)
+        gauges = []
+        for collect in self._collectors:
+            try:
+                gauges.extend(collect())
+            except Exception as e:
+                print(f"Metrikalarni yig'ishda xatolik: {e}")
+        return histograms, frames, gauges
+
+    def render(self):
+        # Prometheus matn formati
+        histograms, frames, gauges = self.snapshot()
+        lines = ["# HELP stage_seconds Kadr oqimi bosqichlari davomiyligi",
+                 "# TYPE stage_seconds histogram"]
+        for (camera_id, stage), (counts, count, total, _) in sorted(histograms.items()):
+            labels = f'camera="{camera_id}",stage="{stage}"'
+            cumulative = 0
+            for bound, bucket in zip(LATENCY_BUCKETS, counts):
+                cumulative += bucket
+                lines.append(f'stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'stage_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"stage_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"stage_seconds_count{{{labels}}} {count}")
+        lines += ["# HELP frames_total Qayta ishlangan kadrlar", "# TYPE frames_total counter"]
+        for camera_id, count in sorted(frames.items()):
+            lines.append(f'frames_total{{camera="{camera_id}"}} {count}')
+        seen = set()
+        for name, labels, value in gauges:
+            if name not in seen:
+                lines.append(f"# TYPE {name} gauge")
+                seen.add(name)
+            label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, file_name):
+        tmp_file = f"{file_name}.tmp"
+        with open(tmp_file, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_file, file_name)
+
+
+class MetricsServer:
+    # Mahalliy /metrics endpoint; alohida oqimda ishlaydi
+    def __init__(self, metrics, port=METRICS_PORT, host="127.0.0.1"):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        print(f"Metrikalar: http://{self.server.server_address[0]}:{self.server.server_address[1]}/metrics")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def summarize(metrics):
+    # {kamera: {"frames", "fps", "stages": {bosqich: {...}}, "latency": {...}}}; --profile va benchmark uchun
+    histograms, frames, _ = metrics.snapshot()
+    elapsed = max(time.monotonic() - (metrics.first_frame or time.monotonic()), 1e-9)
+    summary = {}
+    for (camera_id, stage), (counts, n, total, peak) in histograms.items():
+        histogram = Histogram()
+        histogram.counts, histogram.count, histogram.total, histogram.max = counts, n, total, peak
+        stats = {"count": n, "mean_ms": total / n * 1000, "p50_ms": histogram.quantile(0.5) * 1000,
+                 "p95_ms": histogram.quantile(0.95) * 1000, "max_ms": peak * 1000, "total_s": total}
+        camera = summary.setdefault(camera_id, {"frames": frames.get(camera_id, 0),
+                                                "fps": frames.get(camera_id, 0) / elapsed, "stages": {}})
+        if stage == "latency":
+            camera["latency"] = stats
+        else:
+            camera["stages"][stage] = stats
+    for camera in summary.values():
+        busy = sum(stats["total_s"] for stats in camera["stages"].values())
+        for stats in camera["stages"].values():
+            stats["share"] = stats["total_s"] / busy if busy else 0.0
+    return summary
+
+
+def format_profile(metrics):
+    # Har bir kamera uchun bosqichlar bo'yicha jadval: o'rtacha, p50, p95, max va umumiy vaqtdagi ulushi
+    lines = []
+    header = ("soni", "o'rtacha", "p50", "p95", "max", "ulush")
+    for camera_id, camera in sorted(summarize(metrics).items()):
+        lines.append(f"Kamera {camera_id}: {camera['frames']} kadr, {camera['fps']:.1f} kadr/s")
+        lines.append(f"  {'bosqich':12s} " + " ".join(f"{title:>9s}" for title in header))
+        stages = camera["stages"]
+        order = [stage for stage in STAGES if stage in stages] + sorted(set(stages) - set(STAGES))
+        for stage in order:
+            stats = stages[stage]
+            lines.append(f"  {stage:12s} {stats['count']:9d} {stats['mean_ms']:7.2f}ms {stats['p50_ms']:7.2f}ms "
+                         f"{stats['p95_ms']:7.2f}ms {stats['max_ms']:7.2f}ms {stats['share'] * 100:8.1f}%")
+        latency = camera.get("latency")
+        if latency is not None:
+            lines.append(f"  kadr olinganidan natijagacha: o'rtacha {latency['mean_ms']:.1f} ms, "
+                         f"p95 {latency['p95_ms']:.1f} ms, max {latency['max_ms']:.1f} ms")
+    return "\n".join(lines)
@@ -0,0 +1,140 @@
+import time
+
+import cv2
+import numpy as np
+
+# Harakatni tekshirish uchun kadr shu kenglikkacha kichraytiriladi
+MOTION_WIDTH = 320
+# Hudud atrofiga qo'shiladigan chegara (hudud o'lchamiga nisbatan)
+MOTION_PADDING = 0.25
+# Piksellar o'rtacha farqi shu qiymatdan oshsa hudud o'zgargan hisoblanadi (0-255)
+MOTION_THRESHOLD = 6.0
+# Fon modeli (mog2) uchun: hududdagi oldingi plan piksellari ulushi, foizda
+MOG2_THRESHOLD = 2.0
+# Harakat bo'lmasa ham model shu oraliqda majburan ishlatiladi (soniya),
+# aks holda qimirlamay o'tirgan xodim yo'qolib qolmaydi
+MOTION_REFRESH = 30.0
+
+
+def padded_regions(rectangles, frame_shape, padding=MOTION_PADDING):
+    # (x, y, w, h) hududlarni chegarasi bilan kengaytirib (x1, y1, x2, y2) ko'rinishiga o'tkazish
+    height, width = frame_shape[:2]
+    regions = []
+    for _, (x, y, w, h) in rectangles:
+        pad_x, pad_y = int(w * padding), int(h * padding)
+        regions.append((max(0, x - pad_x), max(0, y - pad_y), min(width, x + w + pad_x), min(height, y + h + pad_y)))
+    return regions
+
+
+class RegionMotion:
+    # Kichraytirilgan kulrang kadrni faqat hudud atrofida tekshiradi.
+    # "diff" - oxirgi reset() qilingan kadr bilan farq, "mog2" - fon modeli bo'yicha oldingi plan ulushi.
+    def __init__(self, rectangles, padding=MOTION_PADDING, threshold=None, width=MOTION_WIDTH, method="diff"):
+        if method not in ("diff", "mog2"):
+            raise ValueError(f"Noma'lum harakat usuli: {method}")
+        self.rectangles = rectangles
+        self.padding = padding
+        self.method = method
+        if threshold is None:
+            threshold = MOTION_THRESHOLD if method == "diff" else MOG2_THRESHOLD
+        self.threshold = threshold
+        self.width = width
+        self._shape = None
+        self._regions = []
+        self._reference = None
+        self._subtractor = None
+        self._last_frame = None
+        self._last_small = None
+
+    def _prepare(self, frame):
+        # Bir kadr uchun changed() va reset() ketma-ket chaqirilganda qayta hisoblamaslik
+        if frame is self._last_frame:
+            return self._last_small
+        if frame.shape[:2] != self._shape:
+            self._shape = frame.shape[:2]
+            self._scale = min(1.0, self.width / frame.shape[1])
+            self._regions = [tuple(int(v * self._scale) for v in region)
+                             for region in padded_regions(self.rectangles, frame.shape, self.padding)]
+            self._reference = None
+            self._subtractor = None
+        small = cv2.resize(frame, None, fx=self._scale, fy=self._scale, interpolation=cv2.INTER_AREA)
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+        self._last_frame, self._last_small = frame, small
+        return small
+
+    def _region_means(self, image):
+        return [float(np.mean(image[y1:y2, x1:x2])) if x2 > x1 and y2 > y1 else 0.0
+                for x1, y1, x2, y2 in self._regions]
+
+    def scores(self, frame):
+        # Har bir hudud uchun o'zgarish bahosi; solishtirish uchun asos bo'lmasa None
+        small = self._prepare(frame)
+        if self.method == "mog2":
+            if self._subtractor is None:
+                self._subtractor = cv2.createBackgroundSubtractorMOG2(history=500, detectShadows=False)
+                self._subtractor.apply(small)
+                return small, None
+            foreground = self._subtractor.apply(small)
+            return small, [mean / 255 * 100 for mean in self._region_means(foreground)]
+        if self._reference is None:
+            return small, None
+        return small, self._region_means(cv2.absdiff(small, self._reference))
+
+    def changed(self, frame):
+        small, scores = self.scores(frame)
+        if scores is None:
+            self._reference = small
+            return [True] * len(self._regions)
+        return [score > self.threshold for score in scores]
+
+    def reset(self, frame):
+        if self.method == "diff":
+            self._reference = self._prepare(frame)
+
+
+class MotionGate:
+    # Modeldan oldingi arzon filtr: oxirgi inference'dan beri hech bir hudud o'zgarmagan bo'lsa,
+    # model chaqirilmaydi va oldingi persons_detected qayta ishlatiladi
+    def __init__(self, rectangles, method="diff", threshold=None, refresh_interval=MOTION_REFRESH):
+        self.motion = RegionMotion(rectangles, threshold=threshold, method=method)
+        self.refresh_interval = refresh_interval
+        self.last_inference = None
+        self.checked = 0
+        self.skipped = 0
+        self.refreshed = 0
+
+    def should_infer(self, frame, now=None):
+        now = time.monotonic() if now is None else now
+        self.checked += 1
+        changed = any(self.motion.changed(frame))
+        if self.last_inference is None or changed:
+            return True
+        if self.refresh_interval and now - self.last_inference >= self.refresh_interval:
+            self.refreshed += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def inferred(self, frame, now=None):
+        self.last_inference = time.monotonic() if now is None else now
+        self.motion.reset(frame)
+
+    def stats(self):
+        return {
+            "checked": self.checked,
+            "skipped": self.skipped,
+            "refreshed": self.refreshed,
+            "skip_rate": self.skipped / self.checked if self.checked else 0.0,
+        }
+
+
+def format_gate_stats(gates):
+    lines = []
+    for camera_id, gate in sorted(gates.items(), key=lambda item: str(item[0])):
+        if gate is None:
+            continue
+        s = gate.stats()
+        lines.append(f"  Kamera {camera_id}: harakat filtri {s['skipped']}/{s['checked']} kadrda modelni o'tkazib yubordi "
+                     f"({s['skip_rate'] * 100:.1f}%), majburiy yangilash {s['refreshed']}")
+    return "\n".join(lines)
@@ -0,0 +1,325 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+import cv2
+
+from backends import add_model_arguments, model_from_args
+from engine import CameraControl, CameraEngine
+from inference import person_boxes
+from oqim import load_camera_config, read_cameras
+from recorder import read_timestamps, timestamps_file
+from reports import format_duration
+from store import PresenceStore, DB_FILE
+from workers import MP_CONTEXT, default_torch_threads, set_torch_threads
+
+# Yozib olingan videolarni jonli oqim dvigateli (engine.CameraEngine) bilan, lekin imkon qadar tez qayta ishlash.
+# Vaqt datetime.now() emas, yozuvchi video yonida saqlagan kadr vaqtlari (recorder.timestamps_file) bo'yicha,
+# ular bo'lmasa kadr PTS'i (yoki kadr raqami / fps) bo'yicha hisoblanadi.
+# Misol: python offline.py output_camera_0_20240601_080000.mp4 output_camera_1.mp4 --jobs 2 --db replay.db
+
+# Dekodlash oqimi oldindan tayyorlab qo'yadigan kadrlar soni
+PREFETCH = 64
+BATCH_SIZE = 8
+# output_camera_{id}.mp4 yoki output_camera_{id}_{YYYYmmdd_HHMMSS}.mp4
+FILE_PATTERN = re.compile(r"output_camera_(?P<camera>.+?)(?:_(?P<stamp>\d{8}_\d{6}))?\.mp4$")
+# Kamera sozlamalaridan oflayn ishlatiladiganlari; sampler, harakat filtri, ROI va trekker jonli oqim uchun
+# (har bir kadr baribir aniqlanadi)
+ENGINE_OPTIONS = ("polygons", "reference_size", "area_rule", "area_overlap", "enter_seconds", "exit_seconds",
+                  "day_start")
+
+
+def parse_file_name(path):
+    # Fayl nomidan kamera ID va (segment bo'lsa) yozuv boshlangan vaqt
+    match = FILE_PATTERN.search(os.path.basename(path))
+    if match is None:
+        return None, None
+    stamp = match.group("stamp")
+    return match.group("camera"), datetime.strptime(stamp, "%Y%m%d_%H%M%S") if stamp else None
+
+
+def read_frames(path, frames, stride=1, stamps=None):
+    # Alohida oqimda dekodlab navbatga qo'yadi; o'tkazib yuboriladigan kadrlar faqat grab() qilinadi.
+    # stamps - recorder yozgan har bir kadr vaqti (read_timestamps); bo'lmasa PTS yoki kadr raqami / fps
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    index = 0
+    offset = 0.0
+    try:
+        while True:
+            if index % stride:
+                if not cap.grab():
+                    break
+                index += 1
+                continue
+            if stamps is not None and index >= len(stamps):
+                # Vaqti yozilmay qolgan oxirgi kadrlar (yozuv to'satdan to'xtagan)
+                break
+            success, frame = cap.read()
+            if not success:
+                break
+            if stamps is not None:
+                # Soat orqaga surilsa ham video vaqti kamaymaydi
+                offset = max(stamps[index] - stamps[0], offset)
+            else:
+                msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+                # Ba'zi konteynerlarda PTS bo'lmaydi, unda kadr raqami ishlatiladi
+                offset = msec / 1000 if msec > 0 or index == 0 else index / fps
+            frames.put((offset, frame))
+            index += 1
+    finally:
+        cap.release()
+        frames.put(None)
+
+
+class VideoClock:
+    # Oflayn vaqt: joriy kadrning video boshidan vaqti (monotonic soat o'rnida) va yozuv boshlanishi + shu vaqt
+    # (devor soati o'rnida). Dvigatel kadr qachon qayta ishlanganini emas, qachon yozilganini ko'radi.
+    def __init__(self, start):
+        self.start = start
+        self.offset_ns = 0
+
+    def monotonic_ns(self):
+        return self.offset_ns
+
+    def now(self):
+        return self.start + timedelta(microseconds=self.offset_ns // 1000)
+
+
+class VideoFeed:
+    # Dvigatel uchun ham manba, ham detektor: read_frames navbatidan batch_size kadr olib model bir marta
+    # chaqiriladi, keyin kadrlar bittadan beriladi va detect() shu kadrning tayyor natijasini qaytaradi.
+    # Video tugaganda stop o'rnatiladi va dvigatel sikli to'xtaydi.
+    def __init__(self, path, frames, model, clock, stop, batch_size=BATCH_SIZE):
+        cap = cv2.VideoCapture(path)
+        self.properties = {prop: cap.get(prop) for prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT,
+                                                              cv2.CAP_PROP_FPS)}
+        cap.release()
+        self.frames = frames
+        self.model = model
+        self.clock = clock
+        self.stop = stop
+        self.batch_size = batch_size
+        self.ready = deque()
+        self.detections = []
+        self.count = 0
+        self.finished = False
+
+    def fill(self):
+        batch = []
+        while len(batch) < self.batch_size and not self.finished:
+            item = self.frames.get()
+            if item is None:
+                self.finished = True
+                break
+            batch.append(item)
+        if batch:
+            results = self.model([frame for _, frame in batch], verbose=False)
+            self.ready.extend((offset, frame, person_boxes([result])) for (offset, frame), result in zip(batch, results))
+
+    def read(self):
+        if not self.ready:
+            self.fill()
+        if not self.ready:
+            self.stop.set()
+            return False, None
+        offset, frame, self.detections = self.ready.popleft()
+        self.clock.offset_ns = round(offset * 1e9)
+        self.count += 1
+        return True, frame
+
+    def get(self, prop):
+        return self.properties.get(prop, 0.0)
+
+    def release(self):
+        pass
+
+    def __call__(self, frames):
+        return [self.detections for _ in frames]
+
+
+class IntervalCollector:
+    # Dvigatel saqlovchisi o'rnida: holatni faylga yozmaydi, faqat yopilgan tashriflarni
+    # [(hudud, boshlanish, tugash), ...] ko'rinishida yig'adi
+    def __init__(self):
+        self.total_times = None
+        self.start_times = None
+        self.intervals = []
+
+    def restore(self, camera_id, rectangles):
+        # Har bir video noldan hisoblanadi
+        return None, None
+
+    def __call__(self, camera_id, total_times, start_times, rectangles, current_time):
+        if self.start_times is not None:
+            for (name, _), start, old_total, new_total in zip(rectangles, self.start_times, self.total_times,
+                                                               total_times):
+                if start is not None and new_total > old_total:
+                    self.intervals.append((name, start, start + (new_total - old_total)))
+        self.total_times, self.start_times = list(total_times), list(start_times)
+
+
+def process_file(path, camera_id, rectangles, model, start, options, batch_size=BATCH_SIZE,
+                 prefetch=PREFETCH, stride=1):
+    # Natija: {"totals": {hudud: soniya}, "intervals": [(hudud, boshlanish, tugash), ...], ...}.
+    # Kadr sikli, hududlar, gisterezis va vaqt hisobi jonli oqimdagi engine.CameraEngine'ning o'zi
+    frames = queue.Queue(maxsize=prefetch)
+    reader = threading.Thread(target=read_frames, args=(path, frames, stride, read_timestamps(path)),
+                              name=f"decode-{camera_id}", daemon=True)
+    reader.start()
+
+    clock = VideoClock(start)
+    control = CameraControl()
+    feed = VideoFeed(path, frames, model, clock, control.stop, batch_size)
+    collector = IntervalCollector()
+    engine = CameraEngine(camera_id, feed, feed, rectangles, collector,
+                          {key: options[key] for key in ENGINE_OPTIONS if key in options}, time_source=clock)
+    engine.control = control
+    started = time.perf_counter()
+    try:
+        engine.run()
+        # Video oxirida hududda qolganlar oxirgi kadr vaqtida yopiladi
+        durations = engine.clock.durations_ns(clock.monotonic_ns())
+        collector(camera_id, [timedelta(microseconds=int(total) // 1000) for total in durations],
+                  [None] * len(durations), engine.rectangles, clock.now())
+    finally:
+        engine.close()
+        # Xatolikda dekodlash oqimi to'lgan navbatda qolib ketmasligi uchun
+        while reader.is_alive():
+            try:
+                frames.get(timeout=0.1)
+            except queue.Empty:
+                pass
+    reader.join()
+    elapsed = time.perf_counter() - started
+
+    totals = {name: 0.0 for name, _ in engine.rectangles}
+    for name, interval_start, interval_end in collector.intervals:
+        totals[name] += (interval_end - interval_start).total_seconds()
+    return {
+        "file": path,
+        "camera_id": camera_id,
+        "frames": feed.count,
+        "video_seconds": clock.offset_ns / 1e9,
+        "elapsed": elapsed,
+        "fps": feed.count / elapsed if elapsed else 0.0,
+        "totals": totals,
+        "intervals": sorted(collector.intervals, key=lambda interval: interval[1]),
+    }
+
+
+# Pool jarayonidagi model va sozlamalar (init_worker'da o'rnatiladi)
+worker_model = None
+worker_args = None
+
+
+def init_worker(args, torch_threads):
+    global worker_model, worker_args
+    set_torch_threads(torch_threads)
+    worker_args = args
+    # Model fork orqali asosiy jarayondan keladi, bu yerda faqat isitiladi
+    worker_model = model_from_args(args)
+
+
+def run_job(job):
+    path, camera_id, rectangles, options, start = job
+    try:
+        return process_file(path, camera_id, rectangles, worker_model, start, options,
+                            batch_size=worker_args.batch_size, prefetch=worker_args.prefetch,
+                            stride=worker_args.stride)
+    except Exception as e:
+        return {"file": path, "camera_id": camera_id, "error": repr(e)}
+
+
+def make_jobs(args):
+    cameras = {}
+    if os.path.exists(args.config):
+        cameras = {str(camera_id): (rectangles, options)
+                   for camera_id, _, rectangles, options in read_cameras(load_camera_config(args.config))}
+    jobs = []
+    for path in args.files:
+        camera_id, start = parse_file_name(path)
+        camera_id = args.camera if args.camera is not None else camera_id
+        if camera_id not in cameras:
+            raise SystemExit(f"{path}: kamera aniqlanmadi yoki {args.config} faylida yo'q (--camera bilan bering)")
+        stamps = read_timestamps(path)
+        if args.start is not None:
+            start = args.start
+        elif stamps is not None:
+            start = datetime.fromtimestamp(stamps[0])
+        else:
+            print(f"{timestamps_file(path)} topilmadi: kadr vaqti video fps'i bo'yicha olinadi. Yozuvchi kadrlarni "
+                  f"qayta ishlash tezligida yozgan bo'lsa, jami vaqt haqiqiy vaqtdan kam chiqadi")
+        if start is None:
+            # Uzluksiz yozuvda boshlanish vaqti fayl o'zgartirilgan vaqtdan video davomiyligi ayirib topiladi
+            cap = cv2.VideoCapture(path)
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+            cap.release()
+            start = datetime.fromtimestamp(os.path.getmtime(path)) - timedelta(seconds=duration)
+        rectangles, options = cameras[camera_id]
+        options = dict(options)
+        for key in ("enter_seconds", "exit_seconds"):
+            if getattr(args, key) is not None:
+                options[key] = getattr(args, key)
+        jobs.append((path, camera_id, rectangles, options, start))
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Yozib olingan videolarni oflayn qayta ishlash")
+    parser.add_argument("files", nargs="+", help="video fayllar")
+    parser.add_argument("--config", default="camera_config.json")
+    parser.add_argument("--camera", default=None, help="kamera ID (fayl nomidan aniqlanmasa)")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=None,
+                        help="videoning boshlanish vaqti, masalan 2024-06-01T08:00:00")
+    add_model_arguments(parser)
+    parser.add_argument("--jobs", type=int, default=1, help="parallel qayta ishlanadigan fayllar soni")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--prefetch", type=int, default=PREFETCH)
+    parser.add_argument("--stride", type=int, default=1, help="har N-kadrni qayta ishlash")
+    parser.add_argument("--enter-seconds", type=float, default=None)
+    parser.add_argument("--exit-seconds", type=float, default=None)
+    parser.add_argument("--db", default=None, help=f"oraliqlarni SQLite bazasiga yozish (masalan {DB_FILE})")
+    parser.add_argument("--output", default=None, help="natijalarni JSON faylga yozish")
+    args = parser.parse_args()
+
+    jobs = make_jobs(args)
+    # Model asosiy jarayonda faqat yuklanadi (kerak bo'lsa eksport), isitish fork'dan keyin
+    model_from_args(args, warm=False)
+    jobs_count = max(1, min(args.jobs, len(jobs)))
+    with mp.get_context(MP_CONTEXT).Pool(jobs_count, initializer=init_worker,
+                                         initargs=(args, default_torch_threads(jobs_count))) as pool:
+        outputs = list(pool.imap_unordered(run_job, jobs))
+
+    store = PresenceStore(args.db) if args.db else None
+    for result in outputs:
+        if "error" in result:
+            print(f"{result['file']}: xatolik - {result['error']}")
+            continue
+        print(f"{result['file']} (kamera {result['camera_id']}): {result['frames']} kadr, "
+              f"{result['video_seconds']:.0f} s video {result['elapsed']:.1f} s da ({result['fps']:.1f} kadr/s)")
+        for name, seconds in result["totals"].items():
+            print(f"  {name}: {format_duration(timedelta(seconds=seconds))}")
+        if store is not None:
+            for name, start, end in result["intervals"]:
+                store.add_interval(result["camera_id"], name, start, end)
+    if store is not None:
+        store.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump([{**result, "intervals": [(name, start.isoformat(), end.isoformat())
+                                                for name, start, end in result.get("intervals", [])]}
+                       for result in outputs], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
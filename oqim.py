@@ -1,205 +1,478 @@
-import cv2
-import numpy as np
-from ultralytics import YOLO
-import math
-from datetime import datetime, timedelta
 import json
 import os
 import time
-from openpyxl import Workbook, load_workbook
-from openpyxl.utils import get_column_letter
 import threading
+import argparse
+from datetime import datetime
+from functools import partial
+from backends import add_model_arguments, model_from_args
+from engine import CameraControl, run_camera, captures, samplers, gates, recorders, identifiers, controls, metrics
+from inference import InferenceScheduler, format_throughput
+from workers import run_multiprocess, supervise
+from capture import format_capture_stats
+from metrics import MetricsServer, METRICS_PORT, format_profile, summarize
+from motion import MOTION_REFRESH, format_gate_stats
+from journal import TimeJournal
+from days import DayArchive, DAY_START, parse_day_start, roll_journal
+from store import PresenceStore, DB_FILE
+from collector import CollectorClient
+from recorder import SEGMENT_SECONDS
+from reports import ReportWriter, DailyTotalsWorkbook, format_duration, format_writer_stats
+from areas import AREA_RULES, AREA_OVERLAP, polygon_bounds
+from roi import ROI_PADDING
+from reid import REID_THRESHOLD, add_reid_arguments, format_reid_stats
+from tracker import TRACK_IOU, TRACK_MAX_AGE, ENTER_SECONDS, EXIT_SECONDS
+from sampling import format_sampler_stats, IDLE_HZ, ACTIVE_HZ, BOOST_SECONDS, TOLERANCE
 
-# YOLO modelini yuklash
-model = YOLO("yolov8m.pt")
+# Batch inference sozlamalari
+MAX_BATCH_SIZE = 8
+MAX_BATCH_WAIT = 0.02  # soniya
+STATS_INTERVAL = 30  # soniya
+# camera_config.json o'zgarishini tekshirish oralig'i (soniya)
+RELOAD_INTERVAL = 2.0
+# To'xtatilgan kamera oqimi tugashini kutish vaqti (soniya)
+STOP_TIMEOUT = 10.0
 
 def load_camera_config(filename):
     with open(filename, 'r') as f:
         return json.load(f)
 
-def is_person_in_area(person_box, area_box):
-    px1, py1, px2, py2 = person_box
-    ax, ay, aw, ah = area_box
-    ax1, ay1, ax2, ay2 = ax, ay, ax + aw, ay + ah
-    return (ax1 < px1 < ax2 or ax1 < px2 < ax2) and (ay1 < py1 < ay2 or ay1 < py2 < ay2)
-
-def save_time_data(camera_id, total_times, start_times, rectangles):
-    data = {
-        name: {
-            "total_time": total_time.total_seconds(),
-            "start_time": start_time.isoformat() if start_time else None
-        } for (name, _), (total_time, start_time) in zip(rectangles, zip(total_times, start_times))
-    }
-    with open(f"time_data_{camera_id}.json", "w") as f:
-        json.dump(data, f)
+class TimePersistence:
+    # Kirish/chiqish o'tishlarini jurnal va bazaga yozish, har minutda Excel hisobotini
+    # fon oqimidagi yozuvchiga topshirish (kadr oqimi faylni saqlashni kutmaydi).
+    # Ish kuni chegarasidan keyingi birinchi chaqiruvda tugagan kun days/ arxiviga yopiladi.
+    def __init__(self, excel_interval=60, db_file=DB_FILE, day_start=DAY_START, collector=None):
+        self.excel_interval = excel_interval
+        self.day_offset = parse_day_start(day_start)
+        self.archive = DayArchive()
+        self.last_excel_update = {}
+        self.journals = {}
+        self.workbooks = {}
+        self.writer = ReportWriter()
+        self.store = PresenceStore(db_file, day_offset=self.day_offset)
+        # Ixtiyoriy markaziy collector (collector.CollectorClient): oraliqlar unga ham yuboriladi
+        self.collector = collector
+        # Qayta identifikatsiya: (kamera, hudud) -> hududdagi ochiq tashrif egasi
+        self.persons = {}
+        self.call_time_max = 0.0
 
-def load_time_data(camera_id, rectangles):
-    filename = f"time_data_{camera_id}.json"
-    if os.path.exists(filename):
-        try:
-            with open(filename, "r") as f:
-                data = json.load(f)
-            total_times = []
-            start_times = []
-            for name, _ in rectangles:
-                area_data = data.get(name, {"total_time": 0, "start_time": None})
-                total_times.append(timedelta(seconds=area_data["total_time"]))
-                start_times.append(datetime.fromisoformat(area_data["start_time"]) if area_data["start_time"] else None)
-            return total_times, start_times
-        except (json.JSONDecodeError, KeyError, ValueError):
-            print(f"Saqlangan ma'lumotlarni o'qishda xatolik (Camera {camera_id}). Yangi ma'lumotlar yaratilmoqda.")
-    return [timedelta() for _ in range(len(rectangles))], [None for _ in range(len(rectangles))]
-
-def update_excel(camera_id, total_times, rectangles):
-    file_name = f'time_tracking_camera_{camera_id}.xlsx'
-    current_date = datetime.now().strftime("%Y-%m-%d")
-    
-    if os.path.exists(file_name):
-        wb = load_workbook(file_name)
-        ws = wb.active
-        # Check if the sheet is for the current date, if not, create a new sheet
-        if ws.title != current_date:
-            ws = wb.create_sheet(title=current_date)
-            ws.append(["Sana"] + [name for name, _ in rectangles])
-    else:
-        wb = Workbook()
-        ws = wb.active
-        ws.title = current_date
-        ws.append(["Sana"] + [name for name, _ in rectangles])
-
-    # Update or create the single row for the current date
-    row = 2  # Assuming header is in row 1
-    ws.cell(row=row, column=1, value=current_date)
-
-    # Update the times for each rectangle
-    for col, total_time in enumerate(total_times, start=2):
-        hours, remainder = divmod(int(total_time.total_seconds()), 3600)
-        minutes, seconds = divmod(remainder, 60)
-        time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-        ws.cell(row=row, column=col, value=time_str)
-
-    # Adjust column widths
-    for column in ws.columns:
-        max_length = 0
-        column_letter = get_column_letter(column[0].column)
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(cell.value)
-            except:
-                pass
-        adjusted_width = (max_length + 2)
-        ws.column_dimensions[column_letter].width = adjusted_width
-
-    wb.save(file_name)
-
-def process_camera(camera_id, rtsp_url, rectangles):
-    cap = cv2.VideoCapture(rtsp_url)
-    
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps= cap.get(cv2.CAP_PROP_FPS)
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(f'output_camera_{camera_id}.mp4', fourcc, fps, (width, height))
-    
-    total_times, start_times = load_time_data(camera_id, rectangles)
-    persons_in_areas = [start_time is not None for start_time in start_times]
-
-    last_excel_update = datetime.now()
+    def journal(self, camera_id, rectangles):
+        journal = self.journals.get(camera_id)
+        if journal is None:
+            journal = self.journals[camera_id] = TimeJournal(f"time_data_{camera_id}", rectangles)
+        return journal
 
-    while True:
-        success, frame = cap.read()
-        if not success:
-            print(f"Kamera {camera_id} bilan bog'lanishda xatolik. Qayta urinish...")
-            cap.release()
-            time.sleep(5)
-            cap = cv2.VideoCapture(rtsp_url)
-            continue
-
-        results = model(frame, stream=True)
-
-        persons_detected = [False for _ in range(len(rectangles))]
-        for r in results:
-            boxes = r.boxes
-            for box in boxes:
-                if int(box.cls[0]) == 0:  # 0 - odam sinfi
-                    x_center, y_center, width, height = box.xywh[0]
-                    x1 = int(x_center - width/2)
-                    y1 = int(y_center - height/2)
-                    x2 = int(x_center + width/2)
-                    y2 = int(y_center + height/2)
-
-                    for i, (_, rect) in enumerate(rectangles):
-                        if is_person_in_area((x1, y1, x2, y2), rect):
-                            persons_detected[i] = True
-                            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                            conf = math.ceil(box.conf[0] * 100) / 100
-                            cv2.putText(frame, f"Human: {conf}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-        for i, ((name, (x, y, w, h)), person_detected) in enumerate(zip(rectangles, persons_detected)):
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
-            cv2.putText(frame, name, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
-
-        current_time = datetime.now()
-        for i in range(len(rectangles)):
-            if persons_detected[i] and not persons_in_areas[i]:
-                start_times[i] = current_time
-                persons_in_areas[i] = True
-            elif not persons_detected[i] and persons_in_areas[i]:
-                total_times[i] += current_time - start_times[i]
-                start_times[i] = None
-                persons_in_areas[i] = False
-
-            if persons_in_areas[i]:
-                current_duration = current_time - start_times[i] + total_times[i]
-            else:
-                current_duration = total_times[i]
+    def restore(self, camera_id, rectangles):
+        journal = self.journal(camera_id, rectangles)
+        # Jarayon kun chegarasida ishlamagan bo'lsa eski kun shu yerda yopiladi
+        self.check_day(camera_id, journal, rectangles, datetime.now())
+        return list(journal.total_times), list(journal.start_times)
+
+    def check_day(self, camera_id, journal, rectangles, current_time):
+        rolled = roll_journal(journal, self.archive, camera_id, current_time, self.day_offset)
+        if rolled is None:
+            return
+        day, totals, intervals = rolled
+        for name, start, end in intervals:
+            self.add_interval(camera_id, name, start, end)
+        # Tugagan kunning Excel varag'i yakuniy jami bilan yoziladi
+        self.update_excel(camera_id, totals, rectangles, day)
+        print(f"Kamera {camera_id}: {day.isoformat()} kuni yopildi")
+
+    def __call__(self, camera_id, total_times, start_times, rectangles, current_time):
+        started = time.perf_counter()
+        journal = self.journal(camera_id, rectangles)
+        self.check_day(camera_id, journal, rectangles, current_time)
+        # Yopilgan qatnashish oraliqlari SQLite bazasiga guruhlab yoziladi
+        for name, start, end in journal.update(total_times, start_times):
+            self.add_interval(camera_id, name, start, end)
+
+        last_excel_update = self.last_excel_update.setdefault(camera_id, current_time)
+        if (current_time - last_excel_update).total_seconds() >= self.excel_interval:
+            self.update_excel(camera_id, total_times, rectangles, journal.day)
+            self.last_excel_update[camera_id] = current_time
+        self.call_time_max = max(self.call_time_max, time.perf_counter() - started)
 
-            hours, remainder = divmod(int(current_duration.total_seconds()), 3600)
-            minutes, seconds = divmod(remainder, 60)
-            time_str = f"{rectangles[i][0]}: {hours:02d}:{minutes:02d}:{seconds:02d}"
-            cv2.putText(frame, time_str, (20, 40 + i*40), cv2.FONT_HERSHEY_SIMPLEX, 1.3, (0, 0, 255), 3)
+    def identify(self, camera_id, area, person):
+        # Dvigatel kirish o'tishida chaqiradi; shu tashrif yopilganda oraliq xodim nomi bilan yoziladi
+        self.persons[(camera_id, area)] = person
 
-        out.write(frame)
+    def add_interval(self, camera_id, name, start, end):
+        person = self.persons.get((camera_id, name))
+        self.store.add_interval(camera_id, name, start, end, person)
+        if self.collector is not None:
+            self.collector.add_interval(camera_id, name, start, end, person)
 
-        cv2.namedWindow(f"Human Detection - Camera {camera_id}", cv2.WINDOW_NORMAL)
-        cv2.resizeWindow(f"Human Detection - Camera {camera_id}", 640, 480)
-        cv2.imshow(f"Human Detection - Camera {camera_id}", frame)
+    def update_excel(self, camera_id, total_times, rectangles, day):
+        file_name = f'time_tracking_camera_{camera_id}.xlsx'
+        workbook = self.workbooks.get(file_name)
+        if workbook is None:
+            workbook = self.workbooks[file_name] = DailyTotalsWorkbook(file_name)
+        current_date = day.isoformat()
+        header = ["Sana"] + [name for name, _ in rectangles]
+        row = [current_date] + [format_duration(total_time) for total_time in total_times]
+        # Kalitda kun ham bor: tugagan kunning yakuniy qatori yangi kun qatori bilan birlashtirilmaydi
+        self.writer.submit((file_name, current_date), workbook.write, header, current_date, row)
 
-        save_time_data(camera_id, total_times, start_times, rectangles)
+    def reconfigure(self, camera_id, rectangles):
+        # Hududlar o'zgarganda jurnal snapshot'ga siqilib yangi nomlar bilan qayta ochiladi:
+        # nomi saqlangan hududlar holati snapshot orqali o'tadi, yangilari noldan boshlanadi
+        journal = self.journals.pop(camera_id, None)
+        if journal is not None:
+            journal.close()
+        return self.restore(camera_id, rectangles)
 
-        if (current_time - last_excel_update).total_seconds() >= 60:
-            update_excel(camera_id, total_times, rectangles)
-            last_excel_update = current_time
+    def release(self, camera_id):
+        # Olib tashlangan kamera jurnali yopiladi
+        journal = self.journals.pop(camera_id, None)
+        if journal is not None:
+            journal.close()
+        self.last_excel_update.pop(camera_id, None)
 
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+    def stats_line(self):
+        line = format_writer_stats(self.writer.stats(), self.call_time_max * 1000)
+        if self.collector is not None:
+            line += "\n" + self.collector.stats_line()
+        return line
 
-    cap.release()
-    out.release()
-    cv2.destroyAllWindows()
+    def close(self):
+        for journal in self.journals.values():
+            journal.close()
+        self.writer.close()
+        self.store.close()
+        if self.collector is not None:
+            self.collector.close()
 
-def main():
-    config_file = "camera_config.json"
-    camera_config = load_camera_config(config_file)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ko'p kamerali ish vaqtini kuzatish")
+    parser.add_argument("--config", default="camera_config.json")
+    add_model_arguments(parser)
+    parser.add_argument("--db", default=DB_FILE, help="qatnashish oraliqlari saqlanadigan SQLite fayli")
+    parser.add_argument("--collector", default=None,
+                        help="yopilgan oraliqlarni markaziy collector'ga ham yuborish, masalan http://10.0.0.5:9200")
+    parser.add_argument("--host-name", default=None, help="collector hisobotidagi host nomi (standart: hostname)")
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH_SIZE,
+                        help="bitta model chaqiruvidagi maksimal kadrlar soni")
+    parser.add_argument("--max-wait", type=float, default=MAX_BATCH_WAIT,
+                        help="batch to'lishini kutish vaqti (soniya)")
+    parser.add_argument("--stats-interval", type=float, default=STATS_INTERVAL,
+                        help="throughput hisobotini chiqarish oralig'i (soniya)")
+    parser.add_argument("--day-start", default=DAY_START,
+                        help="ish kuni chegarasi (mahalliy vaqt HH:MM): hisoblagichlar shu paytda yangi kunga o'tadi")
+    parser.add_argument("--reload-interval", type=float, default=RELOAD_INTERVAL,
+                        help="camera_config.json o'zgarishini tekshirish oralig'i (soniya, 0 - o'chirilgan)")
+    parser.add_argument("--multiprocess", action="store_true",
+                        help="kameralarni alohida jarayonlarga taqsimlash (faqat Linux)")
+    parser.add_argument("--cameras-per-process", type=int, default=1,
+                        help="bitta worker jarayonidagi kameralar soni")
+    parser.add_argument("--inference", choices=["local", "shared"], default="local",
+                        help="local - har bir jarayonda model, shared - bitta umumiy inference jarayoni")
+    parser.add_argument("--torch-threads", type=int, default=None,
+                        help="har bir jarayon uchun torch oqimlari soni")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="hudud holati barqaror bo'lganda modelni kamroq ishlatish")
+    parser.add_argument("--idle-hz", type=float, default=IDLE_HZ,
+                        help="barqaror holatdagi aniqlash chastotasi")
+    parser.add_argument("--active-hz", type=float, default=ACTIVE_HZ,
+                        help="harakat yoki o'zgarishdan keyingi aniqlash chastotasi (0 - har kadr)")
+    parser.add_argument("--boost-seconds", type=float, default=BOOST_SECONDS,
+                        help="tezlashtirilgan rejim davomiyligi")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="har bir kirish/chiqish uchun ruxsat etilgan vaqt xatoligi (soniya)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help=f"metrikalarni http://127.0.0.1:PORT/metrics manzilida berish (masalan {METRICS_PORT})")
+    parser.add_argument("--metrics-file", default=None,
+                        help="metrikalarni har statistika oralig'ida shu faylga yozish")
+    parser.add_argument("--profile", type=int, default=None, metavar="N",
+                        help="har bir kamerada N kadr ishlab, bosqichlar bo'yicha vaqtni chiqarish")
+    parser.add_argument("--profile-output", default=None,
+                        help="--profile natijalarini JSON faylga yozish")
+    parser.add_argument("--track", action="store_true",
+                        help="odamlarni kadrlar orasida kuzatish (IoU + Kalman trekker)")
+    parser.add_argument("--detect-every", type=int, default=1,
+                        help="trekker yoqilganda model har N-kadrda ishlaydi")
+    parser.add_argument("--track-iou", type=float, default=TRACK_IOU, help="trekni qutiga moslash uchun minimal IoU")
+    parser.add_argument("--track-max-age", type=float, default=TRACK_MAX_AGE,
+                        help="aniqlanmagan trek shuncha soniyadan keyin o'chiriladi")
+    parser.add_argument("--enter-seconds", type=float, default=ENTER_SECONDS,
+                        help="hududga kirish shuncha soniya davom etgandan keyin qayd qilinadi")
+    parser.add_argument("--exit-seconds", type=float, default=EXIT_SECONDS,
+                        help="hududdan chiqish shuncha soniya davom etgandan keyin qayd qilinadi")
+    parser.add_argument("--headless", action="store_true",
+                        help="oyna ochmaslik va kadrlarga chizmaslik")
+    parser.add_argument("--record", choices=["all", "changes", "off"], default="all",
+                        help="video yozish: hammasi, faqat bandlik o'zgarishlari atrofida yoki o'chirilgan")
+    parser.add_argument("--record-scale", type=float, default=1.0, help="yoziladigan video o'lchami (masalan 0.5)")
+    parser.add_argument("--record-fps", type=float, default=None, help="yoziladigan videoning maksimal chastotasi")
+    parser.add_argument("--record-segment", type=float, default=SEGMENT_SECONDS,
+                        help="changes rejimida o'zgarishdan keyin yoziladigan vaqt (soniya)")
+    parser.add_argument("--area-rule", choices=AREA_RULES, default="corners",
+                        help="corners - quti burchaklari, foot - oyoq nuqtasi, overlap - quti yuzining ulushi")
+    parser.add_argument("--area-overlap", type=float, default=AREA_OVERLAP,
+                        help="overlap qoidasi uchun quti yuzining hudud ichidagi minimal ulushi")
+    parser.add_argument("--roi", action="store_true",
+                        help="modelni faqat hududlar atrofidagi qismlarda ishlatish")
+    parser.add_argument("--roi-padding", type=float, default=ROI_PADDING,
+                        help="hudud atrofidagi chegara (hudud o'lchamiga nisbatan)")
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="hududlarda harakat bo'lmasa modelni chaqirmaslik")
+    parser.add_argument("--motion-method", choices=["diff", "mog2"], default="diff",
+                        help="diff - kadrlar farqi, mog2 - fon modeli")
+    parser.add_argument("--motion-threshold", type=float, default=None,
+                        help="harakat chegarasi (diff: o'rtacha piksel farqi, mog2: oldingi plan foizi)")
+    parser.add_argument("--motion-refresh", type=float, default=MOTION_REFRESH,
+                        help="harakat bo'lmasa ham modelni majburan ishlatish oralig'i (soniya)")
+    parser.add_argument("--reid-index", default=None,
+                        help="xodimlar indeksi (reid.py enroll): vaqt hudud o'rniga aniqlangan xodimga yoziladi")
+    parser.add_argument("--reid-model", default=None, help="ONNX ReID modeli (standart: HSV gistogramma)")
+    parser.add_argument("--reid-threshold", type=float, default=REID_THRESHOLD,
+                        help="xodim deb topish uchun kosinus o'xshashlik chegarasi")
+    add_reid_arguments(parser, "reid-")
+    return parser.parse_args()
 
-    threads = []
+def camera_options(args):
+    # Kamera sozlamalari: buyruq qatori qiymatlari, camera_config.json'dagi "options" ularni almashtiradi
+    return {
+        "adaptive": args.adaptive,
+        "idle_hz": args.idle_hz,
+        "active_hz": args.active_hz,
+        "boost_seconds": args.boost_seconds,
+        "tolerance": args.tolerance,
+        "profile_frames": args.profile,
+        "track": args.track,
+        "detect_every": args.detect_every,
+        "track_iou": args.track_iou,
+        "track_max_age": args.track_max_age,
+        "enter_seconds": args.enter_seconds,
+        "exit_seconds": args.exit_seconds,
+        "day_start": args.day_start,
+        "headless": args.headless,
+        "record": args.record,
+        "record_scale": args.record_scale,
+        "record_fps": args.record_fps,
+        "record_segment": args.record_segment,
+        "area_rule": args.area_rule,
+        "area_overlap": args.area_overlap,
+        "roi": args.roi,
+        "roi_padding": args.roi_padding,
+        "motion_gate": args.motion_gate,
+        "motion_method": args.motion_method,
+        "motion_threshold": args.motion_threshold,
+        "motion_refresh": args.motion_refresh,
+        "reid_index": args.reid_index,
+        "reid_model": args.reid_model,
+        "reid_threshold": args.reid_threshold,
+        "reid_input_size": args.reid_input_size,
+        "reid_mean": args.reid_mean,
+        "reid_std": args.reid_std,
+    }
+
+def read_cameras(camera_config, defaults=None):
+    cameras = []
     for camera in camera_config:
-        camera_id = camera['id']
-        rtsp_url = camera['rtsp_url']
-        rectangles = [(rect['name'], tuple(rect['coordinates'])) for rect in camera['rectangles']]
-        
-        thread = threading.Thread(target=process_camera, args=(camera_id, rtsp_url, rectangles))
-        threads.append(thread)
+        rectangles = []
+        polygons = {}
+        for rect in camera['rectangles']:
+            if 'polygon' in rect:
+                # Ko'pburchak hudud: boshqa qismlar (ROI, harakat filtri) uning tashqi to'rtburchagini ishlatadi
+                polygons[rect['name']] = [tuple(point) for point in rect['polygon']]
+                rectangles.append((rect['name'], polygon_bounds(polygons[rect['name']])))
+            else:
+                rectangles.append((rect['name'], tuple(rect['coordinates'])))
+        options = dict(defaults or {})
+        options.update(camera.get('options', {}))
+        if polygons:
+            options['polygons'] = polygons
+        url = camera['rtsp_url']
+        if camera.get('substream_url') and options.get('substream', True):
+            # Kichik o'lchamli ikkinchi oqim; hududlar reference_size bo'yicha qayta hisoblanadi
+            url = camera['substream_url']
+        cameras.append((camera['id'], url, rectangles, options))
+    return cameras
+
+def collect_gauges(scheduler, persist):
+    # /metrics so'ralganda navbatlar chuqurligi va kamera ulanish holati
+    def collect():
+        gauges = [("inference_queue_depth", {}, scheduler.queue_depth()),
+                  ("report_queue_depth", {}, persist.writer.queue_depth()),
+                  ("store_queue_depth", {}, persist.store.queue_depth())]
+        if persist.collector is not None:
+            gauges.append(("collector_queue_depth", {}, persist.collector.queue_depth()))
+        for camera_id, cap in list(captures.items()):
+            s = cap.stats()
+            labels = {"camera": camera_id}
+            gauges += [("capture_connected", labels, int(s["connected"])),
+                       ("capture_reconnects", labels, s["reconnects"]),
+                       ("capture_dropped_frames", labels, s["dropped"]),
+                       ("capture_lag_seconds", labels, s["lag_ms"] / 1000)]
+        for camera_id, out in list(recorders.items()):
+            if out is not None:
+                gauges.append(("recorder_queue_depth", {"camera": camera_id}, out.stats()["queue_depth"]))
+        return gauges
+    return collect
+
+class ConfigWatcher:
+    # camera_config.json o'zgarganini fayl vaqti bo'yicha aniqlaydi
+    def __init__(self, filename):
+        self.filename = filename
+        self.mtime = self.current_mtime()
+
+    def current_mtime(self):
+        try:
+            return os.stat(self.filename).st_mtime_ns
+        except OSError:
+            return None
+
+    def changed(self):
+        mtime = self.current_mtime()
+        if mtime is None or mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        return True
+
+class CameraSet:
+    # Oqim rejimidagi kameralar. Konfiguratsiya o'zgarganda faqat farq qilgan kameralarga tegiladi:
+    # yangilari ishga tushadi, olib tashlanganlari to'xtaydi, manzili yoki sozlamalari o'zgarganlari
+    # qayta ishga tushadi, faqat hududlari o'zgarganlarda hududlar uzilishsiz almashtiriladi.
+    # Model va scheduler umumiy bo'lib qoladi.
+    def __init__(self, scheduler, persist):
+        self.scheduler = scheduler
+        self.persist = persist
+        self.running = {}
+        self.stopping = []
+
+    def start(self, camera_id, rtsp_url, rectangles, options):
+        control = controls[camera_id] = CameraControl()
+        detect = partial(self.scheduler.detect_many, camera_id)
+        # Kamera xatolik bilan to'xtasa faqat shu oqim qayta ishga tushadi
+        thread = threading.Thread(target=supervise, name=f"camera-{camera_id}",
+                                  args=(f"Kamera {camera_id}", run_camera, camera_id, rtsp_url, rectangles,
+                                        detect, self.persist, options),
+                                  kwargs={"stop": control.stop})
+        self.running[camera_id] = (thread, control, (rtsp_url, rectangles, options))
         thread.start()
 
-    for thread in threads:
-        thread.join()
+    def stop(self, camera_id):
+        thread, control, _ = self.running.pop(camera_id)
+        control.stop.set()
+        thread.join(timeout=STOP_TIMEOUT)
+        if controls.get(camera_id) is control:
+            controls.pop(camera_id)
+        self.stopping.append((camera_id, thread))
+        self.reap()
+
+    def reap(self):
+        # Tugagan oqimlarning jurnali yopiladi (shu ID bilan yangi kamera ishlamayotgan bo'lsa)
+        for camera_id, thread in list(self.stopping):
+            if not thread.is_alive():
+                self.stopping.remove((camera_id, thread))
+                if camera_id not in self.running:
+                    self.persist.release(camera_id)
+
+    def apply(self, cameras):
+        wanted = {camera_id: (rtsp_url, rectangles, options) for camera_id, rtsp_url, rectangles, options in cameras}
+        for camera_id in list(self.running):
+            if camera_id not in wanted:
+                print(f"Kamera {camera_id} konfiguratsiyadan olib tashlandi, to'xtatilmoqda")
+                self.stop(camera_id)
+        for camera_id, (rtsp_url, rectangles, options) in wanted.items():
+            current = self.running.get(camera_id)
+            if current is None:
+                print(f"Kamera {camera_id} qo'shildi, ishga tushirilmoqda")
+                self.start(camera_id, rtsp_url, rectangles, options)
+                continue
+            thread, control, (old_url, old_rectangles, old_options) = current
+            if (rtsp_url != old_url or {k: v for k, v in options.items() if k != "polygons"}
+                    != {k: v for k, v in old_options.items() if k != "polygons"}):
+                print(f"Kamera {camera_id} manzili yoki sozlamalari o'zgardi, qayta ishga tushirilmoqda")
+                self.stop(camera_id)
+                self.start(camera_id, rtsp_url, rectangles, options)
+            elif rectangles != old_rectangles or options.get("polygons") != old_options.get("polygons"):
+                control.update_areas(rectangles, options.get("polygons"))
+                self.running[camera_id] = (thread, control, (rtsp_url, rectangles, options))
+
+    def alive(self):
+        return any(thread.is_alive() for thread, _, _ in self.running.values())
+
+def main(args):
+    camera_config = load_camera_config(args.config)
+    persist = TimePersistence(db_file=args.db, day_start=args.day_start,
+                              collector=CollectorClient(args.collector, args.host_name) if args.collector else None)
+    # Model backend va aniqlik buyruq qatoridan tanlanadi; eksport qilingan variant keshdan olinadi.
+    # Model jarayonda bir marta yuklanadi, main() qayta ishga tushsa ham qayta yuklanmaydi.
+    # Ko'p jarayonli rejimda isitish fork'dan keyin worker'larda bajariladi.
+    model = model_from_args(args, warm=not args.multiprocess)
+
+    if args.multiprocess:
+        # JSON va Excel faqat asosiy jarayonda yoziladi
+        try:
+            run_multiprocess(read_cameras(camera_config, camera_options(args)), run_camera, persist, model,
+                             cameras_per_process=args.cameras_per_process, inference=args.inference,
+                             max_batch_size=args.batch_size, max_wait=args.max_wait,
+                             torch_threads=args.torch_threads, stats_interval=args.stats_interval)
+        finally:
+            persist.close()
+        return
+
+    scheduler = InferenceScheduler(model, max_batch_size=args.batch_size, max_wait=args.max_wait).start()
+    collect = collect_gauges(scheduler, persist)
+    metrics.add_collector(collect)
+    server = MetricsServer(metrics, args.metrics_port).start() if args.metrics_port else None
+
+    cameras = CameraSet(scheduler, persist)
+    for camera_id, rtsp_url, rectangles, options in read_cameras(camera_config, camera_options(args)):
+        cameras.start(camera_id, rtsp_url, rectangles, options)
+    # Konfiguratsiya fayli kuzatiladi: o'zgarishlar jarayonni qayta ishga tushirmasdan qo'llanadi
+    watcher = ConfigWatcher(args.config) if args.reload_interval > 0 else None
+
+    try:
+        # Oqimlar ishlayotgan paytda throughputni vaqti-vaqti bilan chiqarish
+        next_stats = time.monotonic() + args.stats_interval
+        while True:
+            # Barcha kameralar olib tashlangan bo'lsa konfiguratsiyaga yangi kamera qo'shilishi kutiladi
+            if not cameras.alive() and (cameras.running or watcher is None):
+                break
+            time.sleep(max(0.0, min(args.reload_interval or args.stats_interval, next_stats - time.monotonic())))
+            if watcher is not None and watcher.changed():
+                try:
+                    cameras.apply(read_cameras(load_camera_config(args.config), camera_options(args)))
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    # Yarim saqlangan yoki xato fayl: ishlayotgan kameralar o'zgarmaydi
+                    print(f"{args.config} faylini qayta yuklab bo'lmadi: {e}")
+            cameras.reap()
+            if time.monotonic() < next_stats:
+                continue
+            next_stats = time.monotonic() + args.stats_interval
+            print(format_throughput(scheduler.meter.snapshot()))
+            print(format_capture_stats(captures))
+            if args.adaptive or any(samplers.values()):
+                print(format_sampler_stats(samplers))
+            if args.motion_gate or any(gates.values()):
+                print(format_gate_stats(gates))
+            if any(identifiers.values()):
+                print(format_reid_stats(identifiers))
+            print(persist.stats_line())
+            if args.metrics_file:
+                metrics.dump(args.metrics_file)
+        if args.profile:
+            print(format_profile(metrics))
+            if args.profile_output:
+                with open(args.profile_output, "w") as f:
+                    json.dump(summarize(metrics), f, indent=2)
+    finally:
+        if server is not None:
+            server.stop()
+        metrics.remove_collector(collect)
+        scheduler.stop()
+        persist.close()
 
 if __name__ == "__main__":
+    args = parse_args()
     while True:
         try:
-            main()
+            main(args)
+            if args.profile:
+                break
         except Exception as e:
             print(f"Xatolik yuz berdi: {e}")
             print("Dastur qayta ishga tushirilmoqda...")
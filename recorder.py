@@ -0,0 +1,127 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import cv2
+
+# Yozuvchi navbatidagi kadrlar soni; to'lib qolsa yangi kadrlar tashlanadi
+RECORD_QUEUE_SIZE = 32
+# "changes" rejimida bandlik o'zgarishidan keyin shuncha soniya yoziladi
+SEGMENT_SECONDS = 20.0
+
+
+def timestamps_file(video_name):
+    # Video yonidagi fayl: har bir yozilgan kadr uchun bitta qator - kadr yozuvchiga berilgan paytdagi Unix vaqti.
+    # Video nominal fps bilan yoziladi, lekin kadrlar qayta ishlash tezligida keladi (o'quvchi eskilarini
+    # tashlaydi), shuning uchun haqiqiy vaqt faqat shu fayldan olinadi (offline.py)
+    return f"{video_name}.times"
+
+
+def read_timestamps(video_name):
+    # [Unix vaqti, ...] yoki fayl bo'lmasa None; yarim yozilgan oxirgi qator tashlanadi
+    path = timestamps_file(video_name)
+    if not os.path.exists(path):
+        return None
+    stamps = []
+    with open(path) as f:
+        for line in f:
+            try:
+                stamps.append(float(line))
+            except ValueError:
+                break
+    return stamps or None
+
+
+class VideoRecorder:
+    # Videoni alohida oqimda yozadi: kadr oqimi faqat navbatga qo'yadi va hech qachon kutmaydi.
+    # scale/max_fps bilan kichikroq o'lcham yoki chastotada, segment_seconds berilsa
+    # faqat bandlik o'zgargan paytlar atrofida alohida kliplar sifatida yoziladi.
+    def __init__(self, base_name, fps, scale=1.0, max_fps=None, segment_seconds=None, queue_size=RECORD_QUEUE_SIZE):
+        self.base_name = base_name
+        fps = fps if fps and fps > 0 else 20.0
+        self.fps = min(fps, max_fps) if max_fps else fps
+        self.scale = scale
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.segment_seconds = segment_seconds
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._last_write = None
+        self._segment = None if segment_seconds else f"{base_name}.mp4"
+        self._segment_until = None
+        self.queued = 0
+        self.dropped = 0
+        self.written = 0
+        self._thread = threading.Thread(target=self._run, name=f"recorder-{base_name}", daemon=True)
+        self._thread.start()
+
+    def mark_change(self, now=None):
+        if not self.segment_seconds:
+            return
+        now = time.monotonic() if now is None else now
+        if self._segment is None:
+            self._segment = f"{self.base_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
+        self._segment_until = now + self.segment_seconds
+
+    def write(self, frame, now=None):
+        now = time.monotonic() if now is None else now
+        if self.segment_seconds:
+            if self._segment is None:
+                return
+            if now > self._segment_until:
+                self._put(("close", None, None))
+                self._segment = None
+                return
+        if self._last_write is not None and now - self._last_write < self.min_interval:
+            return
+        if self._put((self._segment, frame, time.time())):
+            self._last_write = now
+            self.queued += 1
+        else:
+            self.dropped += 1
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            return False
+
+    def _run(self):
+        writer = None
+        times = None
+        current = None
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            name, frame, stamp = item
+            if name == "close" or name != current:
+                if writer is not None:
+                    writer.release()
+                    times.close()
+                writer, times, current = None, None, None
+                if name == "close":
+                    continue
+            if self.scale != 1.0:
+                frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+            if writer is None:
+                height, width = frame.shape[:2]
+                writer = cv2.VideoWriter(name, cv2.VideoWriter_fourcc(*'mp4v'), self.fps, (width, height))
+                times = open(timestamps_file(name), "w")
+                current = name
+            writer.write(frame)
+            times.write(f"{stamp:.3f}\n")
+            self.written += 1
+        if writer is not None:
+            writer.release()
+            times.close()
+
+    def stats(self):
+        return {"queued": self.queued, "dropped": self.dropped, "written": self.written,
+                "queue_depth": self._queue.qsize()}
+
+    def release(self):
+        # Navbatdagi kadrlar yozib bo'lingach fayl yopiladi
+        self._queue.put(None)
+        self._thread.join()
@@ -0,0 +1,217 @@
+import argparse
+import os
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Hududga kirgan odamni ro'yxatdan o'tgan xodimlar bilan solishtirish (qayta identifikatsiya).
+# Vektor faqat kirish o'tishida hisoblanadi (har kadrda emas), shuning uchun CPU'da ko'p kamera bilan ishlaydi.
+# Indeks yaratish: workers/<xodim nomi>/*.jpg - har bir xodimning bir nechta qirqilgan rasmi
+#   python reid.py enroll workers --out workers_index.npz [--model osnet_x0_25.onnx]
+
+REID_INDEX = "workers_index.npz"
+# Kosinus o'xshashlik chegarasi: undan past bo'lsa odam noma'lum (vaqt hudud nomiga yoziladi)
+REID_THRESHOLD = 0.75
+# Gistogramma uchun qirqilgan rasm shu o'lchamga keltiriladi (kenglik, balandlik)
+REID_SIZE = (64, 128)
+# ONNX ReID modellarining (OSNet va boshqalar) standart kirishi: 128x256 RGB, ImageNet o'rtacha/og'ish bilan
+DNN_SIZE = (128, 256)
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+# Trek ID bo'yicha eslab qolinadigan natijalar soni
+REID_CACHE = 256
+UNKNOWN = "noma'lum"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class HistogramEmbedder:
+    # Yengil tashqi ko'rinish vektori: rasm gorizontal bo'laklarga (bosh/gavda/oyoq) bo'linadi va har biri uchun
+    # HSV gistogramma olinadi. Kvadrat ildiz (Hellinger) va L2 normalash bilan kosinus o'xshashlikka mos keladi.
+    def __init__(self, bins=(8, 4, 4), stripes=3, size=REID_SIZE):
+        self.bins = list(bins)
+        self.stripes = stripes
+        self.size = size
+
+    def __call__(self, crop):
+        hsv = cv2.cvtColor(cv2.resize(crop, self.size), cv2.COLOR_BGR2HSV)
+        height = hsv.shape[0] // self.stripes
+        parts = []
+        for k in range(self.stripes):
+            hist = cv2.calcHist([hsv[k * height:(k + 1) * height]], [0, 1, 2], None, self.bins,
+                                [0, 180, 0, 256, 0, 256]).ravel()
+            parts.append(hist / max(hist.sum(), 1.0))
+        vector = np.sqrt(np.concatenate(parts)).astype(np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+
+class DnnEmbedder:
+    # ONNX ReID modeli (masalan OSNet) cv2.dnn orqali CPU'da; chiqish vektori L2 normalanadi.
+    # Kirish o'lchami va normalash model eksport qilingandagi bilan bir xil bo'lishi kerak
+    def __init__(self, path, size=DNN_SIZE, mean=IMAGENET_MEAN, std=IMAGENET_STD):
+        self.net = cv2.dnn.readNet(path)
+        self.size = tuple(size)
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.std = np.asarray(std, dtype=np.float32)
+
+    def __call__(self, crop):
+        image = cv2.cvtColor(cv2.resize(crop, self.size), cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0
+        blob = ((image - self.mean) / self.std).transpose(2, 0, 1)[np.newaxis]
+        self.net.setInput(np.ascontiguousarray(blob))
+        vector = self.net.forward().ravel().astype(np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+
+def make_embedder(model=None, size=None, mean=None, std=None):
+    if not model:
+        return HistogramEmbedder()
+    return DnnEmbedder(model, size or DNN_SIZE, IMAGENET_MEAN if mean is None else mean,
+                       IMAGENET_STD if std is None else std)
+
+
+def parse_size(value):
+    # "128x256" -> (128, 256)
+    width, height = (int(v) for v in value.lower().split("x"))
+    return width, height
+
+
+def parse_channels(value):
+    # "0.485,0.456,0.406" -> RGB kanallari bo'yicha uchta qiymat
+    channels = tuple(float(v) for v in value.split(","))
+    if len(channels) != 3:
+        raise argparse.ArgumentTypeError(f"uchta qiymat kerak: {value}")
+    return channels
+
+
+def add_reid_arguments(parser, prefix=""):
+    # ONNX modeli kirish o'lchami va normalash (reid.py va oqim.py uchun umumiy)
+    parser.add_argument(f"--{prefix}input-size", type=parse_size, default=None,
+                        help=f"ONNX modeli kirishi KxB (standart: {DNN_SIZE[0]}x{DNN_SIZE[1]})")
+    parser.add_argument(f"--{prefix}mean", type=parse_channels, default=None,
+                        help="RGB o'rtacha qiymati, 0..1 (standart: ImageNet)")
+    parser.add_argument(f"--{prefix}std", type=parse_channels, default=None,
+                        help="RGB og'ish, 0..1 (standart: ImageNet)")
+
+
+class WorkerIndex:
+    # Xodimlar vektorlari xotirada (N, D) matritsa: har bir xodimning bir nechta namunasi bo'lishi mumkin.
+    # Moslash bitta matritsa-vektor ko'paytmasi; eng o'xshash namuna egasi qaytariladi.
+    def __init__(self, names, vectors, threshold=REID_THRESHOLD):
+        self.names = list(names)
+        self.vectors = np.asarray(vectors, dtype=np.float32).reshape(len(self.names), -1)
+        self.threshold = threshold
+
+    @classmethod
+    def load(cls, path, threshold=REID_THRESHOLD):
+        data = np.load(path, allow_pickle=False)
+        return cls(data["names"].tolist(), data["vectors"], threshold)
+
+    def save(self, path):
+        np.savez(path, names=np.array(self.names), vectors=self.vectors)
+
+    def match(self, vector):
+        # (xodim yoki None, o'xshashlik)
+        if not self.names:
+            return None, 0.0
+        scores = self.vectors @ vector
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        return (self.names[best] if score >= self.threshold else None), score
+
+
+class PersonIdentifier:
+    # Kirish o'tishida hududdagi odam qutisini qirqib, vektorini indeksda qidiradi.
+    # Trekker yoqilgan bo'lsa topilgan xodim trek ID bo'yicha keshlanadi: shu trek boshqa hududga
+    # o'tganda vektor qayta hisoblanmaydi.
+    def __init__(self, index, embedder, cache_size=REID_CACHE):
+        self.index = index
+        self.embedder = embedder
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.embedded = 0
+        self.cached = 0
+
+    def identify(self, frame, box, key=None):
+        if key is not None and key in self.cache:
+            self.cache.move_to_end(key)
+            self.cached += 1
+            return self.cache[key]
+        height, width = frame.shape[:2]
+        x1, y1, x2, y2 = max(int(box[0]), 0), max(int(box[1]), 0), min(int(box[2]), width), min(int(box[3]), height)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        person, _ = self.index.match(self.embedder(frame[y1:y2, x1:x2]))
+        self.embedded += 1
+        if key is not None and person is not None:
+            # Noma'lum natija keshlanmaydi: keyingi o'tishda yaxshiroq kadrda qayta urinib ko'riladi
+            self.cache[key] = person
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return person
+
+
+def format_reid_stats(identifiers):
+    lines = []
+    for camera_id, identifier in sorted(identifiers.items(), key=lambda item: str(item[0])):
+        if identifier is None:
+            continue
+        lines.append(f"  Kamera {camera_id}: qayta identifikatsiya - vektor hisoblandi {identifier.embedded}, "
+                     f"trek keshidan {identifier.cached}")
+    return "\n".join(lines)
+
+
+def enroll(directory, embedder):
+    # workers/<nom>/*.jpg -> (nomlar, vektorlar)
+    names, vectors = [], []
+    for name in sorted(os.listdir(directory)):
+        folder = os.path.join(directory, name)
+        if not os.path.isdir(folder):
+            continue
+        for file_name in sorted(os.listdir(folder)):
+            if not file_name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            image = cv2.imread(os.path.join(folder, file_name))
+            if image is None:
+                print(f"{os.path.join(folder, file_name)}: rasmni o'qib bo'lmadi")
+                continue
+            names.append(name)
+            vectors.append(embedder(image))
+    return names, vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Xodimlarni qayta identifikatsiya qilish indeksi")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("enroll", help="workers/<nom>/*.jpg rasmlaridan indeks yaratish")
+    build.add_argument("directory")
+    build.add_argument("--out", default=REID_INDEX)
+    build.add_argument("--model", default=None, help="ONNX ReID modeli (standart: HSV gistogramma)")
+    add_reid_arguments(build)
+    check = sub.add_parser("match", help="rasmni indeks bilan solishtirish")
+    check.add_argument("images", nargs="+")
+    check.add_argument("--index", default=REID_INDEX)
+    check.add_argument("--model", default=None)
+    add_reid_arguments(check)
+    check.add_argument("--threshold", type=float, default=REID_THRESHOLD)
+    args = parser.parse_args()
+
+    embedder = make_embedder(args.model, args.input_size, args.mean, args.std)
+    if args.command == "enroll":
+        names, vectors = enroll(args.directory, embedder)
+        if not names:
+            raise SystemExit(f"{args.directory}: rasm topilmadi")
+        WorkerIndex(names, vectors).save(args.out)
+        print(f"{len(set(names))} xodim, {len(names)} namuna: {args.out}")
+        return
+    index = WorkerIndex.load(args.index, args.threshold)
+    for path in args.images:
+        image = cv2.imread(path)
+        if image is None:
+            print(f"{path}: rasmni o'qib bo'lmadi")
+            continue
+        person, score = index.match(embedder(image))
+        print(f"{path}: {person or UNKNOWN} ({score:.3f})")
+
+
+if __name__ == "__main__":
+    main()
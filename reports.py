@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils import get_column_letter
+
+from days import KEEP_DAYS
+
+
+def format_duration(total_time):
+    hours, remainder = divmod(int(total_time.total_seconds()), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def column_widths(rows):
+    widths = {}
+    for row in rows:
+        for col, value in enumerate(row, start=1):
+            widths[col] = max(widths.get(col, 0), len(str(value)) if value is not None else 0)
+    return {col: width + 2 for col, width in widths.items()}
+
+
+def write_sheets(file_name, sheets):
+    # sheets: [(title, rows), ...]. Write-only rejimda xotiradan to'g'ridan-to'g'ri yoziladi,
+    # eski faylni load_workbook qilish va har bir katakni aylanib chiqish kerak emas
+    wb = Workbook(write_only=True)
+    for title, rows in sheets:
+        ws = wb.create_sheet(title=title)
+        for col, width in column_widths(rows).items():
+            ws.column_dimensions[get_column_letter(col)].width = width
+        for row in rows:
+            ws.append(list(row))
+    tmp_file = f"{file_name}.tmp.xlsx"
+    wb.save(tmp_file)
+    os.replace(tmp_file, file_name)
+
+
+def read_sheets(file_name):
+    if not os.path.exists(file_name):
+        return []
+    try:
+        wb = load_workbook(file_name, read_only=True)
+    except Exception as e:
+        print(f"{file_name} faylini o'qishda xatolik: {e}. Yangi fayl yaratiladi.")
+        return []
+    sheets = [(ws.title, [list(row) for row in ws.iter_rows(values_only=True)]) for ws in wb.worksheets]
+    wb.close()
+    return sheets
+
+
+def keep_last(days, keep_days):
+    # Faylda faqat oxirgi keep_days kun varag'i qoladi; to'liq tarix days/ arxivida (days.DayArchive)
+    for day in sorted(days)[:-keep_days]:
+        del days[day]
+
+
+class DailyTotalsWorkbook:
+    # Har bir kun uchun alohida varaq: sarlavha va bitta jami qator.
+    # Eski fayl faqat birinchi yozishda o'qiladi, keyin holat xotirada saqlanadi.
+    def __init__(self, file_name, keep_days=KEEP_DAYS):
+        self.file_name = file_name
+        self.keep_days = keep_days
+        self.days = None
+
+    def write(self, header, day, row):
+        if self.days is None:
+            self.days = dict(read_sheets(self.file_name))
+        self.days[day] = [list(header), list(row)]
+        keep_last(self.days, self.keep_days)
+        write_sheets(self.file_name, sorted(self.days.items()))
+
+
+class TimeLogWorkbook:
+    # Har minutda qator qo'shiladigan hisobot (full.py). Har bir ish kuni alohida varaqda,
+    # shuning uchun fayl bitta varaqda cheksiz o'smaydi va har yozishda faqat oxirgi kunlar qayta yoziladi.
+    def __init__(self, file_name, keep_days=KEEP_DAYS):
+        self.file_name = file_name
+        self.keep_days = keep_days
+        self.days = None
+        self.existing = {}
+
+    def write(self, header, day, day_rows):
+        if self.days is None:
+            self.days = dict(read_sheets(self.file_name))
+            # Qayta ishga tushishdan oldingi shu kun qatorlari saqlanib qoladi
+            self.existing = {title: rows[1:] for title, rows in self.days.items()}
+        self.days[day] = [list(header)] + self.existing.get(day, []) + list(day_rows)
+        keep_last(self.days, self.keep_days)
+        write_sheets(self.file_name, sorted(self.days.items()))
+
+
+class ReportWriter:
+    # Hisobotlarni alohida oqimda yozadi. Bir fayl uchun navbatda faqat oxirgi holat turadi
+    # (oldingilari birlashtiriladi), shuning uchun kadr oqimi saqlashni hech qachon kutmaydi.
+    def __init__(self, name="report-writer"):
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.written = 0
+        self.failed = 0
+        self.write_time_total = 0.0
+        self.write_time_max = 0.0
+        self.submit_time_max = 0.0
+
+    def submit(self, key, write, *args):
+        started = time.perf_counter()
+        with self._cond:
+            if key in self._pending:
+                self.coalesced += 1
+            self._pending[key] = (write, args)
+            self.submitted += 1
+            self._cond.notify()
+        self.submit_time_max = max(self.submit_time_max, time.perf_counter() - started)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._stopping)
+                if not self._pending and self._stopping:
+                    break
+                pending, self._pending = self._pending, {}
+            for key, (write, args) in pending.items():
+                started = time.perf_counter()
+                try:
+                    write(*args)
+                    self.written += 1
+                except Exception as e:
+                    self.failed += 1
+                    print(f"Hisobotni yozishda xatolik ({key}): {e}")
+                elapsed = time.perf_counter() - started
+                self.write_time_total += elapsed
+                self.write_time_max = max(self.write_time_max, elapsed)
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "written": self.written,
+            "failed": self.failed,
+            "queue_depth": self.queue_depth(),
+            "write_ms_avg": self.write_time_total / self.written * 1000 if self.written else 0.0,
+            "write_ms_max": self.write_time_max * 1000,
+            "submit_ms_max": self.submit_time_max * 1000,
+        }
+
+    def close(self):
+        # Navbatda qolgan hisobotlar yozib bo'lingach to'xtaydi
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join()
+
+
+def format_writer_stats(stats, loop_ms_max=None):
+    line = (f"  Excel: yozildi {stats['written']}, birlashtirildi {stats['coalesced']}, navbatda {stats['queue_depth']}, "
+            f"saqlash o'rtacha {stats['write_ms_avg']:.1f} ms (max {stats['write_ms_max']:.1f} ms), "
+            f"navbatga qo'yish max {stats['submit_ms_max']:.3f} ms")
+    if loop_ms_max is not None:
+        line += f", saqlash chaqiruvi kadr oqimida max {loop_ms_max:.3f} ms"
+    return line
@@ -0,0 +1,72 @@
+from motion import padded_regions
+
+# Hudud atrofidagi chegara: odam qutisi hududdan chiqib turishi mumkin (hudud o'lchamiga nisbatan)
+ROI_PADDING = 0.5
+# Kesilgan qismlar kadrning shuncha qismidan ko'pini egallasa butun kadr ishlatiladi
+ROI_MAX_FRACTION = 0.8
+
+
+def regions_overlap(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def merge_regions(regions):
+    # Bir-birini kesib o'tgan qismlarni birlashtiramiz, aks holda bitta odam ikki marta aniqlanadi
+    regions = list(regions)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                if regions_overlap(regions[i], regions[j]):
+                    a, b = regions[i], regions.pop(j)
+                    regions[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    merged = True
+                    break
+            if merged:
+                break
+    return regions
+
+
+def roi_regions(rectangles, frame_shape, padding=ROI_PADDING, max_fraction=ROI_MAX_FRACTION):
+    height, width = frame_shape[:2]
+    regions = merge_regions(padded_regions(rectangles, frame_shape, padding))
+    area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+    if not regions or area >= max_fraction * width * height:
+        return [(0, 0, width, height)]
+    return regions
+
+
+class RoiDetector:
+    # Modelni butun kadrda emas, faqat hududlar atrofidagi qismlarda ishlatadi.
+    # Qismlar bitta batch bo'lib yuboriladi, qutilar kadr koordinatalariga qaytariladi.
+    # Chegara > 0 bo'lgani uchun qism chetida kesilgan quti hudud ichiga kirib qolmaydi.
+    def __init__(self, detect_many, rectangles, padding=ROI_PADDING, max_fraction=ROI_MAX_FRACTION, name=None):
+        self.detect_many = detect_many
+        self.name = name
+        self.rectangles = rectangles
+        self.padding = padding
+        self.max_fraction = max_fraction
+        self._shape = None
+        self.regions = []
+        self.pixel_fraction = 1.0
+
+    def _update_regions(self, frame_shape):
+        self._shape = frame_shape[:2]
+        self.regions = roi_regions(self.rectangles, frame_shape, self.padding, self.max_fraction)
+        height, width = self._shape
+        self.pixel_fraction = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in self.regions) / (width * height)
+        print(f"Kamera {self.name}: model {len(self.regions)} ta qismda ishlaydi, "
+              f"kadrning {self.pixel_fraction * 100:.0f}% qismi")
+
+    def __call__(self, frames):
+        detections = []
+        for frame in frames:
+            if frame.shape[:2] != self._shape:
+                self._update_regions(frame.shape)
+            crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in self.regions]
+            merged = []
+            for (ox, oy, _, _), crop_detections in zip(self.regions, self.detect_many(crops)):
+                merged.extend((x1 + ox, y1 + oy, x2 + ox, y2 + oy, conf) for x1, y1, x2, y2, conf in crop_detections)
+            detections.append(merged)
+        return detections
@@ -0,0 +1,71 @@
+import time
+
+# Hududlar holati barqaror bo'lganda aniqlash chastotasi (Hz)
+IDLE_HZ = 1.0
+# Harakat yoki holat o'zgarishidan keyingi chastota (Hz, 0 - har bir kadr)
+ACTIVE_HZ = 10.0
+# Tezlashtirilgan rejim davomiyligi (soniya)
+BOOST_SECONDS = 5.0
+# Bitta kirish/chiqish vaqtidagi ruxsat etilgan xatolik (soniya)
+TOLERANCE = 1.0
+
+
+class AdaptiveSampler:
+    # Aniqlashni har kadrda emas, hudud holatiga qarab kerakli chastotada bajaradi.
+    # Kirish/chiqish faqat aniqlash paytida ko'rinadi, shuning uchun barqaror holatdagi
+    # oraliq tolerance dan oshmaydi va har bir o'tish xatoligi shu bilan chegaralanadi.
+    def __init__(self, idle_hz=IDLE_HZ, active_hz=ACTIVE_HZ, boost_seconds=BOOST_SECONDS, tolerance=TOLERANCE):
+        idle_interval = 1.0 / idle_hz if idle_hz > 0 else 0.0
+        if tolerance:
+            idle_interval = min(idle_interval, tolerance)
+        self.idle_interval = idle_interval
+        self.active_interval = 1.0 / active_hz if active_hz > 0 else 0.0
+        self.boost_seconds = boost_seconds
+        self.boost_until = 0.0
+        self.last_sample = None
+        self.last_state = None
+        self.sampled = 0
+        self.skipped = 0
+
+    def boosted(self, now):
+        return now < self.boost_until
+
+    def boost(self, now):
+        self.boost_until = max(self.boost_until, now + self.boost_seconds)
+
+    def due(self, now=None):
+        now = time.monotonic() if now is None else now
+        if self.last_sample is None:
+            return True
+        interval = self.active_interval if self.boosted(now) else self.idle_interval
+        return now - self.last_sample >= interval
+
+    def observe(self, now, state):
+        state = tuple(state)
+        if self.last_state is not None and state != self.last_state:
+            self.boost(now)
+        self.last_state = state
+        self.last_sample = now
+        self.sampled += 1
+
+    def skip(self):
+        self.skipped += 1
+
+    def stats(self):
+        total = self.sampled + self.skipped
+        return {
+            "sampled": self.sampled,
+            "skipped": self.skipped,
+            "sample_rate": self.sampled / total if total else 0.0,
+        }
+
+
+def format_sampler_stats(samplers):
+    lines = []
+    for camera_id, sampler in sorted(samplers.items(), key=lambda item: str(item[0])):
+        if sampler is None:
+            continue
+        s = sampler.stats()
+        lines.append(f"  Kamera {camera_id}: aniqlash {s['sampled']}, o'tkazib yuborildi {s['skipped']} "
+                     f"({s['sample_rate'] * 100:.1f}% kadrlarda model ishladi)")
+    return "\n".join(lines)
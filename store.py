@@ -0,0 +1,240 @@
+import argparse
+import queue
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+from days import DAY_START, day_boundary, parse_day_start
+from inference import collect_batch
+
+DB_FILE = "presence.db"
+# Yozuvlar shu oraliqda yoki shu miqdorga yetganda bitta tranzaksiyada yoziladi
+BATCH_INTERVAL = 2.0
+BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS intervals (
+    id INTEGER PRIMARY KEY,
+    camera_id TEXT NOT NULL,
+    area TEXT NOT NULL,
+    day TEXT NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    person TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_intervals_area_day ON intervals (area, day);
+CREATE INDEX IF NOT EXISTS idx_intervals_camera_start ON intervals (camera_id, start);
+"""
+
+
+def connect(path=DB_FILE):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    if "person" not in [row[1] for row in conn.execute("PRAGMA table_info(intervals)")]:
+        # Qayta identifikatsiyadan oldingi baza: aniqlangan xodim ustuni qo'shiladi
+        conn.execute("ALTER TABLE intervals ADD COLUMN person TEXT")
+    return conn
+
+
+def split_by_day(start, end, offset=timedelta()):
+    # Kun chegarasidan o'tgan oraliq har bir ish kuni uchun alohida qatorga bo'linadi
+    pieces = []
+    while start < end:
+        day = (start - offset).date()
+        piece_end = min(end, day_boundary(day + timedelta(days=1), offset))
+        pieces.append((day.isoformat(), start, piece_end))
+        start = piece_end
+    return pieces
+
+
+class PresenceStore:
+    # Barcha kamera oqimlaridan kelgan qatnashish oraliqlarini navbat orqali yig'ib,
+    # alohida oqimda executemany bilan guruhlab yozadi
+    def __init__(self, path=DB_FILE, batch_interval=BATCH_INTERVAL, batch_size=BATCH_SIZE, day_offset=timedelta()):
+        self.path = path
+        self.day_offset = day_offset
+        self.batch_interval = batch_interval
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self.written = 0
+        connect(path).close()
+        self._thread = threading.Thread(target=self._run, name="presence-store", daemon=True)
+        self._thread.start()
+
+    def add_interval(self, camera_id, area, start, end, person=None):
+        # person - qayta identifikatsiyada aniqlangan xodim (bo'lmasa vaqt hudud nomiga tegishli)
+        self._queue.put((str(camera_id), area, start, end, person))
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        conn = connect(self.path)
+        while True:
+            batch = collect_batch(self._queue, self.batch_size, self.batch_interval)
+            stopping = batch[-1] is None
+            batch = [item for item in batch if item is not None]
+            if batch:
+                self._write(conn, batch)
+            if stopping:
+                break
+        conn.close()
+
+    def _write(self, conn, batch):
+        rows = []
+        for camera_id, area, start, end, person in batch:
+            for day, piece_start, piece_end in split_by_day(start, end, self.day_offset):
+                rows.append((camera_id, area, day, piece_start.timestamp(), piece_end.timestamp(), person))
+        try:
+            with conn:
+                conn.executemany("INSERT INTO intervals (camera_id, area, day, start, end, person) "
+                                 "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.written += len(rows)
+        except sqlite3.Error as e:
+            print(f"Ma'lumotlar bazasiga yozishda xatolik: {e}")
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+def range_totals(conn, first_day, last_day, area=None):
+    # [(camera_id, hudud, kun, soniya), ...]; hudud berilsa (area, day) indeksi ishlatiladi
+    query = "SELECT camera_id, area, day, SUM(end - start) FROM intervals WHERE day BETWEEN ? AND ?"
+    params = [first_day.isoformat(), last_day.isoformat()]
+    if area is not None:
+        query += " AND area = ?"
+        params.append(area)
+    rows = conn.execute(query + " GROUP BY camera_id, area, day ORDER BY day", params)
+    return [(camera_id, area, date.fromisoformat(day), seconds) for camera_id, area, day, seconds in rows]
+
+
+def sum_totals(rows):
+    # {(camera_id, hudud): soniya}
+    totals = {}
+    for camera_id, area, _, seconds in rows:
+        totals[(camera_id, area)] = totals.get((camera_id, area), 0.0) + seconds
+    return totals
+
+
+def daily_totals(conn, day, area=None):
+    return sum_totals(range_totals(conn, day, day, area))
+
+
+def weekly_totals(conn, any_day, area=None):
+    monday = any_day - timedelta(days=any_day.weekday())
+    return sum_totals(range_totals(conn, monday, monday + timedelta(days=6), area))
+
+
+def worker_totals(conn, first_day, last_day, area=None):
+    # {xodim: soniya} barcha kameralar (va collector'da hostlar) bo'yicha. Xodim - qayta identifikatsiyada
+    # aniqlangan odam, aniqlanmagan bo'lsa hudud nomi. Bir odam bir vaqtda bir nechta kamerada ko'rinsa
+    # kesishgan oraliqlar birlashtiriladi va vaqt bir marta sanaladi
+    query = "SELECT COALESCE(person, area) AS worker, start, end FROM intervals WHERE day BETWEEN ? AND ?"
+    params = [first_day.isoformat(), last_day.isoformat()]
+    if area is not None:
+        query += " AND COALESCE(person, area) = ?"
+        params.append(area)
+    totals = {}
+    current_area, current_start, current_end = None, 0.0, 0.0
+    for name, start, end in conn.execute(query + " ORDER BY worker, start", params):
+        if name == current_area and start <= current_end:
+            current_end = max(current_end, end)
+            continue
+        if current_area is not None:
+            totals[current_area] = totals.get(current_area, 0.0) + current_end - current_start
+        current_area, current_start, current_end = name, start, end
+    if current_area is not None:
+        totals[current_area] = totals.get(current_area, 0.0) + current_end - current_start
+    return totals
+
+
+def hourly_utilization(conn, day, offset=timedelta()):
+    # {(camera_id, hudud): [ish kuni boshidan 24 ta soat uchun band bo'lgan ulush 0..1]}
+    start = day_boundary(day, offset).timestamp()
+    rows = conn.execute(
+        """
+        WITH RECURSIVE hours(h) AS (SELECT 0 UNION ALL SELECT h + 1 FROM hours WHERE h < 23)
+        SELECT camera_id, area, h,
+               SUM(MAX(0, MIN(end, :start + (h + 1) * 3600) - MAX(start, :start + h * 3600)))
+        FROM intervals JOIN hours
+        WHERE day = :day AND start < :start + (h + 1) * 3600 AND end > :start + h * 3600
+        GROUP BY camera_id, area, h
+        """,
+        {"start": start, "day": day.isoformat()})
+    utilization = {}
+    for camera_id, area, hour, seconds in rows:
+        utilization.setdefault((camera_id, area), [0.0] * 24)[hour] = seconds / 3600
+    return utilization
+
+
+def export_excel(conn, file_name, first_day, last_day, offset=timedelta()):
+    # Ma'lumotlar bazasidan talab bo'yicha hisobot: har kun uchun varaq va soatlik bandlik
+    from reports import format_duration, write_sheets
+
+    by_day = {}
+    for camera_id, area, day, seconds in range_totals(conn, first_day, last_day):
+        by_day.setdefault(day, {})[(camera_id, area)] = seconds
+
+    sheets = []
+    summary = {}
+    for day in sorted(by_day):
+        totals = by_day[day]
+        utilization = hourly_utilization(conn, day, offset)
+        rows = [["Kamera", "Hudud", "Jami"] + [(day_boundary(day, offset) + timedelta(hours=hour)).strftime("%H:%M")
+                                               for hour in range(24)]]
+        for key in sorted(totals):
+            hours = utilization.get(key, [0.0] * 24)
+            rows.append([key[0], key[1], format_duration(timedelta(seconds=totals[key]))] + [f"{value * 100:.0f}%" for value in hours])
+            summary[key] = summary.get(key, 0.0) + totals[key]
+        sheets.append((day.isoformat(), rows))
+    summary_rows = [["Kamera", "Hudud", f"Jami {first_day.isoformat()} - {last_day.isoformat()}"]]
+    summary_rows += [[key[0], key[1], format_duration(timedelta(seconds=summary[key]))] for key in sorted(summary)]
+    write_sheets(file_name, [("Jami", summary_rows)] + sheets)
+
+
+def main():
+    from reports import format_duration
+
+    parser = argparse.ArgumentParser(description="Qatnashish oraliqlari bazasidan hisobotlar")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--day-start", default=DAY_START, help="ish kuni chegarasi (HH:MM), oqim.py bilan bir xil")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("daily", "weekly", "hourly"):
+        command = sub.add_parser(name)
+        command.add_argument("--day", type=date.fromisoformat, default=date.today())
+        command.add_argument("--area", default=None)
+    workers = sub.add_parser("workers", help="xodimlar bo'yicha jami vaqt (kameralar kesishmasi bir marta)")
+    workers.add_argument("--from", dest="first_day", type=date.fromisoformat, default=date.today())
+    workers.add_argument("--to", dest="last_day", type=date.fromisoformat, default=date.today())
+    workers.add_argument("--area", default=None)
+    export = sub.add_parser("export", help="Excel hisobotini yaratish")
+    export.add_argument("--from", dest="first_day", type=date.fromisoformat, default=date.today())
+    export.add_argument("--to", dest="last_day", type=date.fromisoformat, default=date.today())
+    export.add_argument("--out", default="time_tracking_report.xlsx")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    offset = parse_day_start(args.day_start)
+    if args.command in ("daily", "weekly"):
+        totals = (daily_totals if args.command == "daily" else weekly_totals)(conn, args.day, args.area)
+        for (camera_id, area), seconds in sorted(totals.items()):
+            print(f"Kamera {camera_id}  {area}: {format_duration(timedelta(seconds=seconds))}")
+    elif args.command == "workers":
+        for area, seconds in sorted(worker_totals(conn, args.first_day, args.last_day, args.area).items()):
+            print(f"{area}: {format_duration(timedelta(seconds=seconds))}")
+    elif args.command == "hourly":
+        for (camera_id, area), hours in sorted(hourly_utilization(conn, args.day, offset).items()):
+            if args.area is not None and area != args.area:
+                continue
+            print(f"Kamera {camera_id}  {area}: " + " ".join(f"{value * 100:3.0f}" for value in hours))
+    else:
+        export_excel(conn, args.out, args.first_day, args.last_day, offset)
+        print(f"Hisobot saqlandi: {args.out}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import numpy as np
+
+from areas import boxes_array
+
+# Mos kelish uchun minimal IoU
+TRACK_IOU = 0.3
+# Aniqlanmagan trek shuncha soniyadan keyin o'chiriladi
+TRACK_MAX_AGE = 2.0
+# Trek shuncha aniqlashdan keyin tasdiqlangan hisoblanadi
+TRACK_MIN_HITS = 1
+# Ishonchi shundan yuqori qutilar birinchi bosqichda, qolganlari ikkinchi bosqichda moslanadi (ByteTrack)
+HIGH_CONFIDENCE = 0.5
+# Hududga kirish/chiqish shuncha soniya davom etgandan keyin qayd qilinadi
+ENTER_SECONDS = 0.0
+EXIT_SECONDS = 0.0
+
+
+def iou_matrix(boxes_a, boxes_b):
+    # (N, 4) va (M, 4) qutilar uchun (N, M) IoU matritsa
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)))
+    ax1, ay1, ax2, ay2 = (boxes_a[:, k, None] for k in range(4))
+    bx1, by1, bx2, by2 = (boxes_b[None, :, k] for k in range(4))
+    inter = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None) * \
+        np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    union = (ax2 - ax1) * (ay2 - ay1) + (bx2 - bx1) * (by2 - by1) - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+def greedy_match(iou, threshold):
+    # Eng katta IoU'dan boshlab juftlash; odamlar soni kam bo'lgani uchun Hungarian kerak emas
+    matches = []
+    if iou.size == 0:
+        return matches
+    rows, cols = np.where(iou >= threshold)
+    order = np.argsort(-iou[rows, cols])
+    used_rows, used_cols = set(), set()
+    for k in order:
+        r, c = rows[k], cols[k]
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+        matches.append((r, c))
+    return matches
+
+
+class Track:
+    # Doimiy tezlikli Kalman filtri: holat [cx, cy, w, h, vx, vy, vw, vh], vaqt soniyalarda
+    def __init__(self, track_id, box, conf, now):
+        x1, y1, x2, y2 = box
+        self.id = track_id
+        self.state = np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1, 0, 0, 0, 0], dtype=np.float64)
+        size = max(x2 - x1, y2 - y1, 1.0)
+        self.covariance = np.diag([size, size, size, size, size * 10, size * 10, size * 10, size * 10]) ** 2 / 100
+        self.conf = conf
+        self.hits = 1
+        self.last_time = now
+        self.last_seen = now
+
+    def predict(self, now):
+        dt = max(now - self.last_time, 0.0)
+        self.last_time = now
+        if dt == 0:
+            return
+        transition = np.eye(8)
+        transition[:4, 4:] = np.eye(4) * dt
+        scale = max(self.state[2], self.state[3], 1.0)
+        noise = np.diag([1, 1, 1, 1, 10, 10, 10, 10]) * (scale * 0.05) ** 2 * dt
+        self.state = transition @ self.state
+        self.state[2:4] = np.maximum(self.state[2:4], 1.0)
+        self.covariance = transition @ self.covariance @ transition.T + noise
+
+    def correct(self, box, conf, now):
+        x1, y1, x2, y2 = box
+        measurement = np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1])
+        scale = max(measurement[2], measurement[3], 1.0)
+        observation = np.eye(4, 8)
+        innovation = observation @ self.covariance @ observation.T + np.eye(4) * (scale * 0.05) ** 2
+        gain = self.covariance @ observation.T @ np.linalg.inv(innovation)
+        self.state = self.state + gain @ (measurement - observation @ self.state)
+        self.covariance = (np.eye(8) - gain @ observation) @ self.covariance
+        self.conf = conf
+        self.hits += 1
+        self.last_seen = now
+
+    def box(self):
+        cx, cy, w, h = self.state[:4]
+        return cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2
+
+    def detection(self):
+        x1, y1, x2, y2 = self.box()
+        return int(x1), int(y1), int(x2), int(y2), self.conf
+
+
+class IouTracker:
+    # Yengil ko'p obyektli kuzatuvchi: Kalman bashorati + IoU bo'yicha moslash, ikki bosqichli
+    # (avval ishonchli, keyin past ishonchli qutilar). Aniqlash bo'lmagan kadrlarda update()
+    # o'rniga predict() chaqiriladi va odamlar bashorat qilingan joyida qoladi.
+    def __init__(self, iou_threshold=TRACK_IOU, max_age=TRACK_MAX_AGE, min_hits=TRACK_MIN_HITS,
+                 high_confidence=HIGH_CONFIDENCE):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.high_confidence = high_confidence
+        self.tracks = []
+        self.next_id = 1
+
+    def predict(self, now):
+        for track in self.tracks:
+            track.predict(now)
+        self.tracks = [track for track in self.tracks if now - track.last_seen <= self.max_age]
+        return self.active()
+
+    def update(self, detections, now):
+        for track in self.tracks:
+            track.predict(now)
+        boxes = boxes_array(detections)
+        confs = np.array([d[4] for d in detections], dtype=np.float64)
+        high = np.flatnonzero(confs >= self.high_confidence)
+        low = np.flatnonzero(confs < self.high_confidence)
+
+        unmatched_tracks = list(range(len(self.tracks)))
+        matched_detections = set()
+        for candidates in (high, low):
+            if not len(candidates) or not unmatched_tracks:
+                continue
+            track_boxes = np.array([self.tracks[t].box() for t in unmatched_tracks])
+            matches = greedy_match(iou_matrix(track_boxes, boxes[candidates]), self.iou_threshold)
+            for r, c in matches:
+                d = candidates[c]
+                self.tracks[unmatched_tracks[r]].correct(boxes[d], confs[d], now)
+                matched_detections.add(d)
+            matched = {unmatched_tracks[r] for r, _ in matches}
+            unmatched_tracks = [t for t in unmatched_tracks if t not in matched]
+
+        # Moslanmagan ishonchli qutilardan yangi trek ochiladi
+        for d in high:
+            if d in matched_detections:
+                continue
+            self.tracks.append(Track(self.next_id, boxes[d], confs[d], now))
+            self.next_id += 1
+        self.tracks = [track for track in self.tracks if now - track.last_seen <= self.max_age]
+        return self.active()
+
+    def active(self):
+        return [track for track in self.tracks if track.hits >= self.min_hits]
+
+
+class PresenceHysteresis:
+    # Hudud holatini bitta kadrdagi natija bo'yicha emas, enter_seconds/exit_seconds davom
+    # etgandan keyin o'zgartiradi. Qayd qilingan o'tish vaqti holat birinchi kuzatilgan paytga (chiqishda -
+    # odam oxirgi marta ko'rilgan paytga) teng bo'ladi, shuning uchun kechikish umumiy vaqtga ta'sir qilmaydi.
+    # Barcha hududlar int64 nanosoniya massivlarida bitta vektor amalida yangilanadi. Vaqt istalgan o'suvchi
+    # soat bo'lishi mumkin: jonli oqimda time.monotonic_ns(), oflayn videoda kadrning video boshidan vaqti.
+    __slots__ = ("present", "waiting", "pending_ns", "last_seen_ns", "seen", "enter_ns", "exit_ns")
+
+    def __init__(self, present, enter_seconds=ENTER_SECONDS, exit_seconds=EXIT_SECONDS):
+        count = len(present)
+        self.present = np.array(present, dtype=bool).reshape(count)
+        self.enter_ns = int(enter_seconds * 1e9)
+        self.exit_ns = int(exit_seconds * 1e9)
+        # Kutilayotgan o'tish boshlangan vaqt (kirish uchun: birinchi ko'rilgan, chiqish uchun: oxirgi ko'rilgan)
+        self.waiting = np.zeros(count, dtype=bool)
+        self.pending_ns = np.zeros(count, dtype=np.int64)
+        self.seen = np.zeros(count, dtype=bool)
+        self.last_seen_ns = np.zeros(count, dtype=np.int64)
+
+    def update(self, detected, now_ns):
+        # Holati o'zgargan hududlar maskasi yoki None. Kirganlar - mask & detected; o'tish vaqtlari
+        # keyingi update() gacha pending_ns[mask] da turadi
+        detected = np.asarray(detected, dtype=bool)
+        self.last_seen_ns[detected] = now_ns
+        self.seen |= detected
+        differs = detected != self.present
+        if not differs.any():
+            # Odatiy holat: hech qaysi hududda o'zgarish yo'q
+            self.waiting[:] = False
+            return None
+        self.waiting &= differs
+        new = differs & ~self.waiting
+        if new.any():
+            self.pending_ns[new] = now_ns
+            leaving = new & ~detected & self.seen
+            self.pending_ns[leaving] = self.last_seen_ns[leaving]
+            self.waiting |= new
+        fired = self.waiting & (now_ns - self.pending_ns >= np.where(detected, self.enter_ns, self.exit_ns))
+        if not fired.any():
+            return None
+        self.present[fired] = detected[fired]
+        self.waiting[fired] = False
+        return fired
+
+    def copy_area(self, other, j, i):
+        # other hysteresis'ning i-hudud holatini shu obyektning j-hududiga ko'chirish (hududlar qayta tartiblanganda)
+        for field in ("present", "waiting", "pending_ns", "last_seen_ns", "seen"):
+            getattr(self, field)[j] = getattr(other, field)[i]
@@ -0,0 +1,458 @@
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from functools import partial
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from backends import warm_up
+from inference import InferenceScheduler, ThroughputMeter, collect_batch, format_throughput, person_boxes
+
+# Linux'da fork ishlatiladi: yuklangan model va funksiyalar pickle qilinmasdan bolalarga o'tadi
+MP_CONTEXT = "fork"
+# Qayta ishga tushirish oralig'i: xatolik takrorlansa ikki barobardan oshib boradi
+RESTART_BACKOFF = 1.0
+RESTART_BACKOFF_MAX = 60.0
+# Shuncha vaqt xatosiz ishlagan kamera uchun oraliq boshlang'ich qiymatga qaytadi
+HEALTHY_SECONDS = 60.0
+# Worker kadrlari shared memory'da shu prefiks va jarayon PID'i bilan nomlanadi: jarayon qulasa uning
+# segmentlari nomi bo'yicha topilib o'chiriladi (Linux'da ular /dev/shm'da turadi)
+SHM_PREFIX = "oqim_frames"
+SHM_DIR = "/dev/shm"
+# Kamera bo'yicha kadr/s shu oraliqda worker'lardan yig'iladi va chiqariladi (oqim.py --stats-interval)
+STATS_INTERVAL = 30.0
+# Inference javobi shuncha soniyada kelmasa kamera xatolik bilan to'xtaydi va supervise uni qayta ishga tushiradi
+INFERENCE_TIMEOUT = 60.0
+
+
+def shard_cameras(cameras, cameras_per_process):
+    size = max(1, int(cameras_per_process))
+    return [cameras[i:i + size] for i in range(0, len(cameras), size)]
+
+
+def default_torch_threads(processes):
+    return max(1, (os.cpu_count() or 1) // max(1, processes))
+
+
+def set_torch_threads(threads):
+    # Har bir jarayon barcha yadrolarni egallab olmasligi uchun
+    if not threads:
+        return
+    try:
+        import torch
+        torch.set_num_threads(int(threads))
+    except ImportError:
+        pass
+
+
+def supervise(name, target, *args, backoff_initial=RESTART_BACKOFF, backoff_max=RESTART_BACKOFF_MAX,
+              healthy_after=HEALTHY_SECONDS, stop=None):
+    # Bitta kamera xatolik bilan to'xtasa faqat uning o'zi qayta ishga tushiriladi,
+    # model va boshqa kameralar ishlashda davom etadi. Oddiy qaytish (masalan 'q') - to'xtash.
+    # stop o'rnatilgan bo'lsa (kamera konfiguratsiyadan olib tashlangan) qayta ishga tushirilmaydi.
+    backoff = backoff_initial
+    while stop is None or not stop.is_set():
+        started = time.monotonic()
+        try:
+            target(*args)
+            return
+        except Exception as e:
+            if time.monotonic() - started >= healthy_after:
+                backoff = backoff_initial
+            print(f"{name} xatolik bilan to'xtadi: {e!r}. {backoff:.0f} soniyadan keyin qayta ishga tushiriladi...")
+        if stop is not None:
+            stop.wait(backoff)
+        else:
+            time.sleep(backoff)
+        backoff = min(backoff * 2, backoff_max)
+
+
+def frame_prefix(pid):
+    return f"{SHM_PREFIX}_{pid}_"
+
+
+def unlink_frames(pid):
+    # Qulagan (yoki terminate qilingan) worker o'zi yopa olmagan kadr segmentlarini o'chirish
+    try:
+        names = os.listdir(SHM_DIR)
+    except OSError:
+        return 0
+    removed = 0
+    for name in names:
+        if name.startswith(frame_prefix(pid)):
+            try:
+                os.remove(os.path.join(SHM_DIR, name))
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def response_pipes(ctx, count):
+    # Har bir worker uchun javob kanali - bir tomonlama Pipe. mp.Queue.get() kutish paytida jarayonlararo qulfni
+    # ushlab turadi va worker qulasa qulf bo'shamaydi, qayta ishga tushgan worker javob ololmay qoladi.
+    # Pipe'dan o'qishda qulf yo'q; o'qish uchi asosiy jarayonda qoladi va yangi worker'ga fork orqali o'tadi.
+    # (o'qish uchlari, yozish uchlari)
+    pipes = [ctx.Pipe(duplex=False) for _ in range(count)]
+    return [reader for reader, _ in pipes], [writer for _, writer in pipes]
+
+
+# Jarayon ichidagi segment raqamlari
+_slot_numbers = itertools.count()
+
+
+class FrameSlot:
+    # Kamera uchun shared memory'dagi bitta kadr joyi.
+    # Kamera oqimi natijani kutib turadi, shuning uchun bitta joy yetarli.
+    def __init__(self):
+        self.shm = None
+
+    def write(self, frame):
+        frame = np.ascontiguousarray(frame)
+        if self.shm is None or self.shm.size < frame.nbytes:
+            self.close()
+            self.shm = shared_memory.SharedMemory(name=f"{frame_prefix(os.getpid())}{next(_slot_numbers)}",
+                                                  create=True, size=frame.nbytes)
+        view = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self.shm.buf)
+        view[...] = frame
+        del view
+        return self.shm.name, frame.shape, frame.dtype.str
+
+    def close(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+class SharedInferenceClient:
+    # Worker jarayonidagi kamera oqimlarini umumiy inference jarayoniga ulaydi.
+    # Kadr shared memory orqali uzatiladi, navbatga faqat uning nomi va shakli tushadi.
+    def __init__(self, worker_index, requests, responses, timeout=INFERENCE_TIMEOUT):
+        self.worker_index = worker_index
+        self.requests = requests
+        self.responses = responses
+        self.timeout = timeout
+        # So'rov ID'si jarayon PID'i bilan: qayta ishga tushgan worker qulagan jarayonning kechikkan javoblarini
+        # o'ziniki deb olmaydi
+        self._pid = os.getpid()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._slots = {}
+        # Kamera bo'yicha kadr/s; batch - bitta detect_many chaqiruvidagi kadrlar (ROI qismlari)
+        self.meter = ThroughputMeter()
+        self._dispatcher = threading.Thread(target=self._dispatch, name=f"inference-client-{worker_index}", daemon=True)
+        self._dispatcher.start()
+
+    def detect(self, camera_id, frame):
+        return self.detect_many(camera_id, [frame])[0]
+
+    def detect_many(self, camera_id, frames):
+        pendings = []
+        for index, frame in enumerate(frames):
+            # Har bir kadr (yoki ROI qismi) uchun alohida joy, natija kelguncha ular qayta yozilmaydi
+            slot = self._slots.setdefault((camera_id, index), FrameSlot())
+            shm_name, shape, dtype = slot.write(frame)
+            request_id = (self._pid, next(self._ids))
+            pending = {"done": threading.Event(), "detections": None, "error": None}
+            with self._lock:
+                self._pending[request_id] = pending
+            self.requests.put((self.worker_index, request_id, (camera_id, index), shm_name, shape, dtype))
+            pendings.append((request_id, pending))
+        detections = []
+        for request_id, pending in pendings:
+            if not pending["done"].wait(self.timeout):
+                # Inference jarayoni qulagan yoki osilib qolgan: kutishni to'xtatamiz
+                with self._lock:
+                    for other_id, _ in pendings:
+                        self._pending.pop(other_id, None)
+                raise TimeoutError(f"Inference javobi {self.timeout:g} soniyada kelmadi")
+            if pending["error"] is not None:
+                raise RuntimeError(f"Inference jarayonida xatolik: {pending['error']}")
+            detections.append(pending["detections"])
+        self.meter.add([camera_id] * len(frames))
+        return detections
+
+    def _dispatch(self):
+        while True:
+            try:
+                request_id, detections, error = self.responses.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                pending = self._pending.pop(request_id, None)
+            if pending is not None:
+                pending["detections"] = detections
+                pending["error"] = error
+                pending["done"].set()
+
+    def close(self):
+        for slot in self._slots.values():
+            slot.close()
+        self._slots.clear()
+
+
+def _serve_batch(model, batch, attached):
+    outputs = [None] * len(batch)
+    frames, ready = [], []
+    for k, (worker_index, _, camera_id, shm_name, shape, dtype) in enumerate(batch):
+        key = (worker_index, camera_id)
+        shm = attached.get(key)
+        if shm is None or shm.name != shm_name:
+            # Kadr o'lchami o'zgarganda yoki worker qayta ishga tushganda yangi joy ochiladi
+            if shm is not None:
+                attached.pop(key).close()
+            try:
+                shm = attached[key] = shared_memory.SharedMemory(name=shm_name)
+            except FileNotFoundError:
+                # Qulagan worker'ning navbatda qolgan so'rovi: segmenti allaqachon o'chirilgan
+                outputs[k] = (None, f"kadr topilmadi: {shm_name}")
+                continue
+            # Segment worker'niki: inference jarayonining resource_tracker'i uni o'chirmasligi kerak
+            resource_tracker.unregister(shm._name, "shared_memory")
+        frames.append(np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf))
+        ready.append(k)
+    if not frames:
+        return outputs
+    try:
+        results = model(frames, verbose=False)
+        for k, r in zip(ready, results):
+            outputs[k] = (person_boxes([r]), None)
+    except Exception as e:
+        for k in ready:
+            outputs[k] = (None, repr(e))
+    return outputs
+
+
+def run_inference_server(model, requests, responses, max_batch_size, max_wait, torch_threads=None):
+    set_torch_threads(torch_threads)
+    warm_up(model)
+    attached = {}
+    try:
+        while True:
+            batch = collect_batch(requests, max_batch_size, max_wait)
+            stopping = batch[-1] is None
+            batch = [item for item in batch if item is not None]
+            if batch:
+                outputs = _serve_batch(model, batch, attached)
+                for (worker_index, request_id, *_), (detections, error) in zip(batch, outputs):
+                    responses[worker_index].send((request_id, detections, error))
+            if stopping:
+                break
+    finally:
+        for shm in attached.values():
+            shm.close()
+
+
+class QueuePublisher:
+    # Worker ichidagi vaqt natijalarini asosiy jarayonga yuborish.
+    # Holat o'zgarganda darhol, aks holda har interval soniyada bir marta yuboriladi.
+    def __init__(self, events, interval=1.0):
+        self.events = events
+        self.interval = interval
+        self._last = {}
+
+    def __call__(self, camera_id, total_times, start_times, rectangles, current_time):
+        state = tuple(start_time is None for start_time in start_times)
+        last = self._last.get(camera_id)
+        if last is not None and last[0] == state and (current_time - last[1]).total_seconds() < self.interval:
+            return
+        self._last[camera_id] = (state, current_time)
+        self.events.put((camera_id, list(total_times), list(start_times), rectangles, current_time))
+
+    def identify(self, camera_id, area, person):
+        # Qayta identifikatsiya natijasi holatdan oldin, o'sha navbat orqali yuboriladi
+        self.events.put((camera_id, area, person))
+
+    def throughput(self, worker_index, stats):
+        # Worker kameralarining kadr/s ko'rsatkichi (ThroughputMeter.snapshot)
+        self.events.put((worker_index, stats))
+
+
+def report_throughput(worker_index, meter, publisher, interval, stop):
+    while not stop.wait(interval):
+        publisher.throughput(worker_index, meter.snapshot())
+
+
+def merge_throughput(snapshots):
+    # Worker'lar snapshot'laridan format_throughput uchun umumiy ko'rinish
+    camera_fps = {}
+    for stats in snapshots:
+        camera_fps.update(stats["camera_fps"])
+    frames = sum(stats["total_fps"] * stats["elapsed"] for stats in snapshots)
+    batches = sum(stats["total_fps"] * stats["elapsed"] / stats["avg_batch"] for stats in snapshots
+                  if stats["avg_batch"])
+    return {
+        "total_fps": sum(camera_fps.values()),
+        "camera_fps": camera_fps,
+        "avg_batch": frames / batches if batches else 0.0,
+    }
+
+
+def dispatch(persist, event, throughput=None):
+    # Navbatdagi yozuv: vaqt holati (5 maydon), xodim aniqlanishi (3 maydon) yoki worker kadr/s (2 maydon)
+    if len(event) == 2:
+        if throughput is not None:
+            throughput[event[0]] = event[1]
+    elif len(event) == 3:
+        if hasattr(persist, "identify"):
+            persist.identify(*event)
+    else:
+        persist(*event)
+
+
+def run_camera_worker(worker_index, cameras, process_camera, make_detect, publisher, torch_threads=None,
+                      stats_interval=STATS_INTERVAL):
+    set_torch_threads(torch_threads)
+    detect_many, close, meter = make_detect(worker_index)
+    stop = threading.Event()
+    threading.Thread(target=report_throughput, args=(worker_index, meter, publisher, stats_interval, stop),
+                     name="throughput", daemon=True).start()
+    threads = []
+    try:
+        for camera_id, rtsp_url, rectangles, options in cameras:
+            thread = threading.Thread(
+                target=supervise,
+                args=(f"Kamera {camera_id}", process_camera, camera_id, rtsp_url, rectangles,
+                      partial(detect_many, camera_id), publisher, options),
+                name=f"camera-{camera_id}",
+            )
+            threads.append(thread)
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        stop.set()
+        close()
+
+
+def run_multiprocess(cameras, process_camera, persist, model, cameras_per_process=1, inference="local",
+                     max_batch_size=8, max_wait=0.02, torch_threads=None, publish_interval=1.0,
+                     stats_interval=STATS_INTERVAL):
+    # cameras: [(camera_id, rtsp_url, rectangles, options), ...]
+    # persist: asosiy jarayonda saqlash (JSON/Excel) bilan shug'ullanadigan funksiya
+    ctx = mp.get_context(MP_CONTEXT)
+    shards = shard_cameras(cameras, cameras_per_process)
+    events = ctx.Queue()
+    publisher = QueuePublisher(events, publish_interval)
+
+    # Umumiy inference jarayoni, uning so'rov navbati va javob kanallari (qayta ishga tushganda almashtiriladi)
+    shared = {"server": None}
+    if inference == "shared":
+        def start_server():
+            # Navbat ham yangi: qulagan jarayon navbat qulfini ushlab qolgan bo'lishi mumkin
+            for connection in shared.get("readers", []) + shared.get("writers", []):
+                connection.close()
+            shared["requests"] = ctx.Queue()
+            shared["readers"], shared["writers"] = response_pipes(ctx, len(shards))
+            server = ctx.Process(
+                target=run_inference_server,
+                args=(model, shared["requests"], shared["writers"], max_batch_size, max_wait,
+                      torch_threads or os.cpu_count()),
+                name="inference-server",
+                daemon=True,
+            )
+            server.start()
+            shared["server"] = server
+            shared["started"] = time.monotonic()
+
+        def make_detect(worker_index):
+            # fork paytidagi joriy navbat va kanal olinadi
+            client = SharedInferenceClient(worker_index, shared["requests"], shared["readers"][worker_index])
+            return client.detect_many, client.close, client.meter
+
+        start_server()
+        worker_threads = 1
+    elif inference == "local":
+        def make_detect(worker_index):
+            # Model fork'dan keyin har bir worker jarayonida isitiladi
+            warm_up(model)
+            scheduler = InferenceScheduler(model, max_batch_size=max_batch_size, max_wait=max_wait).start()
+            return scheduler.detect_many, scheduler.stop, scheduler.meter
+
+        worker_threads = torch_threads or default_torch_threads(len(shards))
+    else:
+        raise ValueError(f"Noma'lum inference rejimi: {inference}")
+
+    def start_worker(worker_index):
+        worker = ctx.Process(
+            target=run_camera_worker,
+            args=(worker_index, shards[worker_index], process_camera, make_detect, publisher, worker_threads,
+                  stats_interval),
+            name=f"camera-worker-{worker_index}",
+            daemon=True,
+        )
+        worker.start()
+        return worker
+
+    def stop_worker(worker):
+        if worker.is_alive():
+            worker.terminate()
+        worker.join(timeout=5)
+        if shared["server"] is not None:
+            # Jarayon o'z kadr segmentlarini yopolmay qoldi
+            unlink_frames(worker.pid)
+
+    workers = [start_worker(worker_index) for worker_index in range(len(shards))]
+    print(f"{len(cameras)} ta kamera {len(workers)} ta jarayonga taqsimlandi (inference: {inference})")
+
+    server_backoff = RESTART_BACKOFF
+    # worker raqami -> oxirgi kadr/s snapshot'i
+    throughput = {}
+    next_stats = time.monotonic() + stats_interval
+    try:
+        while True:
+            if time.monotonic() >= next_stats:
+                next_stats = time.monotonic() + stats_interval
+                if throughput:
+                    print(format_throughput(merge_throughput(list(throughput.values()))))
+            server = shared["server"]
+            if server is not None and server.exitcode is not None:
+                # Inference jarayoni qulasa worker'lar javob kutib qoladi: u yangi navbat bilan, worker'lar esa
+                # yangi navbatga ulanishi uchun qayta ishga tushiriladi
+                print(f"{server.name} {server.exitcode} kodi bilan to'xtadi, worker'lar bilan birga "
+                      f"{server_backoff:.0f} soniyadan keyin qayta ishga tushiriladi...")
+                for worker in workers:
+                    stop_worker(worker)
+                if time.monotonic() - shared["started"] >= HEALTHY_SECONDS:
+                    server_backoff = RESTART_BACKOFF
+                time.sleep(server_backoff)
+                server_backoff = min(server_backoff * 2, RESTART_BACKOFF_MAX)
+                start_server()
+                throughput.clear()
+                workers = [start_worker(worker_index) for worker_index in range(len(shards))]
+                continue
+            for worker_index, worker in enumerate(workers):
+                if worker.exitcode not in (None, 0):
+                    # Jarayon qulagan bo'lsa faqat shu shard qayta ishga tushiriladi
+                    print(f"{worker.name} {worker.exitcode} kodi bilan to'xtadi, qayta ishga tushirilmoqda...")
+                    stop_worker(worker)
+                    throughput.pop(worker_index, None)
+                    workers[worker_index] = start_worker(worker_index)
+            if not any(worker.is_alive() for worker in workers):
+                break
+            try:
+                event = events.get(timeout=1)
+            except queue.Empty:
+                continue
+            dispatch(persist, event, throughput)
+        # Navbatda qolgan oxirgi natijalarni ham saqlash
+        while True:
+            try:
+                dispatch(persist, events.get(timeout=0.1))
+            except queue.Empty:
+                break
+    finally:
+        for worker in workers:
+            stop_worker(worker)
+        server = shared["server"]
+        if server is not None:
+            shared["requests"].put(None)
+            server.join(timeout=5)
+            if server.is_alive():
+                server.terminate()